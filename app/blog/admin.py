@@ -16,8 +16,8 @@ FONT_SIZE = 16
 class ImageInline(admin.StackedInline):
     model = Images
     extra = 0
-    readonly_fields = ("thumbnail_preview",)
-    fields = ("image", "thumbnail_preview", "image_type")
+    readonly_fields = ("thumbnail_preview", "status")
+    fields = ("image", "thumbnail_preview", "status", "image_type")
 
     def thumbnail_preview(self, obj):
         if obj.thumbnail:
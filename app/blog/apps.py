@@ -1,4 +1,5 @@
 from django.apps import AppConfig  # type: ignore
+from django.db.models.signals import pre_migrate
 
 
 class BlogConfig(AppConfig):
@@ -7,4 +8,7 @@ class BlogConfig(AppConfig):
 
     def ready(self):
         # Импортируем сигналы
-        pass
+        from . import checks, invalidation, signals  # noqa: F401
+        from .indexes import create_trigram_extension
+
+        pre_migrate.connect(create_trigram_extension, sender=self)
@@ -0,0 +1,312 @@
+"""Tag-invalidated full-page cache for anonymous blog pages.
+
+Every cached page stores the versions of the tags it depends on (post,
+category, comments, layout...). Invalidating a tag only bumps its version, so
+all pages that were rendered against the old version become stale without
+having to know their cache keys. See ``blog.invalidation`` for the signal
+handlers that bump tags.
+
+Entries are stored precompressed (gzip and, if the ``brotli`` package is
+installed, brotli), so a hit is served without rendering or compressing.
+"""
+
+import gzip
+import hashlib
+import logging
+import re
+import time
+from datetime import UTC, datetime
+from functools import wraps
+from uuid import uuid4
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+logger = logging.getLogger("blog")
+
+# Constants
+PAGE_CACHE_PREFIX = "blog:page"
+TAG_VERSION_PREFIX = "blog:tag"
+DEFAULT_PAGE_CACHE_TIMEOUT = 60 * 10
+# Версия тега живет дольше любой страницы, которая от нее зависит
+TAG_VERSION_TIMEOUT = 60 * 60 * 24
+PAGE_CACHE_STATS_PREFIX = "blog:page:stats"
+DEFAULT_GZIP_LEVEL = 6
+DEFAULT_BROTLI_QUALITY = 5
+# Предпочтение кодировок: brotli сжимает HTML лучше gzip
+ENCODINGS = ("br", "gzip")
+PAGE_CACHE_STATS = ("hits", "misses", "bytes_uncompressed", "bytes_sent")
+
+# Теги: шапка/меню/футер (настройки, категории, число постов) есть на каждой
+# странице, списки зависят от любого поста.
+TAG_LAYOUT = "layout"
+TAG_POSTS = "posts"
+
+
+def post_tag(pk) -> str:
+    return f"post:{pk}"
+
+
+def category_tag(pk) -> str:
+    return f"category:{pk}"
+
+
+def comments_tag(content_type_id, object_id) -> str:
+    return f"comments:{content_type_id}:{object_id}"
+
+
+def object_comments_tag(obj) -> str:
+    """Tag of the comments attached to a model instance."""
+    content_type = ContentType.objects.get_for_model(obj)
+    return comments_tag(content_type.pk, obj.pk)
+
+
+# ---------- tag versions ----------
+def _tag_key(tag: str) -> str:
+    return f"{TAG_VERSION_PREFIX}:{tag}"
+
+
+def _new_version() -> str:
+    # Время создания версии нужно для Last-Modified (см. blog.conditional)
+    return f"{int(time.time())}.{uuid4().hex}"
+
+
+def tag_version_time(version: str) -> datetime | None:
+    """Time the version was created, i.e. the tag was last invalidated."""
+    timestamp, _, _ = version.partition(".")
+    if not timestamp.isdigit():
+        return None
+    return datetime.fromtimestamp(int(timestamp), tz=UTC)
+
+
+def get_tag_versions(tags) -> dict[str, str]:
+    """Current version of each tag, creating missing ones."""
+    tags = sorted(set(tags))
+    keys = {_tag_key(tag): tag for tag in tags}
+    found = cache.get_many(keys)
+    versions = {keys[key]: version for key, version in found.items()}
+
+    missing = {key: _new_version() for key in keys if key not in found}
+    if missing:
+        for key, version in missing.items():
+            # add() не перезатирает версию, созданную параллельным запросом
+            if not cache.add(key, version, TAG_VERSION_TIMEOUT):
+                version = cache.get(key, version)
+            versions[keys[key]] = version
+    return versions
+
+
+def invalidate_tags(*tags: str) -> None:
+    """Make every cached entry depending on any of the tags stale."""
+    if not tags:
+        return
+    cache.set_many(
+        {_tag_key(tag): _new_version() for tag in set(tags)}, TAG_VERSION_TIMEOUT
+    )
+    logger.debug(f"Invalidated cache tags: {sorted(set(tags))}")
+
+
+def add_cache_tags(request, *tags: str) -> None:
+    """
+    Declare tags the page being rendered depends on.
+
+    Versions are captured now, before the page is rendered: a change that
+    lands while rendering makes the stored entry stale instead of being lost.
+    """
+    if not hasattr(request, "cache_tags"):
+        request.cache_tags = {}
+    new_tags = set(tags) - request.cache_tags.keys()
+    if new_tags:
+        request.cache_tags.update(get_tag_versions(new_tags))
+
+
+# ---------- compression ----------
+def compress_variants(content: bytes) -> dict[str, bytes]:
+    """
+    Compressed variants of a response body keyed by content coding.
+
+    Levels come from BLOG_PAGE_CACHE_GZIP_LEVEL and
+    BLOG_PAGE_CACHE_BROTLI_QUALITY. A variant that does not save bytes is
+    dropped.
+    """
+    variants = {
+        "gzip": gzip.compress(
+            content,
+            compresslevel=getattr(
+                settings, "BLOG_PAGE_CACHE_GZIP_LEVEL", DEFAULT_GZIP_LEVEL
+            ),
+            mtime=0,
+        )
+    }
+    if brotli is not None:
+        variants["br"] = brotli.compress(
+            content,
+            mode=brotli.MODE_TEXT,
+            quality=getattr(
+                settings, "BLOG_PAGE_CACHE_BROTLI_QUALITY", DEFAULT_BROTLI_QUALITY
+            ),
+        )
+    return {
+        coding: body for coding, body in variants.items() if len(body) < len(content)
+    }
+
+
+_ACCEPT_PART_RE = re.compile(r"^\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([\d.]+))?")
+
+
+def choose_encoding(request, available) -> str | None:
+    """Best available content coding accepted by the client (q > 0)."""
+    accepted = {}
+    for part in request.headers.get("Accept-Encoding", "").lower().split(","):
+        if match := _ACCEPT_PART_RE.match(part):
+            coding, quality = match.groups()
+            try:
+                accepted[coding] = float(quality) if quality else 1.0
+            except ValueError:
+                continue
+    for coding in ENCODINGS:
+        if coding in available and accepted.get(coding, accepted.get("*", 0)) > 0:
+            return coding
+    return None
+
+
+def _apply_encoding(request, response: HttpResponse, entry: dict) -> None:
+    """Put the best accepted variant of a cache entry into the response."""
+    coding = choose_encoding(request, entry["encoded"])
+    if coding:
+        response.content = entry["encoded"][coding]
+        response["Content-Encoding"] = coding
+    patch_vary_headers(response, ("Accept-Encoding",))
+    _bump_stats(
+        bytes_uncompressed=len(entry["content"]),
+        bytes_sent=len(response.content),
+    )
+
+
+# ---------- stats ----------
+def _bump_stats(**deltas: int) -> None:
+    for name, delta in deltas.items():
+        key = f"{PAGE_CACHE_STATS_PREFIX}:{name}"
+        try:
+            cache.incr(key, delta)
+        except ValueError:
+            # Счетчика еще нет (или он вытеснен из кэша)
+            if not cache.add(key, delta, None):
+                cache.incr(key, delta)
+
+
+def get_page_cache_stats() -> dict[str, int]:
+    """Hit/miss and byte counters of the page cache since the last reset."""
+    keys = {f"{PAGE_CACHE_STATS_PREFIX}:{name}": name for name in PAGE_CACHE_STATS}
+    found = cache.get_many(keys)
+    stats = {name: found.get(key, 0) for key, name in keys.items()}
+    stats["bytes_saved"] = stats["bytes_uncompressed"] - stats["bytes_sent"]
+    return stats
+
+
+def reset_page_cache_stats() -> None:
+    cache.delete_many(
+        [f"{PAGE_CACHE_STATS_PREFIX}:{name}" for name in PAGE_CACHE_STATS]
+    )
+
+
+# ---------- page cache ----------
+def _is_cacheable_request(request) -> bool:
+    if request.method not in ("GET", "HEAD"):
+        return False
+    user = getattr(request, "user", None)
+    return not (user is not None and user.is_authenticated)
+
+
+def _page_cache_key(request, query_params) -> str:
+    params = [
+        (name, value)
+        for name in sorted(query_params)
+        for value in request.GET.getlist(name)
+    ]
+    raw = f"{request.path}?{params!r}"
+    return f"{PAGE_CACHE_PREFIX}:{hashlib.md5(raw.encode()).hexdigest()}"
+
+
+def get_cached_page(request, query_params=()) -> dict | None:
+    """Cached entry for the request, or None if missing or stale."""
+    entry = cache.get(_page_cache_key(request, query_params))
+    if entry is None:
+        return None
+    if get_tag_versions(entry["tags"]) != entry["tags"]:
+        return None
+    return entry
+
+
+def cache_page_by_tags(query_params=()):
+    """
+    Cache anonymous GET responses of a view until one of its tags changes.
+
+    The key is the request path plus the given query parameters (others are
+    ignored). A hit returns the stored response without calling the view,
+    in the best encoding the client accepts.
+    The view declares dependencies with ``add_cache_tags``; responses without
+    tags are not cached.
+
+    Args:
+        query_params: Names of GET parameters that change the page
+    """
+
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            timeout = getattr(
+                settings, "BLOG_PAGE_CACHE_TIMEOUT", DEFAULT_PAGE_CACHE_TIMEOUT
+            )
+            if not timeout or not _is_cacheable_request(request):
+                return view_func(request, *args, **kwargs)
+
+            entry = get_cached_page(request, query_params)
+            if entry is not None:
+                _bump_stats(hits=1)
+                response = HttpResponse(
+                    entry["content"],
+                    status=entry["status"],
+                    content_type=entry["content_type"],
+                )
+                _apply_encoding(request, response, entry)
+                response["X-Page-Cache"] = "hit"
+                # Формы на странице берут CSRF токен из cookie
+                get_token(request)
+                return response
+
+            response = view_func(request, *args, **kwargs)
+            tags = getattr(request, "cache_tags", None)
+            if (
+                request.method == "GET"
+                and response.status_code == 200
+                and tags
+                and not response.cookies
+                and not getattr(response, "streaming", False)
+            ):
+                entry = {
+                    "content": response.content,
+                    "encoded": compress_variants(response.content),
+                    "status": response.status_code,
+                    "content_type": response["Content-Type"],
+                    "tags": tags,
+                }
+                cache.set(_page_cache_key(request, query_params), entry, timeout)
+                _bump_stats(misses=1)
+                # Отдаем уже сжатый вариант, повторно сжимать не придется
+                _apply_encoding(request, response, entry)
+                response["X-Page-Cache"] = "miss"
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,20 @@
+"""System checks of the blog configuration."""
+
+from django.core.checks import Tags, Warning, register
+
+from .ratelimit import has_native_incr
+
+
+@register(Tags.caches)
+def check_rate_limit_cache(app_configs, **kwargs):
+    """Rate limit counters need a cache with an atomic ``incr``."""
+    if has_native_incr():
+        return []
+    return [
+        Warning(
+            "The default cache has no atomic incr(): rate limit counters are "
+            "updated with get + set and undercount under concurrent requests.",
+            hint="Use memcached or redis as the default cache.",
+            id="blog.W001",
+        )
+    ]
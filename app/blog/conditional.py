@@ -0,0 +1,181 @@
+"""Validators for conditional GET (ETag / Last-Modified) on blog pages.
+
+Computed with at most one small query before the view runs (none while the
+cached validators are current), so a revisiting client (feed reader,
+crawler) gets ``304 Not Modified`` without the page being rendered or even
+looked up in the page cache. Used with
+``django.views.decorators.http.condition``.
+
+The ETag also covers versions of the cache tags the page depends on (see
+``blog.cache``): layout (settings, menu, posts count), posts (images
+are not reflected in ``updated``), the category (previous/next links, moved
+posts) and the post comments. Last-Modified is never older than the latest
+invalidation of those tags, so it does not go backwards when the newest post
+is unpublished or deleted, and follows layout changes.
+"""
+
+import hashlib
+from datetime import datetime
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db.models import Max, OuterRef, Q, Subquery
+
+from comments.models import Comment
+
+from .cache import (
+    DEFAULT_PAGE_CACHE_TIMEOUT,
+    TAG_LAYOUT,
+    TAG_POSTS,
+    category_tag,
+    comments_tag,
+    get_tag_versions,
+    post_tag,
+    tag_version_time,
+)
+from .models import Category, Post
+
+# Constants
+VALIDATORS_CACHE_PREFIX = "blog:validators"
+
+
+def _make_etag(*parts) -> str:
+    # Слабый ETag: страница отдается в нескольких кодировках (gzip, br)
+    return f'W/"{hashlib.md5(repr(parts).encode()).hexdigest()}"'
+
+
+def _approved_comments_updated(content_type: ContentType) -> Subquery:
+    """Time of the latest change of an approved comment of the outer post."""
+    return Subquery(
+        Comment.objects.filter(
+            content_type=content_type,
+            object_id=OuterRef("pk"),
+            status=Comment.Status.APPROVED,
+        )
+        .order_by()
+        .values("object_id")
+        .annotate(last=Max("updated_at"))
+        .values("last")[:1]
+    )
+
+
+def _last_modified(versions: dict[str, str], *times) -> datetime:
+    """Latest of the given times and of the tag invalidation times."""
+    tag_times = (tag_version_time(version) for version in versions.values())
+    return max(filter(None, (*times, *tag_times)))
+
+
+def _detail_validators(request, url_path, year, month, day, post):
+    content_type = ContentType.objects.get_for_model(Post)
+    row = (
+        Post.published.filter(
+            slug=post,
+            publish__year=year,
+            publish__month=month,
+            publish__day=day,
+            category__url_path=url_path,
+        )
+        .annotate(last_comment=_approved_comments_updated(content_type))
+        .values("pk", "category_id", "updated", "last_comment")
+        .first()
+    )
+    if row is None:
+        # 404 отрисует сама вьюха
+        return None
+
+    versions = get_tag_versions(
+        [
+            TAG_LAYOUT,
+            post_tag(row["pk"]),
+            category_tag(row["category_id"]),
+            comments_tag(content_type.pk, row["pk"]),
+        ]
+    )
+    last_modified = _last_modified(versions, row["updated"], row["last_comment"])
+    etag = _make_etag(row["updated"], row["last_comment"], sorted(versions.items()))
+    return etag, last_modified, versions
+
+
+def _list_validators(request, category=""):
+    if request.GET.get("search"):
+        # Результаты поиска от времени изменения постов не зависят
+        return None
+
+    published = Q(posts__status=Post.Status.PUBLISHED)
+    if category:
+        row = (
+            Category.objects.filter(url_path=category)
+            .annotate(last_updated=Max("posts__updated", filter=published))
+            .values("pk", "type_category", "last_updated")
+            .first()
+        )
+        # Страница-категория выводит комментарии, ее не валидируем
+        if row is None or row["type_category"] != Category.TYPE_POSTS:
+            return None
+        tags = [TAG_LAYOUT, TAG_POSTS, category_tag(row["pk"])]
+        last_updated = row["last_updated"]
+    else:
+        tags = [TAG_LAYOUT, TAG_POSTS]
+        last_updated = Post.published.aggregate(last=Max("updated"))["last"]
+
+    if last_updated is None:
+        return None
+    versions = get_tag_versions(tags)
+    etag = _make_etag(last_updated, sorted(versions.items()))
+    return etag, _last_modified(versions, last_updated), versions
+
+
+def _compute_validators(request, compute, kwargs) -> tuple[str, datetime] | None:
+    """
+    Validators of the page, reused from cache while their tags are current.
+
+    A cached entry keeps the tag versions it was computed against, like
+    page cache entries do, so revisits cost no database queries.
+    """
+    raw = f"{request.path}?{request.GET.get('search', '')}"
+    cache_key = f"{VALIDATORS_CACHE_PREFIX}:{hashlib.md5(raw.encode()).hexdigest()}"
+    entry = cache.get(cache_key)
+    if entry is not None and get_tag_versions(entry["tags"]) == entry["tags"]:
+        return entry["validators"]
+
+    result = compute(request, **kwargs)
+    if result is None:
+        return None
+    etag, last_modified, versions = result
+    timeout = getattr(settings, "BLOG_PAGE_CACHE_TIMEOUT", DEFAULT_PAGE_CACHE_TIMEOUT)
+    if timeout:
+        entry = {"validators": (etag, last_modified), "tags": versions}
+        cache.set(cache_key, entry, timeout)
+    return etag, last_modified
+
+
+def _cached_validators(request, compute, kwargs) -> tuple[str, datetime] | None:
+    # condition() вызывает etag_func и last_modified_func по отдельности
+    if not hasattr(request, "_blog_validators"):
+        user = getattr(request, "user", None)
+        if request.method not in ("GET", "HEAD") or (user and user.is_authenticated):
+            request._blog_validators = None
+        else:
+            request._blog_validators = _compute_validators(request, compute, kwargs)
+    return request._blog_validators
+
+
+def post_detail_etag(request, **kwargs) -> str | None:
+    validators = _cached_validators(request, _detail_validators, kwargs)
+    return validators[0] if validators else None
+
+
+def post_detail_last_modified(request, **kwargs) -> datetime | None:
+    validators = _cached_validators(request, _detail_validators, kwargs)
+    return validators[1] if validators else None
+
+
+def post_list_etag(request, **kwargs) -> str | None:
+    validators = _cached_validators(request, _list_validators, kwargs)
+    return validators[0] if validators else None
+
+
+def post_list_last_modified(request, **kwargs) -> datetime | None:
+    validators = _cached_validators(request, _list_validators, kwargs)
+    return validators[1] if validators else None
@@ -0,0 +1,202 @@
+"""Static export of public blog pages for nginx.
+
+Every published post, category page and list page (following "next" cursors)
+is rendered through the regular views as an anonymous visitor and written
+under BLOG_STATIC_EXPORT_ROOT::
+
+    <root>/<path>/index.html            page without a query string
+    <root>/<path>/cursor/<token>.html   list page ?cursor=<token>
+
+with a ``.gz`` twin for nginx ``gzip_static``. A manifest keeps a
+fingerprint of the data every page was rendered from, so an incremental
+export only re-renders pages whose posts, categories, comments or settings
+changed (see the ``export_static`` management command).
+"""
+
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Count, Max
+from django.test import RequestFactory
+from django.urls import resolve, reverse
+
+from comments.models import Comment
+from settings.models import BlogSettings, SocialMedia
+
+from .cache import compress_variants
+from .models import Category, Post
+from .pagination import KeysetPaginator
+from .views import CATEGORY_ORDERING, LIST_ORDERING, POSTS_PER_PAGE
+
+logger = logging.getLogger("blog")
+
+# Constants
+MANIFEST_NAME = ".export-manifest.json"
+
+
+def get_export_root() -> Path:
+    return Path(
+        getattr(settings, "BLOG_STATIC_EXPORT_ROOT", Path(settings.BASE_DIR) / "export")
+    )
+
+
+def _fingerprint(*parts) -> str:
+    return hashlib.md5(repr(parts).encode()).hexdigest()
+
+
+# ---------- pages ----------
+def _list_urls(url: str, queryset, ordering: tuple[str, ...]) -> list[str]:
+    """Urls of a listing: first page plus every page reachable by "next"."""
+    paginator = KeysetPaginator(queryset.only("publish"), POSTS_PER_PAGE, ordering)
+    urls = [url]
+    page = paginator.page()
+    while page.has_next():
+        token = page.next_cursor
+        urls.append(f"{url}?cursor={token}")
+        page = paginator.page(token)
+    return urls
+
+
+def collect_pages() -> dict[str, str]:
+    """
+    Every exportable url with a fingerprint of the data it is rendered from.
+
+    Returns:
+        Mapping of url (path, optionally with ``?cursor=``) to fingerprint
+    """
+    # Шапка, меню и число постов есть на каждой странице
+    layout = _fingerprint(
+        list(BlogSettings.objects.order_by("pk").values_list()),
+        list(SocialMedia.objects.order_by("pk").values_list()),
+        list(Category.objects.order_by("pk").values_list()),
+        Post.published.count(),
+    )
+
+    content_type = ContentType.objects.get_for_model(Post)
+    comments = {
+        row["object_id"]: (row["last"], row["count"])
+        for row in Comment.objects.filter(
+            content_type=content_type, status=Comment.Status.APPROVED
+        )
+        .order_by()
+        .values("object_id")
+        .annotate(last=Max("updated_at"), count=Count("pk"))
+    }
+
+    posts = list(
+        Post.published.filter(category__isnull=False)
+        .select_related("category")
+        .only("slug", "publish", "updated", "category__url_path")
+        .order_by("pk")
+    )
+    # Соседние посты и списки категории зависят от всех ее постов
+    category_posts = {}
+    for post in posts:
+        category_posts.setdefault(post.category_id, []).append(post)
+    category_state = {
+        category_id: _fingerprint(
+            max(post.updated for post in items), [post.pk for post in items]
+        )
+        for category_id, items in category_posts.items()
+    }
+
+    pages = {}
+    for post in posts:
+        pages[post.get_absolute_url()] = _fingerprint(
+            layout,
+            post.updated,
+            comments.get(post.pk),
+            category_state[post.category_id],
+        )
+
+    for category in Category.objects.all():
+        url = reverse("blog:category", kwargs={"category": category.url_path})
+        items = category_posts.get(category.pk, [])
+        state = category_state.get(category.pk)
+        if category.type_category != Category.TYPE_POSTS:
+            # Страница-категория выводит свой первый пост с комментариями
+            if items:
+                pages[url] = _fingerprint(layout, state, comments.get(items[0].pk))
+            continue
+        queryset = Post.published.filter(category=category)
+        for page_url in _list_urls(url, queryset, CATEGORY_ORDERING):
+            pages[page_url] = _fingerprint(layout, state)
+
+    list_state = _fingerprint(
+        layout, list(Post.published.order_by("pk").values_list("pk", "updated"))
+    )
+    for page_url in _list_urls(
+        reverse("blog:post_list"), Post.published, LIST_ORDERING
+    ):
+        pages[page_url] = list_state
+
+    return pages
+
+
+def page_file(url: str) -> Path:
+    """Path of the exported file relative to the export root."""
+    path, _, query = url.partition("?")
+    base = Path(path.strip("/"))
+    if query:
+        return base / "cursor" / f"{query.removeprefix('cursor=')}.html"
+    return base / "index.html"
+
+
+# ---------- rendering ----------
+def render_page(url: str) -> tuple[str, int, bytes]:
+    """
+    Render a page through its view as an anonymous visitor.
+
+    Picklable entry point for process pools (see ``export_static``).
+
+    Returns:
+        Tuple of (url, status code, body)
+    """
+    request = RequestFactory().get(url)
+    request.user = AnonymousUser()
+    match = resolve(request.path_info)
+    response = match.func(request, *match.args, **match.kwargs)
+    return url, response.status_code, response.content
+
+
+def _replace_file(path: Path, content: bytes) -> None:
+    # Пишем во временный файл: nginx не должен отдать недописанную страницу
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    tmp_path.write_bytes(content)
+    os.replace(tmp_path, path)
+
+
+def write_page(root: Path, url: str, content: bytes) -> None:
+    """Write a page and its gzip twin."""
+    path = root / page_file(url)
+    _replace_file(path, content)
+    gz_path = path.with_name(f"{path.name}.gz")
+    if gzipped := compress_variants(content).get("gzip"):
+        _replace_file(gz_path, gzipped)
+    else:
+        gz_path.unlink(missing_ok=True)
+
+
+def remove_page(root: Path, url: str) -> None:
+    path = root / page_file(url)
+    path.unlink(missing_ok=True)
+    path.with_name(f"{path.name}.gz").unlink(missing_ok=True)
+
+
+# ---------- manifest ----------
+def load_manifest(root: Path) -> dict[str, str]:
+    try:
+        return json.loads((root / MANIFEST_NAME).read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(root: Path, manifest: dict[str, str]) -> None:
+    _replace_file(root / MANIFEST_NAME, json.dumps(manifest, indent=0).encode())
@@ -0,0 +1,40 @@
+"""Database indexes that only make sense on PostgreSQL."""
+
+from django.contrib.postgres.indexes import GinIndex
+from django.db import connections
+from django.db.backends.ddl_references import Statement
+
+
+class PostgresGinIndex(GinIndex):
+    """
+    GIN index that is skipped on other databases.
+
+    Lets the project still create its schema on the SQLite fallback from
+    ``tiny_cms.configs.base`` (e.g. for tests); full-text and trigram search
+    only work on PostgreSQL anyway.
+    """
+
+    def create_sql(self, model, schema_editor, using="", **kwargs):
+        if schema_editor.connection.vendor != "postgresql":
+            return Statement("%(sql)s", sql="")
+        return super().create_sql(model, schema_editor, using=using, **kwargs)
+
+    def remove_sql(self, model, schema_editor, **kwargs):
+        if schema_editor.connection.vendor != "postgresql":
+            return Statement("%(sql)s", sql="")
+        return super().remove_sql(model, schema_editor, **kwargs)
+
+
+def create_trigram_extension(sender, using="default", **kwargs):
+    """
+    ``pre_migrate`` receiver enabling ``pg_trgm`` before blog indexes are built.
+
+    The trigram GIN index on post titles needs the ``gin_trgm_ops`` operator
+    class. ``pg_trgm`` is a trusted extension (PostgreSQL 13+), so the database
+    owner can create it without superuser rights.
+    """
+    connection = connections[using]
+    if connection.vendor != "postgresql":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
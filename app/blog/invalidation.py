@@ -0,0 +1,102 @@
+"""Signal handlers that purge cached blog pages when their data changes."""
+
+import logging
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from comments.models import ApprovedComment, Comment, PendingComment, stats_changed
+from settings.models import BlogSettings, SocialMedia
+
+from .cache import (
+    TAG_LAYOUT,
+    TAG_POSTS,
+    category_tag,
+    comments_tag,
+    invalidate_tags,
+    post_tag,
+)
+from .models import Category, Images, Post
+
+logger = logging.getLogger("blog")
+
+
+def _invalidate_on_commit(*tags: str) -> None:
+    # После коммита: иначе параллельный запрос может закэшировать старые данные
+    transaction.on_commit(lambda: invalidate_tags(*tags))
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post(sender, instance, created=False, **kwargs):
+    tags = {post_tag(instance.pk), TAG_POSTS}
+    deleted = kwargs.get("signal") is post_delete
+
+    def changed(name):
+        return instance.get_loaded_value(name) != getattr(instance, name)
+
+    # Число опубликованных постов выводится в шапке каждой страницы
+    if created or deleted or changed("status"):
+        tags.add(TAG_LAYOUT)
+
+    # Навигация "предыдущий/следующий" на страницах постов той же категории
+    if (
+        created
+        or deleted
+        or any(changed(name) for name in ("status", "category_id", "slug", "publish"))
+    ):
+        category_ids = {
+            instance.category_id,
+            instance.get_loaded_value("category_id"),
+        }
+        tags.update(category_tag(pk) for pk in category_ids if pk is not None)
+
+    _invalidate_on_commit(*tags)
+
+
+@receiver(post_save, sender=Images)
+@receiver(post_delete, sender=Images)
+def invalidate_post_images(sender, instance, **kwargs):
+    _invalidate_on_commit(post_tag(instance.post_id), TAG_POSTS)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category(sender, instance, **kwargs):
+    # Категории выводятся в меню на каждой странице
+    _invalidate_on_commit(category_tag(instance.pk), TAG_LAYOUT)
+
+
+@receiver(post_save, sender=BlogSettings)
+@receiver(post_delete, sender=BlogSettings)
+@receiver(post_save, sender=SocialMedia)
+@receiver(post_delete, sender=SocialMedia)
+def invalidate_layout(sender, instance, **kwargs):
+    _invalidate_on_commit(TAG_LAYOUT)
+
+
+def invalidate_comments(sender, instance, created=False, **kwargs):
+    # Новый комментарий на модерации на странице не виден
+    if created and instance.status != Comment.Status.APPROVED:
+        return
+    _invalidate_on_commit(comments_tag(instance.content_type_id, instance.object_id))
+
+
+# Админка сохраняет комментарии и через прокси-модели
+for _comment_model in (Comment, PendingComment, ApprovedComment):
+    post_save.connect(invalidate_comments, sender=_comment_model)
+    post_delete.connect(invalidate_comments, sender=_comment_model)
+
+
+@receiver(stats_changed)
+def invalidate_comment_stats(
+    sender, content_type_id, object_id, rating_changed=False, **kwargs
+):
+    # Массовые действия админки обходят post_save
+    tags = {comments_tag(content_type_id, object_id)}
+    # Рейтинг поста выводится в списках, категориях и поиске
+    if rating_changed and content_type_id == ContentType.objects.get_for_model(Post).pk:
+        tags.update({post_tag(object_id), TAG_POSTS})
+    _invalidate_on_commit(*tags)
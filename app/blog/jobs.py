@@ -0,0 +1,146 @@
+"""Database-backed queue of background image jobs.
+
+Saving an ``Images`` row only enqueues an ``ImageJob``; the
+``process_image_jobs`` management command claims due jobs and runs the
+handler registered for their kind. No broker is needed: jobs are claimed
+with ``SELECT ... FOR UPDATE SKIP LOCKED`` on PostgreSQL, so several workers
+never run the same job. A failed job is retried with exponential backoff
+and marked failed (with its image) after BLOG_IMAGE_JOB_MAX_ATTEMPTS, or at
+once if the handler raised ``PermanentJobError``. Jobs of a worker that
+died are claimed again after LOCK_TIMEOUT.
+"""
+
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import ImageJob, Images
+
+logger = logging.getLogger("blog")
+
+# Constants
+DEFAULT_MAX_ATTEMPTS = 5
+# Задержка перед первым повтором, дальше удваивается
+DEFAULT_RETRY_DELAY = 30
+LOCK_TIMEOUT = timedelta(minutes=10)
+
+# kind -> обработчик задачи
+JOB_HANDLERS = {}
+
+
+class PermanentJobError(Exception):
+    """Raised by a handler when retrying the job cannot succeed."""
+
+
+def job_handler(kind: str):
+    """Register a function processing jobs of ``kind``."""
+
+    def decorator(func):
+        JOB_HANDLERS[kind] = func
+        return func
+
+    return decorator
+
+
+def enqueue(image: Images, kind: str) -> ImageJob:
+    """
+    Queue a job for an image, replacing its pending job of the same kind.
+
+    Args:
+        image: Saved image row
+        kind: Registered job kind
+
+    Returns:
+        Created job
+    """
+    ImageJob.objects.filter(
+        image=image, kind=kind, status=ImageJob.Status.PENDING
+    ).delete()
+    job = ImageJob.objects.create(image=image, kind=kind, source_name=image.image.name)
+    logger.debug(f"Queued {kind} job for image id={image.pk}")
+    return job
+
+
+def claim_jobs(limit: int) -> list[ImageJob]:
+    """Mark up to ``limit`` due jobs as running and return them."""
+    now = timezone.now()
+    due = Q(status=ImageJob.Status.PENDING, run_after__lte=now) | Q(
+        status=ImageJob.Status.RUNNING, locked_at__lt=now - LOCK_TIMEOUT
+    )
+    with transaction.atomic():
+        jobs = list(
+            ImageJob.objects.select_for_update(skip_locked=True)
+            .filter(due)
+            .order_by("run_after", "pk")[:limit]
+        )
+        ImageJob.objects.filter(pk__in=[job.pk for job in jobs]).update(
+            status=ImageJob.Status.RUNNING,
+            locked_at=now,
+            attempts=F("attempts") + 1,
+        )
+    for job in jobs:
+        job.status = ImageJob.Status.RUNNING
+        job.locked_at = now
+        job.attempts += 1
+    return jobs
+
+
+def _fail(job: ImageJob, error: str, permanent: bool = False) -> None:
+    max_attempts = getattr(
+        settings, "BLOG_IMAGE_JOB_MAX_ATTEMPTS", DEFAULT_MAX_ATTEMPTS
+    )
+    jobs = ImageJob.objects.filter(pk=job.pk)
+    if permanent or job.attempts >= max_attempts:
+        jobs.update(status=ImageJob.Status.FAILED, locked_at=None, last_error=error)
+        Images.objects.filter(pk=job.image_id, image=job.source_name).update(
+            status=Images.Status.FAILED
+        )
+        logger.error(f"{job} failed after {job.attempts} attempts: {error}")
+        return
+
+    delay = getattr(settings, "BLOG_IMAGE_JOB_RETRY_DELAY", DEFAULT_RETRY_DELAY)
+    run_after = timezone.now() + timedelta(seconds=delay * 2 ** (job.attempts - 1))
+    jobs.update(
+        status=ImageJob.Status.PENDING,
+        locked_at=None,
+        run_after=run_after,
+        last_error=error,
+    )
+    logger.warning(f"{job} failed (attempt {job.attempts}), retry at {run_after}")
+
+
+def run_job(job: ImageJob) -> bool:
+    """
+    Run a claimed job; delete it on success, schedule a retry on failure.
+
+    Returns:
+        True if the job succeeded
+    """
+    handler = JOB_HANDLERS.get(job.kind)
+    try:
+        if handler is None:
+            raise LookupError(f"No handler for job kind {job.kind!r}")
+        handler(job)
+    except Exception as e:
+        logger.error(f"Error running {job}: {e}", exc_info=True)
+        _fail(job, str(e), permanent=isinstance(e, PermanentJobError))
+        return False
+    job.delete()
+    return True
+
+
+def process_jobs(limit: int) -> int:
+    """
+    Claim and run up to ``limit`` due jobs.
+
+    Returns:
+        Number of claimed jobs
+    """
+    jobs = claim_jobs(limit)
+    for job in jobs:
+        run_job(job)
+    return len(jobs)
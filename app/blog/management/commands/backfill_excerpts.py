@@ -0,0 +1,75 @@
+"""Fill list teaser fields (excerpt, word count, reading time) for posts."""
+
+import logging
+
+from django.core.management.base import BaseCommand
+
+from blog.cache import TAG_POSTS, invalidate_tags, post_tag
+from blog.models import Post
+from blog.rendering import (
+    BODY_DERIVED_FIELDS,
+    RENDER_VERSION,
+    build_excerpt,
+    render_post_body,
+)
+
+logger = logging.getLogger("blog")
+
+# Constants
+DEFAULT_BATCH_SIZE = 500
+EXCERPT_FIELDS = ["excerpt", "word_count", "reading_time"]
+
+
+class Command(BaseCommand):
+    help = "Backfill Post.excerpt, word_count and reading_time in bulk."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Recompute every post, not only ones without an excerpt",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help="Rows fetched and written per batch",
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.order_by("pk")
+        if not options["all"]:
+            posts = posts.filter(excerpt="")
+        batch_size = max(1, options["batch_size"])
+
+        updated = 0
+        last_pk = 0
+        while True:
+            batch = list(
+                posts.filter(pk__gt=last_pk).only("pk", "body", *BODY_DERIVED_FIELDS)[
+                    :batch_size
+                ]
+            )
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+
+            fields = set(EXCERPT_FIELDS)
+            for post in batch:
+                if post.body_html_version == RENDER_VERSION:
+                    # Готовый HTML актуален: рендерить markdown повторно не нужно
+                    post.excerpt, post.word_count, post.reading_time = build_excerpt(
+                        post.body_html
+                    )
+                else:
+                    values = render_post_body(post.body)
+                    for field_name, value in values.items():
+                        setattr(post, field_name, value)
+                    fields.update(values)
+            Post.objects.bulk_update(batch, sorted(fields))
+            # bulk_update не шлет сигналы: сбрасываем кэш страниц вручную
+            invalidate_tags(TAG_POSTS, *(post_tag(post.pk) for post in batch))
+            updated += len(batch)
+            logger.info(f"Backfilled excerpts for {updated} posts")
+
+        self.stdout.write(self.style.SUCCESS(f"Updated {updated} posts"))
@@ -0,0 +1,67 @@
+"""Store dimensions, colour and placeholder of images processed before them."""
+
+import logging
+
+from django.core.management.base import BaseCommand
+
+from blog.cache import TAG_POSTS, invalidate_tags, post_tag
+from blog.models import Images
+from blog.signals import EMPTY_METADATA, image_metadata
+
+logger = logging.getLogger("blog")
+
+# Constants
+DEFAULT_BATCH_SIZE = 200
+
+
+class Command(BaseCommand):
+    help = "Fill width, height, size, dominant colour and LQIP of existing images."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Recompute every image, not only ones without dimensions",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help="Rows written per UPDATE batch",
+        )
+
+    def handle(self, *args, **options):
+        images = Images.objects.exclude(image="").order_by("pk")
+        if not options["all"]:
+            images = images.filter(width__isnull=True)
+        # Необработанные строки заполнит задача миниатюры
+        images = images.exclude(status=Images.Status.PROCESSING)
+        batch_size = max(1, options["batch_size"])
+
+        batch, post_ids = [], set()
+        updated = failed = 0
+        for image in images.only("pk", "post_id", "image", "thumbnail").iterator():
+            try:
+                # Миниатюра меньше оригинала: декодировать ее дешевле
+                metadata = image_metadata(image.image, image.thumbnail or None)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping image id={image.pk}: {e}")
+                failed += 1
+                continue
+            for field, value in metadata.items():
+                setattr(image, field, value)
+            batch.append(image)
+            post_ids.add(image.post_id)
+            if len(batch) >= batch_size:
+                updated += Images.objects.bulk_update(batch, list(EMPTY_METADATA))
+                batch = []
+        if batch:
+            updated += Images.objects.bulk_update(batch, list(EMPTY_METADATA))
+
+        # bulk_update не шлет сигналов: сбрасываем кэш страниц сами
+        if post_ids:
+            invalidate_tags(TAG_POSTS, *(post_tag(pk) for pk in post_ids))
+        logger.info(f"Stored metadata of {updated} images, {failed} failed")
+        self.stdout.write(
+            self.style.SUCCESS(f"Updated {updated} images ({failed} failed)")
+        )
@@ -0,0 +1,34 @@
+"""Queue responsive variant jobs for images uploaded before variants existed."""
+
+import logging
+
+from django.core.management.base import BaseCommand
+
+from blog.jobs import enqueue
+from blog.models import Images
+from blog.signals import VARIANTS_JOB
+
+logger = logging.getLogger("blog")
+
+
+class Command(BaseCommand):
+    help = "Queue variant jobs for images without variants (run the worker after)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Rebuild variants of every image, e.g. after changing widths",
+        )
+
+    def handle(self, *args, **options):
+        images = Images.objects.exclude(image="").order_by("pk")
+        if not options["all"]:
+            images = images.filter(variants__isnull=True)
+
+        queued = 0
+        for image in images.only("pk", "image").iterator():
+            enqueue(image, VARIANTS_JOB)
+            queued += 1
+        logger.info(f"Queued variant jobs for {queued} images")
+        self.stdout.write(self.style.SUCCESS(f"Queued {queued} variant jobs"))
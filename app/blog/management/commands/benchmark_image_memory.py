@@ -0,0 +1,149 @@
+"""Measure peak memory of the image pipeline per upload size."""
+
+import multiprocessing
+import resource
+import tempfile
+import time
+from pathlib import Path
+
+from django.core.files.base import File
+from django.core.management.base import BaseCommand
+from django.db import connections
+from PIL import Image
+
+from blog.signals import (
+    DEFAULT_VARIANT_WIDTHS,
+    THUMBNAIL_SIZE,
+    create_thumbnail,
+    create_variants,
+    get_variant_formats,
+)
+
+# Constants
+DEFAULT_MEGAPIXELS = (2, 8, 16, 24, 40)
+# Соотношение сторон типичной фотографии
+ASPECT_RATIO = 4 / 3
+MB = 1024 * 1024
+
+
+def _proc_status(field: str) -> int | None:
+    """Value of a /proc/self/status field in bytes (Linux only)."""
+    try:
+        for line in Path("/proc/self/status").read_text().splitlines():
+            if line.startswith(f"{field}:"):
+                return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def _reset_peak_rss() -> bool:
+    # Сбрасывает VmHWM: после fork пик процесса унаследован от родителя
+    try:
+        Path("/proc/self/clear_refs").write_text("5")
+        return True
+    except OSError:
+        return False
+
+
+def _run_full_decode(path: str) -> None:
+    # Прежнее поведение: полное декодирование перед уменьшением
+    with Image.open(path) as img:
+        img.load()
+        img.thumbnail(THUMBNAIL_SIZE, Image.Resampling.LANCZOS)
+
+
+def _run_thumbnail(path: str) -> None:
+    with open(path, "rb") as fh:
+        with create_thumbnail(File(fh, name=path), THUMBNAIL_SIZE):
+            pass
+
+
+def _run_variants(path: str) -> None:
+    with open(path, "rb") as fh:
+        variants = create_variants(
+            File(fh, name=path), DEFAULT_VARIANT_WIDTHS, get_variant_formats()
+        )
+        for _width, _height, _name, output in variants:
+            output.close()
+
+
+MODES = {
+    "full decode": _run_full_decode,
+    "thumbnail": _run_thumbnail,
+    "variants": _run_variants,
+}
+
+
+def _measure(path: str, mode: str) -> tuple[int, int, float]:
+    """Runs in a fresh child process: (rss before, peak rss, seconds)."""
+    precise = _reset_peak_rss()
+    baseline = _proc_status("VmRSS") or 0
+    started = time.perf_counter()
+    MODES[mode](path)
+    elapsed = time.perf_counter() - started
+    if precise:
+        peak = _proc_status("VmHWM") or 0
+    else:
+        # ru_maxrss в килобайтах (Linux) и включает пик родителя
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    return baseline, peak, elapsed
+
+
+def _make_jpeg(directory: str, megapixels: float) -> Path:
+    height = int((megapixels * 1_000_000 / ASPECT_RATIO) ** 0.5)
+    width = int(height * ASPECT_RATIO)
+    # Шум, растянутый до нужного размера: похоже на фото и быстро строится
+    noise = Image.effect_noise((max(1, width // 16), max(1, height // 16)), 64)
+    img = Image.merge("RGB", (noise, noise.rotate(90, expand=False), noise))
+    img = img.resize((width, height), Image.Resampling.BICUBIC)
+    path = Path(directory) / f"{megapixels}mp.jpg"
+    img.save(path, format="JPEG", quality=90)
+    return path
+
+
+class Command(BaseCommand):
+    help = "Report peak RSS of thumbnail and variant generation per image size."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--megapixels",
+            type=float,
+            nargs="+",
+            default=DEFAULT_MEGAPIXELS,
+            help="Sizes of generated test JPEGs",
+        )
+
+    def handle(self, *args, **options):
+        # Каждое измерение - в отдельном процессе, соединения не наследуем
+        connections.close_all()
+        context = multiprocessing.get_context("fork")
+
+        self.stdout.write(
+            f"{'MP':>6} {'pixels':>12} {'file MB':>8} "
+            + " ".join(f"{mode + ' MB':>15} {'s':>5}" for mode in MODES)
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            for megapixels in options["megapixels"]:
+                path = _make_jpeg(directory, megapixels)
+                with Image.open(path) as img:
+                    size = img.size
+
+                columns = []
+                for mode in MODES:
+                    with context.Pool(processes=1) as pool:
+                        baseline, peak, elapsed = pool.apply(
+                            _measure, (str(path), mode)
+                        )
+                    columns.append(f"{(peak - baseline) / MB:>15.1f} {elapsed:>5.2f}")
+
+                self.stdout.write(
+                    f"{megapixels:>6g} {size[0]:>5}x{size[1]:<6} "
+                    f"{path.stat().st_size / MB:>8.1f} " + " ".join(columns)
+                )
+                path.unlink()
+
+        self.stdout.write(
+            "Peak RSS growth over the worker's idle RSS, in a fresh process per "
+            "run; 'full decode' is the previous full-resolution thumbnail path."
+        )
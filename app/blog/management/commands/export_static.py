@@ -0,0 +1,98 @@
+"""Pre-render public blog pages into a directory served by nginx."""
+
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from blog.export import (
+    collect_pages,
+    get_export_root,
+    load_manifest,
+    page_file,
+    remove_page,
+    render_page,
+    save_manifest,
+    write_page,
+)
+
+logger = logging.getLogger("blog")
+
+
+class Command(BaseCommand):
+    help = "Render every public post, category and list page to static files."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output",
+            help="Export directory (default: BLOG_STATIC_EXPORT_ROOT)",
+        )
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help="Only render pages whose data changed since the last export",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Number of worker processes (1 renders in-process)",
+        )
+
+    def handle(self, *args, **options):
+        root = Path(options["output"]) if options["output"] else get_export_root()
+        pages = collect_pages()
+        previous = load_manifest(root)
+        manifest = dict(previous) if options["incremental"] else {}
+
+        # Снятые с публикации и удаленные страницы nginx отдавать не должен
+        stale = [url for url in previous if url not in pages]
+        for url in stale:
+            remove_page(root, url)
+            manifest.pop(url, None)
+
+        urls = [
+            url
+            for url, fingerprint in pages.items()
+            if manifest.get(url) != fingerprint or not (root / page_file(url)).exists()
+        ]
+        workers = max(1, options["workers"])
+        self.stdout.write(
+            f"Rendering {len(urls)} of {len(pages)} pages ({workers} workers), "
+            f"removed {len(stale)}"
+        )
+
+        executor = None
+        if workers > 1 and len(urls) > 1:
+            # Дочерние процессы открывают свои соединения с БД
+            connections.close_all()
+            executor = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("fork")
+            )
+        try:
+            if executor is not None:
+                chunksize = max(1, len(urls) // (workers * 4))
+                results = executor.map(render_page, urls, chunksize=chunksize)
+            else:
+                results = map(render_page, urls)
+
+            rendered = 0
+            for url, status, content in results:
+                if status != 200:
+                    logger.warning(f"Static export skipped {url}: status {status}")
+                    remove_page(root, url)
+                    manifest.pop(url, None)
+                    continue
+                write_page(root, url, content)
+                manifest[url] = pages[url]
+                rendered += 1
+        finally:
+            if executor is not None:
+                executor.shutdown()
+            save_manifest(root, manifest)
+
+        self.stdout.write(self.style.SUCCESS(f"Exported {rendered} pages to {root}"))
@@ -0,0 +1,36 @@
+"""Show hit/miss and compression counters of the blog page cache."""
+
+from django.core.management.base import BaseCommand
+
+from blog.cache import get_page_cache_stats, reset_page_cache_stats
+
+
+class Command(BaseCommand):
+    help = "Print page cache hit/miss and byte counters."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reset",
+            action="store_true",
+            help="Reset the counters after printing them",
+        )
+
+    def handle(self, *args, **options):
+        stats = get_page_cache_stats()
+        requests = stats["hits"] + stats["misses"]
+        hit_ratio = stats["hits"] / requests if requests else 0
+        saved_ratio = (
+            stats["bytes_saved"] / stats["bytes_uncompressed"]
+            if stats["bytes_uncompressed"]
+            else 0
+        )
+
+        self.stdout.write(f"Hits: {stats['hits']} ({hit_ratio:.1%})")
+        self.stdout.write(f"Misses: {stats['misses']}")
+        self.stdout.write(f"Uncompressed bytes: {stats['bytes_uncompressed']}")
+        self.stdout.write(f"Sent bytes: {stats['bytes_sent']}")
+        self.stdout.write(f"Saved bytes: {stats['bytes_saved']} ({saved_ratio:.1%})")
+
+        if options["reset"]:
+            reset_page_cache_stats()
+            self.stdout.write(self.style.SUCCESS("Counters reset"))
@@ -0,0 +1,68 @@
+"""Background worker running queued image jobs (thumbnails)."""
+
+import logging
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from blog.jobs import process_jobs
+
+logger = logging.getLogger("blog")
+
+# Constants
+DEFAULT_BATCH_SIZE = 10
+DEFAULT_POLL_INTERVAL = 5.0
+
+
+class Command(BaseCommand):
+    help = "Process queued image jobs until stopped (or until the queue is empty)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit as soon as no job is due",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help="Jobs claimed at a time",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=DEFAULT_POLL_INTERVAL,
+            help="Seconds to wait when the queue is empty",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options["batch_size"])
+        self.stopping = False
+        # docker stop: доделываем текущую пачку и выходим
+        signal.signal(signal.SIGTERM, self._stop)
+
+        processed = 0
+        self.stdout.write("Image job worker started")
+        try:
+            while not self.stopping:
+                close_old_connections()
+                claimed = process_jobs(batch_size)
+                processed += claimed
+                if claimed:
+                    continue
+                if options["once"]:
+                    break
+                time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            close_old_connections()
+
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} image jobs"))
+
+    def _stop(self, signum, frame):
+        logger.info("Image job worker stopping")
+        self.stopping = True
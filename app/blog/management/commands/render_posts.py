@@ -0,0 +1,88 @@
+"""Re-render stored post HTML after the markdown configuration changes."""
+
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from blog.cache import TAG_POSTS, invalidate_tags, post_tag
+from blog.models import Post
+from blog.rendering import BODY_DERIVED_FIELDS, RENDER_VERSION, render_post_body
+
+logger = logging.getLogger("blog")
+
+# Constants
+DEFAULT_BATCH_SIZE = 200
+
+
+class Command(BaseCommand):
+    help = "Render markdown of posts whose stored HTML is stale, in parallel."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Re-render every post, not only stale ones",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Number of worker processes (1 renders in-process)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help="Rows fetched and written per batch",
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.all()
+        if not options["all"]:
+            posts = posts.filter(~Q(body_html_version=RENDER_VERSION))
+
+        pks = list(posts.order_by("pk").values_list("pk", flat=True))
+        if not pks:
+            self.stdout.write("All posts are up to date")
+            return
+
+        workers = max(1, options["workers"])
+        batch_size = max(1, options["batch_size"])
+        self.stdout.write(
+            f"Rendering {len(pks)} posts (version {RENDER_VERSION}, {workers} workers)"
+        )
+
+        executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+        try:
+            rendered = 0
+            for start in range(0, len(pks), batch_size):
+                batch = list(
+                    Post.objects.filter(pk__in=pks[start : start + batch_size]).only(
+                        "pk", "body"
+                    )
+                )
+                bodies = [post.body for post in batch]
+                if executor is not None:
+                    chunksize = max(1, len(bodies) // (workers * 4))
+                    results = executor.map(
+                        render_post_body, bodies, chunksize=chunksize
+                    )
+                else:
+                    results = map(render_post_body, bodies)
+
+                for post, values in zip(batch, results, strict=True):
+                    for field_name, value in values.items():
+                        setattr(post, field_name, value)
+                Post.objects.bulk_update(batch, BODY_DERIVED_FIELDS)
+                # bulk_update не шлет сигналы: сбрасываем кэш страниц вручную
+                invalidate_tags(TAG_POSTS, *(post_tag(post.pk) for post in batch))
+                rendered += len(batch)
+                logger.info(f"Rendered {rendered}/{len(pks)} posts")
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        self.stdout.write(self.style.SUCCESS(f"Rendered {rendered} posts"))
@@ -0,0 +1,174 @@
+"""Find and delete media files that no database row references."""
+
+import logging
+import os
+import time
+from collections.abc import Iterator
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import models
+
+from blog.models import MediaBlob
+
+logger = logging.getLogger("blog")
+
+# Constants
+DEFAULT_BATCH_SIZE = 1000
+# Свежие файлы не трогаем: строка с ними может быть еще не сохранена
+DEFAULT_MIN_AGE = 60 * 60
+MB = 1024 * 1024
+
+
+def iter_media_files(root: str) -> Iterator[tuple[str, os.DirEntry]]:
+    """Yield (name relative to root, entry) of every file under root."""
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        name = os.path.relpath(entry.path, root)
+                        yield name.replace(os.sep, "/"), entry
+        except OSError as e:
+            logger.error(f"Cannot scan {directory}: {e}")
+
+
+def file_fields() -> list[tuple[type[models.Model], str]]:
+    """(model, field name) of every file field of installed models."""
+    return [
+        (model, field.name)
+        for model in apps.get_models()
+        for field in model._meta.concrete_fields
+        if isinstance(field, models.FileField)
+    ]
+
+
+def referenced_names(names: set[str], fields) -> set[str]:
+    """Names from the batch stored in any file field (one query per field)."""
+    referenced = set()
+    for model, field_name in fields:
+        referenced.update(
+            model._base_manager.filter(**{f"{field_name}__in": names}).values_list(
+                field_name, flat=True
+            )
+        )
+    return referenced
+
+
+class Command(BaseCommand):
+    help = "Delete files under MEDIA_ROOT that no file field references."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only list orphan files",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help="Paths checked per set of queries",
+        )
+        parser.add_argument(
+            "--min-age",
+            type=int,
+            default=DEFAULT_MIN_AGE,
+            help="Skip files modified less than this many seconds ago",
+        )
+
+    def handle(self, *args, **options):
+        root = str(settings.MEDIA_ROOT)
+        batch_size = max(1, options["batch_size"])
+        self.dry_run = options["dry_run"]
+        self.cutoff = time.time() - options["min_age"]
+        self.fields = file_fields()
+        self.stats = dict.fromkeys(
+            ("scanned", "scanned_bytes", "orphans", "orphan_bytes", "deleted"), 0
+        )
+        self.counted = 0
+
+        started = time.perf_counter()
+        batch = {}
+        for name, entry in iter_media_files(root):
+            batch[name] = entry
+            if len(batch) >= batch_size:
+                self._sweep_batch(root, batch)
+                batch = {}
+        if batch:
+            self._sweep_batch(root, batch)
+        elapsed = time.perf_counter() - started
+
+        self._report(elapsed)
+
+    def _sweep_batch(self, root: str, batch: dict[str, os.DirEntry]) -> None:
+        sizes = {}
+        for name, entry in batch.items():
+            try:
+                stat = entry.stat(follow_symlinks=False)
+            except OSError:
+                continue
+            self.stats["scanned"] += 1
+            self.stats["scanned_bytes"] += stat.st_size
+            if stat.st_mtime < self.cutoff:
+                sizes[name] = stat.st_size
+
+        candidates = set(sizes) - referenced_names(set(sizes), self.fields)
+        if not candidates:
+            return
+        # Blob с живым счетчиком ссылок может ждать сохранения строки (задача
+        # строит варианты); такие файлы только показываем в отчете
+        counted = set(
+            MediaBlob.objects.filter(name__in=candidates, refcount__gt=0).values_list(
+                "name", flat=True
+            )
+        )
+        self.counted += len(counted)
+
+        for name in sorted(candidates - counted):
+            self.stats["orphans"] += 1
+            self.stats["orphan_bytes"] += sizes[name]
+            if self.dry_run:
+                self.stdout.write(name)
+                continue
+            try:
+                os.remove(Path(root, name))
+            except FileNotFoundError:
+                continue
+            except OSError as e:
+                logger.error(f"Error removing orphan {name}: {e}")
+                continue
+            self.stats["deleted"] += 1
+            logger.info(f"Removed orphan media file {name}")
+        if not self.dry_run:
+            MediaBlob.objects.filter(name__in=candidates - counted).delete()
+
+    def _report(self, elapsed: float) -> None:
+        stats = self.stats
+        rate = stats["scanned"] / elapsed if elapsed else 0
+        self.stdout.write(
+            f"Scanned {stats['scanned']} files "
+            f"({stats['scanned_bytes'] / MB:.1f} MB) in {elapsed:.2f}s, "
+            f"{rate:.0f} files/s"
+        )
+        action = "Would delete" if self.dry_run else "Deleted"
+        deleted = stats["orphans"] if self.dry_run else stats["deleted"]
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{action} {deleted} of {stats['orphans']} orphan files "
+                f"({stats['orphan_bytes'] / MB:.1f} MB)"
+            )
+        )
+        if self.counted:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"{self.counted} unreferenced blobs still have a reference "
+                    "count and were kept"
+                )
+            )
@@ -0,0 +1,51 @@
+"""Backfill the stored full-text search vector of posts."""
+
+import logging
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from blog.models import POST_SEARCH_VECTOR, Post
+
+logger = logging.getLogger("blog")
+
+# Constants
+DEFAULT_BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = "Recompute Post.search_vector in pk-ranged batches (PostgreSQL only)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Recompute every post, not only ones without a vector",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help="Rows updated per statement",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("Full-text search vectors require PostgreSQL")
+
+        posts = Post.objects.all()
+        if not options["all"]:
+            posts = posts.filter(search_vector__isnull=True)
+        batch_size = max(1, options["batch_size"])
+
+        pks = list(posts.order_by("pk").values_list("pk", flat=True))
+        updated = 0
+        for start in range(0, len(pks), batch_size):
+            batch = pks[start : start + batch_size]
+            # Один UPDATE на пачку: вектор считается на стороне БД
+            updated += Post.objects.filter(pk__in=batch).update(
+                search_vector=POST_SEARCH_VECTOR
+            )
+            logger.info(f"Updated search vectors for {updated}/{len(pks)} posts")
+
+        self.stdout.write(self.style.SUCCESS(f"Updated {updated} posts"))
@@ -1,12 +1,40 @@
-from typing import TYPE_CHECKING, Literal, Self, cast
+from typing import TYPE_CHECKING, Self
 
 from django.contrib.auth.models import User
-from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
-from django.db import models
+from django.contrib.contenttypes.fields import GenericRelation
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+    SearchVectorField,
+)
+from django.db import connection, models
+from django.db.models import F, Q, Subquery
+from django.db.models.functions import Cast
 from django.urls import reverse
 from django.utils import timezone
+from django.utils.functional import cached_property
+from django.utils.safestring import mark_safe
 from taggit.managers import TaggableManager
 
+from .indexes import PostgresGinIndex
+from .query import ParsedQuery
+from .rendering import (
+    BODY_DERIVED_FIELDS,
+    RENDER_VERSION,
+    render_markdown,
+    render_post_body,
+)
+from .storage import blob_storage
+
+# Поля Post, исходные значения которых запоминаются при загрузке из БД
+TRACKED_FIELDS = ("title", "body", "status", "category_id", "slug", "publish")
+
+# Взвешенный поисковый вектор: совпадения в заголовке важнее, чем в тексте
+POST_SEARCH_VECTOR = SearchVector("title", weight="A") + SearchVector(
+    "body", weight="B"
+)
+
 
 class PublishedManager(models.Manager):
     def get_queryset(self):
@@ -97,6 +125,21 @@ class Post(models.Model):
     )
 
     body = models.TextField()
+    # Заполняются при сохранении, см. Post.refresh_rendered_body
+    body_html = models.TextField(blank=True, default="", editable=False)
+    toc_html = models.TextField(blank=True, default="", editable=False)
+    body_html_version = models.CharField(
+        max_length=40, blank=True, default="", editable=False
+    )
+    excerpt = models.TextField(blank=True, default="", editable=False)
+    word_count = models.PositiveIntegerField(default=0, editable=False)
+    reading_time = models.PositiveSmallIntegerField(
+        default=0, editable=False, help_text="Minutes"
+    )
+    # Обновляется при сохранении (только PostgreSQL), см. update_search_vector
+    search_vector = SearchVectorField(null=True, editable=False)
+    # Строка статистики комментариев удаляется вместе с постом
+    comment_stats = GenericRelation("comments.CommentStats")
 
     objects = models.Manager()  # менеджер, применяемый по умолчанию
     published = PublishedManager()  # конкретно-прикладной менеджер
@@ -108,11 +151,28 @@ class Post(models.Model):
         ordering = ["-publish"]
         indexes = [
             models.Index(fields=["-publish"]),
+            PostgresGinIndex(fields=["search_vector"], name="blog_post_search_gin"),
+            # Нечеткий поиск по заголовкам (pg_trgm, см. blog.search)
+            PostgresGinIndex(
+                fields=["title"],
+                name="blog_post_title_trgm",
+                opclasses=["gin_trgm_ops"],
+            ),
         ]
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or "body" in update_fields:
+            if self.refresh_rendered_body() and update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, *BODY_DERIVED_FIELDS}
+        super().save(*args, **kwargs)
+        if update_fields is None or {"title", "body"} & set(update_fields):
+            self.update_search_vector()
+        self._loaded_values = self._get_tracked_values()
+
     def get_absolute_url(self):
         if self.category is None:
             raise ValueError("Post.category is None; cannot build absolute URL")
@@ -127,75 +187,153 @@ class Post(models.Model):
             ],
         )
 
-    def get_image(self, image_type: str):
-        """Список файлов"""
-        return (
-            self.images.filter(image_type=image_type)
-            .values_list("image", flat=True)
-            .first()
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Запоминаем исходные значения, чтобы отличать реальные изменения
+        # (перерендер body, инвалидация кэша при смене статуса/категории)
+        instance._loaded_values = instance._get_tracked_values()
+        return instance
+
+    def _get_tracked_values(self) -> dict:
+        return {name: self.__dict__.get(name) for name in TRACKED_FIELDS}
+
+    def get_loaded_value(self, name: str):
+        """Value of a tracked field as it was loaded from the database."""
+        return getattr(self, "_loaded_values", {}).get(name)
+
+    def refresh_rendered_body(self, force: bool = False) -> bool:
+        """
+        Re-render body markdown and the list teaser (excerpt, word count,
+        reading time) if the body changed or the renderer config did.
+
+        Returns:
+            True if the stored HTML was updated
+        """
+        body_changed = self.get_loaded_value("body") != self.body
+        if not (force or body_changed or self.body_html_version != RENDER_VERSION):
+            return False
+        for field_name, value in render_post_body(self.body).items():
+            setattr(self, field_name, value)
+        self.__dict__.pop("_rendered", None)
+        return True
+
+    def update_search_vector(self, force: bool = False) -> None:
+        """Recompute the stored search vector if title or body changed."""
+        if connection.vendor != "postgresql":
+            return
+        changed = any(
+            self.get_loaded_value(name) != getattr(self, name)
+            for name in ("title", "body")
         )
+        if force or changed:
+            Post.objects.filter(pk=self.pk).update(search_vector=POST_SEARCH_VECTOR)
+
+    @cached_property
+    def _rendered(self) -> tuple[str, str]:
+        """Stored (body HTML, TOC HTML), rendered for rows not yet re-rendered."""
+        if self.body_html_version == RENDER_VERSION:
+            return self.body_html, self.toc_html
+        return render_markdown(self.body)
+
+    @property
+    def rendered_body(self) -> str:
+        return mark_safe(self._rendered[0])
+
+    @property
+    def rendered_toc(self) -> str:
+        return mark_safe(self._rendered[1])
+
+    def _get_images_by_type(self) -> dict[str, "Images"]:
+        """
+        First image of each type, keyed by image_type.
+
+        Uses ``prefetch_related("images")`` data when present, otherwise
+        loads all images of the post with a single query. The map is cached
+        on the instance.
+        """
+        image_map = getattr(self, "_image_map", None)
+        if image_map is None:
+            prefetched = getattr(self, "_prefetched_objects_cache", {})
+            if "images" in prefetched:
+                images = prefetched["images"]
+            else:
+                images = self.images.all()
+            image_map = {}
+            for image in sorted(images, key=lambda image: image.pk or 0):
+                image_map.setdefault(image.image_type, image)
+            self._image_map = image_map
+        return image_map
+
+    def get_image(self, image_type: str):
+        """Путь к файлу изображения указанного типа"""
+        image = self._get_images_by_type().get(image_type)
+        return image.image.name if image else None
 
     @classmethod
-    def get_posts_by_search(cls, search):
-        search_vector = SearchVector("title", "body")
-        search_query = SearchQuery(search)
+    def get_posts_by_search(cls, query: ParsedQuery):
+        # tsquery собран из экранированных лексем, см. blog.query
+        search_query = SearchQuery(query.tsquery, search_type="raw")
+        # ts_rank возвращает real; приводим к double precision, чтобы значение
+        # точно совпадало при сравнении в курсоре пагинации
+        rank = Cast(SearchRank(F("search_vector"), search_query), models.FloatField())
         results = (
-            cls.published.annotate(
-                search=search_vector, rank=SearchRank(search_vector, search_query)
-            )
-            .filter(search=search_query)
-            .order_by("-rank")
+            cls.published.filter(search_vector=search_query)
+            .annotate(rank=rank)
+            .order_by("-rank", "-publish", "-pk")
         )
         return results
 
     @classmethod
-    def get_prev_next_posts(
-        cls,
-        url_path: str,
-        pk: int,
-        option: Literal["next", "prev"],
-        sorted_by_pk: str,
-    ) -> Self | None:
-        if option == "next":
-            return cast(
-                Self | None,
-                cls.objects.filter(
-                    category__url_path=url_path,
-                    status=cls.Status.PUBLISHED,
-                    pk__gt=pk,
-                )
-                .order_by(sorted_by_pk)
-                .first(),
-            )
-        else:
-            return cast(
-                Self | None,
-                cls.objects.filter(
-                    category__url_path=url_path,
-                    status=cls.Status.PUBLISHED,
-                    pk__lt=pk,
-                )
-                .order_by(sorted_by_pk)
-                .first(),
-            )
+    def get_neighbours(cls, post: "Post") -> tuple[Self | None, Self | None]:
+        """
+        Previous and next published posts of the same category (by pk).
+
+        Both neighbours are fetched in a single query with their category
+        preloaded, so building their urls costs nothing extra.
+
+        Returns:
+            Tuple of (previous post, next post)
+        """
+        siblings = cls.objects.filter(
+            category_id=post.category_id, status=cls.Status.PUBLISHED
+        )
+        previous_pk = siblings.filter(pk__lt=post.pk).order_by("-pk").values("pk")[:1]
+        next_pk = siblings.filter(pk__gt=post.pk).order_by("pk").values("pk")[:1]
+        neighbours = (
+            cls.objects.select_related("category")
+            .filter(Q(pk=Subquery(previous_pk)) | Q(pk=Subquery(next_pk)))
+            .only("title", "slug", "publish", "category__url_path")
+        )
+
+        previous_post = next_post = None
+        for neighbour in neighbours:
+            if neighbour.pk < post.pk:
+                previous_post = neighbour
+            else:
+                next_post = neighbour
+        return previous_post, next_post
 
     @property
     def get_path_image_thumbnail(self):
-        """Список файлов"""
-        return (
-            self.images.filter(image_type="thumbnail")
-            .values_list("thumbnail", flat=True)
-            .first()
-        )
+        """Путь к миниатюре поста"""
+        image = self._get_images_by_type().get("thumbnail")
+        return image.thumbnail.name if image else None
 
     @property
     def get_path_image_main(self):
-        """Список файлов"""
-        return (
-            self.images.filter(image_type="main")
-            .values_list("image", flat=True)
-            .first()
-        )
+        """Путь к основному изображению поста"""
+        return self.get_image("main")
+
+    @property
+    def main_image(self) -> "Images | None":
+        """Основное изображение поста (для responsive_image)"""
+        return self._get_images_by_type().get("main")
+
+    @property
+    def thumbnail_image(self) -> "Images | None":
+        """Изображение-миниатюра поста (для responsive_image)"""
+        return self._get_images_by_type().get("thumbnail")
 
     @classmethod
     def get_status_choices(cls):
@@ -206,6 +344,7 @@ class Images(models.Model):
     if TYPE_CHECKING:
         pk: int | None
         post_id: int | None
+        variants: models.Manager["ImageVariant"]
 
         def get_image_type_display(self) -> str: ...
 
@@ -215,11 +354,32 @@ class Images(models.Model):
         ("thumbnail", "Миниатюра"),
     ]
 
-    image = models.ImageField(blank=True)
-    thumbnail = models.ImageField(
-        upload_to="%Y/%m/%d/thumbnails", blank=True, null=True
-    )
+    class Status(models.TextChoices):
+        PROCESSING = "processing", "Обрабатывается"
+        READY = "ready", "Готово"
+        FAILED = "failed", "Ошибка обработки"
+
+    # Файлы хранятся один раз на содержимое, см. blog.storage
+    image = models.ImageField(blank=True, storage=blob_storage)
+    thumbnail = models.ImageField(blank=True, null=True, storage=blob_storage)
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="images")
+    # Миниатюра строится фоновой задачей, см. blog.jobs
+    status = models.CharField(
+        max_length=10, choices=Status.choices, default=Status.READY, editable=False
+    )
+
+    # Заполняются при обработке (blog.signals.image_metadata): шаблоны
+    # выводят размеры и заглушку, не открывая файл
+    width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    size = models.PositiveBigIntegerField(
+        null=True, blank=True, editable=False, help_text="Bytes"
+    )
+    dominant_color = models.CharField(
+        max_length=7, blank=True, default="", editable=False
+    )
+    # data: URI крошечной JPEG копии (LQIP)
+    placeholder = models.TextField(blank=True, default="", editable=False)
 
     image_type = models.CharField(
         max_length=10,
@@ -232,3 +392,75 @@ class Images(models.Model):
         image_id = self.pk if self.pk is not None else "unsaved"
         post_id = self.post_id if self.post_id is not None else "unsaved"
         return f"{self.get_image_type_display()} (id={image_id}) для поста id={post_id}"
+
+
+class ImageVariant(models.Model):
+    """Resized copy of an image in one format, for ``srcset``."""
+
+    if TYPE_CHECKING:
+        image_id: int
+
+    image = models.ForeignKey(Images, on_delete=models.CASCADE, related_name="variants")
+    file = models.ImageField(storage=blob_storage)
+    # Формат: avif, webp или jpeg (см. blog.signals.VARIANT_FORMATS)
+    format = models.CharField(max_length=10)
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    size = models.PositiveIntegerField(help_text="Bytes")
+
+    class Meta:
+        ordering = ["width"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["image", "format", "width"], name="blog_imagevariant_unique"
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.width}w {self.format} of image id={self.image_id}"
+
+
+class ImageJob(models.Model):
+    """Queued background processing of an uploaded image, see blog.jobs."""
+
+    if TYPE_CHECKING:
+        image_id: int
+
+    class Status(models.TextChoices):
+        PENDING = "pending", "В очереди"
+        RUNNING = "running", "Выполняется"
+        FAILED = "failed", "Ошибка"
+
+    image = models.ForeignKey(Images, on_delete=models.CASCADE, related_name="jobs")
+    kind = models.CharField(max_length=20)
+    # Файл, для которого поставлена задача: после замены задача устаревает
+    source_name = models.CharField(max_length=255)
+    status = models.CharField(
+        max_length=10, choices=Status.choices, default=Status.PENDING
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default="")
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "run_after"], name="blog_imagejob_queue"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.kind} job for image id={self.image_id} ({self.status})"
+
+
+class MediaBlob(models.Model):
+    """Stored file of ContentAddressedStorage and its number of references."""
+
+    name = models.CharField(max_length=255, unique=True)
+    size = models.PositiveBigIntegerField(help_text="Bytes")
+    # Ссылки полей Images.image, Images.thumbnail и ImageVariant.file
+    refcount = models.PositiveIntegerField(default=0)
+    created = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        return f"{self.name} ({self.refcount} refs)"
@@ -0,0 +1,309 @@
+"""Keyset (cursor) pagination for post listings.
+
+Instead of ``COUNT(*)`` + ``OFFSET`` the paginator seeks on an ordered tuple
+of columns (e.g. ``(publish, pk)``), so every page costs one indexed
+``... WHERE (publish, pk) < (...) LIMIT n`` query regardless of depth.
+Cursors are opaque url-safe tokens, the total count is optional and cached.
+``IdListPaginator`` pages through a precomputed list of ids with the same
+page API (cached search results).
+"""
+
+import base64
+import hashlib
+import json
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal
+from uuid import UUID
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db.models import Q, QuerySet
+
+logger = logging.getLogger("blog")
+
+# Constants
+COUNT_CACHE_PREFIX = "blog:keyset:count"
+DEFAULT_COUNT_TTL = 300
+
+
+class InvalidCursor(ValueError):
+    """Cursor could not be decoded or does not match the ordering."""
+
+
+def _dump_value(value):
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    if isinstance(value, Decimal):
+        return {"dec": str(value)}
+    if isinstance(value, UUID):
+        return {"uuid": str(value)}
+    return value
+
+
+def _load_value(value):
+    if isinstance(value, dict):
+        if "dt" in value:
+            return datetime.fromisoformat(value["dt"])
+        if "dec" in value:
+            return Decimal(value["dec"])
+        if "uuid" in value:
+            return UUID(value["uuid"])
+        raise InvalidCursor("Unknown cursor value type")
+    return value
+
+
+@dataclass(frozen=True)
+class Cursor:
+    """Position between two rows: key values of a boundary row and direction."""
+
+    values: tuple
+    backwards: bool = False
+
+    def encode(self) -> str:
+        payload = {
+            "v": [_dump_value(value) for value in self.values],
+            "b": int(self.backwards),
+        }
+        raw = json.dumps(payload, separators=(",", ":")).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    @classmethod
+    def decode(cls, token: str) -> "Cursor":
+        try:
+            raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+            payload = json.loads(raw)
+            values = tuple(_load_value(value) for value in payload["v"])
+            return cls(values=values, backwards=bool(payload.get("b", 0)))
+        except (ValueError, KeyError, TypeError) as e:
+            raise InvalidCursor(f"Invalid cursor: {token!r}") from e
+
+
+class KeysetPage:
+    """Page of results, API-compatible with the bits templates use."""
+
+    def __init__(
+        self,
+        object_list: list,
+        paginator: "KeysetPaginator | IdListPaginator",
+        has_next: bool,
+        has_previous: bool,
+    ):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __repr__(self):
+        return f"<KeysetPage: {len(self.object_list)} items>"
+
+    def has_next(self) -> bool:
+        return self._has_next
+
+    def has_previous(self) -> bool:
+        return self._has_previous
+
+    def has_other_pages(self) -> bool:
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self) -> str | None:
+        if not self._has_next or not self.object_list:
+            return None
+        return self.paginator.cursor_after(self.object_list[-1])
+
+    @property
+    def previous_cursor(self) -> str | None:
+        if not self._has_previous or not self.object_list:
+            return None
+        return self.paginator.cursor_before(self.object_list[0])
+
+
+class KeysetPaginator:
+    """
+    Cursor paginator seeking on a fixed ordering.
+
+    Args:
+        queryset: Base queryset (filters, select/prefetch related); a
+            ``values()`` queryset works if it selects the ordering keys
+        per_page: Page size
+        ordering: Ordering keys, e.g. ("-publish", "-pk"). The last key must
+            be unique so that the ordering is total.
+    """
+
+    def __init__(self, queryset: QuerySet, per_page: int, ordering: tuple[str, ...]):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = ordering
+        self.keys = [key.lstrip("-") for key in ordering]
+        self.descending = [key.startswith("-") for key in ordering]
+
+    # ---------- cursors ----------
+    def _key_values(self, obj) -> tuple:
+        # Строки values() - словари
+        if isinstance(obj, dict):
+            return tuple(obj[key] for key in self.keys)
+        return tuple(getattr(obj, key) for key in self.keys)
+
+    def cursor_after(self, obj) -> str:
+        return Cursor(self._key_values(obj)).encode()
+
+    def cursor_before(self, obj) -> str:
+        return Cursor(self._key_values(obj), backwards=True).encode()
+
+    def _seek_filter(self, values: tuple, backwards: bool) -> Q:
+        """
+        Lexicographic "strictly after ``values``" condition for the ordering
+        (or "strictly before" when paginating backwards).
+        """
+        condition = Q()
+        equal = Q()
+        for key, descending, value in zip(
+            self.keys, self.descending, values, strict=True
+        ):
+            lookup = "lt" if descending != backwards else "gt"
+            condition |= equal & Q(**{f"{key}__{lookup}": value})
+            equal &= Q(**{key: value})
+        return condition
+
+    def _reversed_ordering(self) -> list[str]:
+        return [key[1:] if key.startswith("-") else f"-{key}" for key in self.ordering]
+
+    # ---------- pages ----------
+    def page(self, token: str | None = None) -> KeysetPage:
+        """Return the page following (or preceding) the given cursor."""
+        cursor = Cursor.decode(token) if token else None
+        if cursor is not None and len(cursor.values) != len(self.keys):
+            raise InvalidCursor("Cursor does not match ordering")
+
+        if cursor is None:
+            rows = list(self.queryset.order_by(*self.ordering)[: self.per_page + 1])
+            has_more = len(rows) > self.per_page
+            return KeysetPage(rows[: self.per_page], self, has_more, False)
+
+        try:
+            # Подделанный курсор: значение не приводится к типу поля
+            qs = self.queryset.filter(
+                self._seek_filter(cursor.values, cursor.backwards)
+            )
+        except (ValidationError, ValueError, TypeError) as e:
+            raise InvalidCursor("Cursor values do not match ordering") from e
+        if cursor.backwards:
+            qs = qs.order_by(*self._reversed_ordering())
+            rows = list(qs[: self.per_page + 1])
+            has_more = len(rows) > self.per_page
+            rows = rows[: self.per_page]
+            rows.reverse()
+            return KeysetPage(rows, self, True, has_more)
+
+        qs = qs.order_by(*self.ordering)
+        rows = list(qs[: self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        return KeysetPage(rows[: self.per_page], self, has_more, True)
+
+    def cursor_for_page_number(self, number: int) -> str | None:
+        """
+        Cursor pointing at the start of an old-style numbered page.
+
+        Used only to redirect legacy ``?page=N`` urls, so the single OFFSET
+        query is paid once per stale link. Returns None for the first page
+        or when the page is out of range.
+        """
+        if number <= 1:
+            return None
+        offset = (number - 1) * self.per_page - 1
+        values = (
+            self.queryset.order_by(*self.ordering)
+            .values_list(*self.keys)[offset : offset + 1]
+            .first()
+        )
+        if values is None:
+            return None
+        return Cursor(tuple(values)).encode()
+
+    # ---------- count ----------
+    def _count_cache_key(self) -> str:
+        digest = hashlib.md5(str(self.queryset.query).encode()).hexdigest()
+        return f"{COUNT_CACHE_PREFIX}:{digest}"
+
+    def get_count(self) -> int:
+        """Total number of rows, cached for BLOG_PAGINATION_COUNT_TTL seconds."""
+        cache_key = self._count_cache_key()
+        count = cache.get(cache_key)
+        if count is None:
+            count = self.queryset.count()
+            ttl = getattr(settings, "BLOG_PAGINATION_COUNT_TTL", DEFAULT_COUNT_TTL)
+            cache.set(cache_key, count, ttl)
+            logger.debug(f"Cached listing count {count} under {cache_key}")
+        return count
+
+
+class IdListPaginator:
+    """
+    Paginator over a precomputed, ordered list of primary keys.
+
+    Used for cached search results: a page only hydrates its own rows with
+    one ``pk IN (...)`` query. Cursors encode the offset into the list.
+
+    Args:
+        queryset: Queryset used to hydrate rows (select/prefetch related)
+        ids: Ordered primary keys
+        per_page: Page size
+        count: Total number of rows when ``ids`` is truncated (defaults to
+            the length of the list)
+    """
+
+    def __init__(
+        self, queryset: QuerySet, ids: list, per_page: int, count: int | None = None
+    ):
+        self.queryset = queryset
+        self.ids = ids
+        self.per_page = per_page
+        self.count = len(ids) if count is None else count
+
+    def _offset_cursor(self, offset: int) -> str:
+        return Cursor((offset,)).encode()
+
+    def page(self, token: str | None = None) -> KeysetPage:
+        offset = 0
+        if token:
+            cursor = Cursor.decode(token)
+            if len(cursor.values) != 1 or not isinstance(cursor.values[0], int):
+                raise InvalidCursor("Cursor does not match id list")
+            offset = max(0, cursor.values[0])
+
+        page_ids = self.ids[offset : offset + self.per_page]
+        rows_by_pk = self.queryset.in_bulk(page_ids) if page_ids else {}
+        rows = [rows_by_pk[pk] for pk in page_ids if pk in rows_by_pk]
+        return KeysetPage(
+            rows,
+            self,
+            has_next=offset + self.per_page < len(self.ids),
+            has_previous=offset > 0,
+        )
+
+    def cursor_after(self, obj) -> str:
+        return self._offset_cursor(self.ids.index(obj.pk) + 1)
+
+    def cursor_before(self, obj) -> str:
+        return self._offset_cursor(max(0, self.ids.index(obj.pk) - self.per_page))
+
+    def cursor_for_page_number(self, number: int) -> str | None:
+        offset = (number - 1) * self.per_page
+        if number <= 1 or offset >= len(self.ids):
+            return None
+        return self._offset_cursor(offset)
+
+    def get_count(self) -> int:
+        return self.count
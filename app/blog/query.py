@@ -0,0 +1,149 @@
+"""Parsing of user search input into a structured full-text query.
+
+The input is scanned once with a single compiled pattern (instead of a chain
+of ``re.sub`` passes). Markup and script-ish fragments are dropped, quoted
+phrases, ``-excluded`` words and ``prefix*`` words are recognized, and
+everything else (punctuation, SQL-looking operators) is ignored. Lexemes
+are quoted when the raw ``tsquery`` is built, so no input can change the
+query structure; the result is passed to ``SearchQuery(search_type="raw")``.
+
+Parsed queries are memoized, hot queries are parsed once per process.
+"""
+
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+
+# Constants
+# Длиннее ввод не разбираем (ограничивает работу регулярного выражения)
+MAX_INPUT_LENGTH = 200
+MAX_QUERY_WORDS = 10
+PARSE_CACHE_SIZE = 1024
+
+QUERY_TOKEN_RE = re.compile(
+    r"""
+    (?P<junk>
+        <(?P<tag>script|iframe)\b.*?</(?P=tag)\s*>  # script и iframe с содержимым
+        | <[^>]*>                                   # прочие HTML теги
+        | \b(?:java|vb)script:                      # JS/VBScript протоколы
+        | \bon\w+\s*=                               # HTML события
+    )
+    | (?P<exclude>-)?
+      (?:
+          "(?P<phrase>[^"]*)"                       # "точная фраза"
+          | (?P<word>\w+)(?P<prefix>\*)?            # слово или префикс*
+      )
+    """,
+    re.IGNORECASE | re.DOTALL | re.VERBOSE,
+)
+WORD_RE = re.compile(r"\w+")
+
+
+def _lexeme(word: str, prefix: bool = False) -> str:
+    # Слова состоят из \w, кавычки экранируются на всякий случай
+    quoted = "'{}'".format(word.replace("'", "''"))
+    return f"{quoted}:*" if prefix else quoted
+
+
+def _phrase_tsquery(phrase: tuple[str, ...]) -> str:
+    if len(phrase) == 1:
+        return _lexeme(phrase[0])
+    return "({})".format(" <-> ".join(_lexeme(word) for word in phrase))
+
+
+def _phrase_text(phrase: tuple[str, ...]) -> str:
+    return phrase[0] if len(phrase) == 1 else '"{}"'.format(" ".join(phrase))
+
+
+@dataclass(frozen=True)
+class ParsedQuery:
+    """Search query split into words, prefixes, phrases and exclusions."""
+
+    words: tuple[str, ...] = ()
+    prefixes: tuple[str, ...] = ()
+    phrases: tuple[tuple[str, ...], ...] = ()
+    # Исключенные слова и фразы
+    excluded: tuple[tuple[str, ...], ...] = ()
+
+    def __bool__(self):
+        # Запрос из одних исключений ничего не ищет
+        return bool(self.words or self.prefixes or self.phrases)
+
+    @property
+    def text(self) -> str:
+        """Normalized query text (search box value, cache key)."""
+        return " ".join(
+            [
+                *self.words,
+                *(f"{prefix}*" for prefix in self.prefixes),
+                *(_phrase_text(phrase) for phrase in self.phrases),
+                *(f"-{_phrase_text(phrase)}" for phrase in self.excluded),
+            ]
+        )
+
+    @property
+    def plain_text(self) -> str:
+        """Positive words only, for fuzzy matching."""
+        words = [*self.words, *self.prefixes]
+        words += [word for phrase in self.phrases for word in phrase]
+        return " ".join(words)
+
+    @property
+    def tsquery(self) -> str:
+        """Raw ``tsquery``, e.g. ``'a' & 'b':* & ('c' <-> 'd') & !'e'``."""
+        return " & ".join(
+            [
+                *(_lexeme(word) for word in self.words),
+                *(_lexeme(prefix, prefix=True) for prefix in self.prefixes),
+                *(_phrase_tsquery(phrase) for phrase in self.phrases),
+                *(f"!{_phrase_tsquery(phrase)}" for phrase in self.excluded),
+            ]
+        )
+
+
+EMPTY_QUERY = ParsedQuery()
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _parse(raw: str) -> ParsedQuery:
+    words, prefixes, phrases, excluded = [], [], [], []
+    count = 0
+    for match in QUERY_TOKEN_RE.finditer(raw):
+        if match["junk"]:
+            continue
+        if match["phrase"] is not None:
+            tokens = tuple(WORD_RE.findall(match["phrase"]))
+        else:
+            tokens = (match["word"],)
+        if not tokens or count + len(tokens) > MAX_QUERY_WORDS:
+            continue
+
+        if match["exclude"]:
+            target, item = excluded, tokens
+        elif len(tokens) > 1:
+            target, item = phrases, tokens
+        elif match["prefix"]:
+            target, item = prefixes, tokens[0]
+        else:
+            target, item = words, tokens[0]
+        if item not in target:
+            target.append(item)
+            count += len(tokens)
+
+    return ParsedQuery(tuple(words), tuple(prefixes), tuple(phrases), tuple(excluded))
+
+
+def parse_query(query: str) -> ParsedQuery:
+    """
+    Parse user search input.
+
+    Args:
+        query: Raw value of the ``search`` parameter
+
+    Returns:
+        Parsed query, falsy when there is nothing to search for
+    """
+    if not query:
+        return EMPTY_QUERY
+    # Регистр и пробелы не различаем: одинаковые запросы попадают в кэш
+    return _parse(" ".join(query[:MAX_INPUT_LENGTH].lower().split()))
@@ -0,0 +1,221 @@
+"""Rate limiting of client actions (search, comment submission).
+
+Counters live in the shared cache and are only changed with ``add``/``incr``,
+and their expiry is fixed when a counter is created (hits never extend it). Each
+action has a policy:
+
+* ``sliding`` - sliding window: the current fixed window counter plus the
+  previous one weighted by how much of it still overlaps the window;
+* ``bucket`` - token bucket: ``limit`` tokens refilled evenly over
+  ``window`` seconds, so short bursts are allowed.
+
+Rejected clients are also remembered in process memory until they may
+retry, so hammering costs no cache round trips.
+
+``incr`` is atomic only on backends that implement it natively (locmem,
+memcached, redis). File and database caches emulate it with ``get`` + ``set``,
+so concurrent hits from several workers may be lost and the limiter
+undercounts; the ``blog.W001`` system check warns about such a cache.
+"""
+
+import logging
+import math
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.base import BaseCache
+
+logger = logging.getLogger("blog")
+
+# Constants
+RATE_LIMIT_PREFIX = "blog:ratelimit"
+SLIDING_WINDOW = "sliding"
+TOKEN_BUCKET = "bucket"
+# Ведро живет столько окон, потом начинается заново (полным)
+BUCKET_EPOCH_WINDOWS = 10
+# Не держим в памяти больше стольких заблокированных клиентов
+FAST_REJECT_MAX_SIZE = 10000
+
+
+@dataclass(frozen=True)
+class RatePolicy:
+    """At most ``limit`` hits per ``window`` seconds."""
+
+    limit: int
+    window: int
+    algorithm: str = SLIDING_WINDOW
+
+
+DEFAULT_POLICIES = {
+    # Поиск: допускаем серию запросов подряд
+    "search": RatePolicy(limit=15, window=60, algorithm=TOKEN_BUCKET),
+    "comment": RatePolicy(limit=3, window=60 * 60),
+}
+
+
+@dataclass(frozen=True)
+class RateLimitResult:
+    allowed: bool
+    retry_after: float = 0
+    # Счетчик, учтенный при пропуске (для refund)
+    key: str | None = None
+
+    def __bool__(self):
+        return self.allowed
+
+
+# ключ клиента -> time.monotonic(), до которого он отклоняется без кэша
+_blocked: dict[str, float] = {}
+
+
+def get_policy(action: str) -> RatePolicy:
+    """Policy of an action, overridable with the BLOG_RATE_LIMITS setting."""
+    overrides = getattr(settings, "BLOG_RATE_LIMITS", {})
+    if action in overrides:
+        return RatePolicy(**overrides[action])
+    return DEFAULT_POLICIES[action]
+
+
+def get_client_ip(request) -> str | None:
+    """Получение IP клиента."""
+    x_forwarded_for = request.META.get("HTTP_X_FORWARDED_FOR")
+    if x_forwarded_for:
+        return x_forwarded_for.split(",")[0].strip()
+    return request.META.get("REMOTE_ADDR")
+
+
+# ---------- counters ----------
+def has_native_incr(alias: str = DEFAULT_CACHE_ALIAS) -> bool:
+    """Whether the cache implements ``incr`` itself rather than get + set."""
+    # locmem, memcached и redis реализуют incr атомарно
+    return type(caches[alias]).incr is not BaseCache.incr
+
+
+def _incr(key: str, delta: int, timeout: int) -> int:
+    """Add ``delta`` to a counter created with a fixed timeout."""
+    cache.add(key, 0, timeout)
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        # Счетчик истек между add и incr
+        cache.add(key, max(delta, 0), timeout)
+        return max(delta, 0)
+
+
+def _decr(key: str) -> None:
+    try:
+        cache.decr(key)
+    except ValueError:
+        pass
+
+
+# ---------- algorithms ----------
+def _sliding_window(key: str, policy: RatePolicy, now: float) -> RateLimitResult:
+    index = int(now // policy.window)
+    elapsed = now - index * policy.window
+    current_key = f"{key}:{index}"
+    count = _incr(current_key, 1, 2 * policy.window)
+    previous = cache.get(f"{key}:{index - 1}", 0)
+
+    overlap = (policy.window - elapsed) / policy.window
+    if previous * overlap + count <= policy.limit:
+        return RateLimitResult(True, key=current_key)
+
+    _decr(current_key)
+    count -= 1
+    if count >= policy.limit or not previous:
+        retry_after = policy.window - elapsed
+    else:
+        # Ждем, пока вклад предыдущего окна не уменьшится на один запрос
+        free_after = (policy.limit - count - 1) * policy.window / previous
+        retry_after = max(policy.window - elapsed - free_after, 1)
+    return RateLimitResult(False, retry_after)
+
+
+def _token_bucket(key: str, policy: RatePolicy, now: float) -> RateLimitResult:
+    rate = policy.limit / policy.window
+    epoch_timeout = policy.window * BUCKET_EPOCH_WINDOWS
+    start_key = f"{key}:start"
+    cache.add(start_key, now, epoch_timeout)
+    start = cache.get(start_key, now)
+
+    # Потраченные жетоны эпохи; заработано: полное ведро + пополнение
+    spent_key = f"{key}:{int(start * 1000)}"
+    spent = _incr(spent_key, 1, epoch_timeout + policy.window)
+    earned = policy.limit + (now - start) * rate
+    overflow = int(earned - (spent - 1) - policy.limit)
+    if overflow > 0:
+        # Ведро было переполнено: лишние жетоны сгорают
+        spent = _incr(spent_key, overflow, epoch_timeout + policy.window)
+
+    if spent <= earned:
+        return RateLimitResult(True, key=spent_key)
+
+    _decr(spent_key)
+    return RateLimitResult(False, (spent - earned) / rate)
+
+
+ALGORITHMS = {
+    SLIDING_WINDOW: _sliding_window,
+    TOKEN_BUCKET: _token_bucket,
+}
+
+
+# ---------- api ----------
+def _remember_block(key: str, retry_after: float) -> None:
+    now = time.monotonic()
+    if len(_blocked) >= FAST_REJECT_MAX_SIZE:
+        for blocked_key, until in list(_blocked.items()):
+            if until <= now:
+                del _blocked[blocked_key]
+        if len(_blocked) >= FAST_REJECT_MAX_SIZE:
+            _blocked.clear()
+    _blocked[key] = now + retry_after
+
+
+def hit(action: str, ident: str) -> RateLimitResult:
+    """
+    Count a hit of ``ident`` (client IP) for an action.
+
+    Args:
+        action: Policy name, e.g. "search" or "comment"
+        ident: Client identifier
+
+    Returns:
+        Result, truthy when the hit is within the limit
+    """
+    policy = get_policy(action)
+    key = f"{RATE_LIMIT_PREFIX}:{action}:{ident}"
+
+    until = _blocked.get(key)
+    if until is not None:
+        remaining = until - time.monotonic()
+        if remaining > 0:
+            return RateLimitResult(False, remaining)
+        _blocked.pop(key, None)
+
+    result = ALGORITHMS[policy.algorithm](key, policy, time.time())
+    if not result.allowed:
+        _remember_block(key, result.retry_after)
+        logger.info(f"Rate limit {action!r} exceeded by {ident}")
+    return result
+
+
+def refund(result: RateLimitResult) -> None:
+    """Give back an allowed hit (e.g. the submitted form was invalid)."""
+    if result.allowed and result.key:
+        _decr(result.key)
+
+
+def check_rate_limit(request, action: str) -> RateLimitResult:
+    """Count a hit of the requesting client; always allowed without an IP."""
+    ip = get_client_ip(request)
+    if not ip:
+        return RateLimitResult(True)
+    return hit(action, ip)
+
+
+def retry_after_header(result: RateLimitResult) -> str:
+    return str(math.ceil(result.retry_after))
@@ -0,0 +1,135 @@
+"""Markdown rendering for post bodies.
+
+The rendered HTML is stored on ``Post`` and stamped with a fingerprint of the
+markdown configuration, so changing extensions or their options marks every
+stored body as stale (see the ``render_posts`` management command).
+"""
+
+import hashlib
+import html
+import json
+import math
+import re
+
+import markdown
+from django.utils.html import strip_tags
+from django.utils.text import Truncator
+
+MARKDOWN_EXTENSIONS = [
+    "markdown.extensions.extra",
+    "markdown.extensions.codehilite",
+    "markdown.extensions.toc",
+    "markdown.extensions.nl2br",
+    "markdown.extensions.sane_lists",
+    "markdown.extensions.fenced_code",
+]
+
+MARKDOWN_EXTENSION_CONFIGS = {
+    "markdown.extensions.codehilite": {
+        "css_class": "highlight",
+    },
+    "markdown.extensions.toc": {
+        "title": "Содержание",
+    },
+}
+
+
+# Увеличивается при изменении того, что render_markdown возвращает
+RENDER_FORMAT = 2
+# Строка-маркер, на месте которой выводится оглавление
+TOC_MARKER_RE = re.compile(r"^[ \t]*\[TOC\][ \t]*$", re.MULTILINE)
+
+
+def _config_fingerprint() -> str:
+    payload = json.dumps(
+        {
+            "format": RENDER_FORMAT,
+            "markdown": markdown.__version__,
+            "extensions": MARKDOWN_EXTENSIONS,
+            "configs": MARKDOWN_EXTENSION_CONFIGS,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha1(payload.encode()).hexdigest()[:12]
+
+
+RENDER_VERSION = _config_fingerprint()
+
+EXCERPT_WORDS = 30
+WORDS_PER_MINUTE = 200
+
+# Поля Post, вычисляемые из body при сохранении
+BODY_DERIVED_FIELDS = (
+    "body_html",
+    "toc_html",
+    "body_html_version",
+    "excerpt",
+    "word_count",
+    "reading_time",
+)
+
+
+def render_markdown(text: str) -> tuple[str, str]:
+    """
+    Render markdown to HTML.
+
+    A ``[TOC]`` marker line is removed from the body; the table of contents
+    is then returned separately (templates place it themselves).
+
+    Args:
+        text: Markdown source
+
+    Returns:
+        Tuple of (body HTML, table of contents HTML or "")
+    """
+    if not text:
+        return "", ""
+    text, markers = TOC_MARKER_RE.subn("", text)
+    # Markdown instances keep state between conversions, so use a fresh one
+    md = markdown.Markdown(
+        extensions=MARKDOWN_EXTENSIONS,
+        extension_configs=MARKDOWN_EXTENSION_CONFIGS,
+    )
+    body_html = md.convert(text)
+    toc_html = md.toc if markers and md.toc_tokens else ""
+    return body_html, toc_html
+
+
+def build_excerpt(body_html: str) -> tuple[str, int, int]:
+    """
+    Build plain-text teaser data from rendered body HTML.
+
+    Args:
+        body_html: Rendered post body
+
+    Returns:
+        Tuple of (excerpt, word count, reading time in minutes)
+    """
+    text = " ".join(html.unescape(strip_tags(body_html)).split())
+    if not text:
+        return "", 0, 0
+    word_count = len(text.split())
+    excerpt = Truncator(text).words(EXCERPT_WORDS)
+    reading_time = max(1, math.ceil(word_count / WORDS_PER_MINUTE))
+    return excerpt, word_count, reading_time
+
+
+def render_post_body(text: str) -> dict:
+    """
+    Compute every stored field derived from a post body.
+
+    Picklable entry point for process pools (see ``render_posts``).
+
+    Returns:
+        Mapping of ``Post`` field name to value, keys match BODY_DERIVED_FIELDS
+    """
+    body_html, toc_html = render_markdown(text)
+    excerpt, word_count, reading_time = build_excerpt(body_html)
+    return {
+        "body_html": body_html,
+        "toc_html": toc_html,
+        "body_html_version": RENDER_VERSION,
+        "excerpt": excerpt,
+        "word_count": word_count,
+        "reading_time": reading_time,
+    }
@@ -0,0 +1,208 @@
+"""Full-text search over posts with a short-lived result cache.
+
+A search resolves to an ordered list of post ids which is cached per
+normalized query. Paging through results then only hydrates one page of
+posts by primary key. Only the first SEARCH_RESULTS_LIMIT ids are kept, the
+real number of matches is cached next to them. Cache keys embed the version
+of the ``posts`` tag, so publishing or editing any post invalidates every
+cached result at once.
+
+When full-text search finds little (typos, word forms the Russian stemmer
+does not know), results are completed by fuzzy trigram matching on titles
+and tags: ``pg_trgm`` on PostgreSQL, an in-process n-gram index over titles
+on other databases.
+"""
+
+import hashlib
+import logging
+import re
+from collections import Counter
+from collections.abc import Collection
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Q
+
+from .cache import TAG_POSTS, get_tag_versions
+from .models import Post
+from .query import ParsedQuery
+
+logger = logging.getLogger("blog")
+
+# Constants
+SEARCH_CACHE_PREFIX = "blog:search"
+DEFAULT_SEARCH_CACHE_TIMEOUT = 60 * 2
+SEARCH_RESULTS_LIMIT = 300
+# Нечеткий поиск включается, если полнотекстовый нашел меньше постов
+FUZZY_MIN_RESULTS = 3
+# Порог сходства (доля триграмм запроса, найденных в заголовке)
+FUZZY_THRESHOLD = 0.4
+
+WORD_RE = re.compile(r"\w+")
+
+
+# ---------- fuzzy matching ----------
+def trigrams(text: str) -> set[str]:
+    """Trigrams of every word, padded the way ``pg_trgm`` does."""
+    grams = set()
+    for word in WORD_RE.findall(text.lower()):
+        padded = f"  {word} "
+        grams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class TitleTrigramIndex:
+    """
+    In-process inverted trigram index over published post titles.
+
+    Fallback for databases without ``pg_trgm``. Scores mirror
+    ``word_similarity``: the share of query trigrams present in a title.
+    """
+
+    def __init__(self, rows):
+        # rows: (pk, title, publish)
+        self.order = {}
+        self.postings: dict[str, list[int]] = {}
+        for position, (pk, title, _publish) in enumerate(
+            sorted(rows, key=lambda row: (row[2], row[0]), reverse=True)
+        ):
+            self.order[pk] = position
+            for gram in trigrams(title):
+                self.postings.setdefault(gram, []).append(pk)
+
+    def search(self, query: str) -> list[int]:
+        query_grams = trigrams(query)
+        if not query_grams:
+            return []
+        shared = Counter(
+            pk for gram in query_grams for pk in self.postings.get(gram, ())
+        )
+        min_shared = FUZZY_THRESHOLD * len(query_grams)
+        matches = [pk for pk, count in shared.items() if count >= min_shared]
+        # Сначала самые похожие, при равенстве - более свежие
+        matches.sort(key=lambda pk: (-shared[pk], self.order[pk]))
+        return matches
+
+
+# (версия тега posts, индекс); перестраивается после изменения постов
+_title_index: tuple[str, TitleTrigramIndex] | None = None
+
+
+def _get_title_index(posts_version: str) -> TitleTrigramIndex:
+    global _title_index
+    if _title_index is None or _title_index[0] != posts_version:
+        rows = Post.published.values_list("pk", "title", "publish")
+        _title_index = (posts_version, TitleTrigramIndex(rows))
+        logger.debug(f"Built title trigram index over {len(rows)} posts")
+    return _title_index[1]
+
+
+def _postgres_fuzzy_ids(
+    query: str, limit: int, exclude: Collection[int]
+) -> tuple[list[int], int]:
+    tagged = Post.objects.filter(tags__name__trigram_similar=query).values("pk")
+    posts = (
+        Post.published.filter(
+            # %> использует триграммный GIN индекс blog_post_title_trgm
+            Q(title__trigram_word_similar=query) | Q(pk__in=tagged)
+        )
+        .exclude(pk__in=exclude)
+        .annotate(similarity=TrigramWordSimilarity(query, "title"))
+        .order_by("-similarity", "-publish", "-pk")
+        .values_list("pk", flat=True)
+    )
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            # Пороги операторов pg_trgm только на время этой транзакции
+            cursor.execute(
+                "SELECT set_config('pg_trgm.word_similarity_threshold', %s, true), "
+                "set_config('pg_trgm.similarity_threshold', %s, true)",
+                [str(FUZZY_THRESHOLD), str(FUZZY_THRESHOLD)],
+            )
+        ids = list(posts[:limit])
+        total = posts.count() if len(ids) == limit else len(ids)
+    return ids, total
+
+
+def get_fuzzy_result_ids(
+    query: str, limit: int, posts_version: str, exclude: Collection[int] = ()
+) -> tuple[list[int], int]:
+    """
+    Ids of published posts whose title (or tag) looks like the query.
+
+    Args:
+        query: Normalized search query
+        limit: Maximum number of ids
+        posts_version: Current version of the ``posts`` cache tag
+        exclude: Post ids already found otherwise
+
+    Returns:
+        Tuple of (post ids, most similar first; total number of matches)
+    """
+    if connection.vendor == "postgresql":
+        return _postgres_fuzzy_ids(query, limit, exclude)
+    matches = [
+        pk for pk in _get_title_index(posts_version).search(query) if pk not in exclude
+    ]
+    return matches[:limit], len(matches)
+
+
+# ---------- results ----------
+@dataclass(frozen=True)
+class SearchResults:
+    """Ordered ids of the best matches and the total number of matches."""
+
+    ids: list[int]
+    # Может быть больше len(ids): список обрезан SEARCH_RESULTS_LIMIT
+    total: int = 0
+
+
+def _search_cache_key(query: ParsedQuery, posts_version: str) -> str:
+    digest = hashlib.md5(query.text.encode()).hexdigest()
+    return f"{SEARCH_CACHE_PREFIX}:{posts_version}:{digest}"
+
+
+def get_search_results(query: ParsedQuery) -> SearchResults:
+    """
+    Ordered ids of published posts matching the query (best match first).
+
+    Args:
+        query: Parsed search query (see ``blog.query.parse_query``)
+
+    Returns:
+        At most SEARCH_RESULTS_LIMIT post ids and the total number of matches
+    """
+    if not query:
+        return SearchResults([])
+
+    posts_version = get_tag_versions([TAG_POSTS])[TAG_POSTS]
+    cache_key = _search_cache_key(query, posts_version)
+    results = cache.get(cache_key)
+    if results is not None:
+        logger.debug(f"Search cache hit for {query.text!r}")
+        return results
+
+    ids, total = [], 0
+    # Полнотекстовый поиск (search_vector) есть только в PostgreSQL
+    if connection.vendor == "postgresql":
+        matches = Post.get_posts_by_search(query).values_list("pk", flat=True)
+        ids = list(matches[:SEARCH_RESULTS_LIMIT])
+        # Полное число совпадений нужно, только если список обрезан
+        total = matches.count() if len(ids) == SEARCH_RESULTS_LIMIT else len(ids)
+    if total < FUZZY_MIN_RESULTS and getattr(settings, "BLOG_SEARCH_FUZZY", True):
+        fuzzy_ids, fuzzy_total = get_fuzzy_result_ids(
+            query.plain_text, SEARCH_RESULTS_LIMIT, posts_version, exclude=set(ids)
+        )
+        ids = (ids + fuzzy_ids)[:SEARCH_RESULTS_LIMIT]
+        total += fuzzy_total
+    results = SearchResults(ids, total)
+
+    timeout = getattr(
+        settings, "BLOG_SEARCH_CACHE_TIMEOUT", DEFAULT_SEARCH_CACHE_TIMEOUT
+    )
+    cache.set(cache_key, results, timeout)
+    logger.info(f"Search {query.text!r}: {total} results, {len(ids)} ids cached")
+    return results
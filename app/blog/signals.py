@@ -1,17 +1,24 @@
 """Signal handlers for blog image management."""
 
 import logging
-import os
-from datetime import datetime
+import tempfile
+from base64 import b64encode
+from contextlib import contextmanager
 from io import BytesIO
 from pathlib import Path
-from uuid import uuid4
+from typing import IO
 
 from django.apps import apps
-from django.core.files.base import ContentFile
-from django.db.models.signals import post_delete, pre_save
+from django.conf import settings
+from django.core.files.base import File
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
-from PIL import Image
+from PIL import ExifTags, Image, ImageOps, features
+
+from .cache import TAG_POSTS, invalidate_tags, post_tag
+from .jobs import PermanentJobError, enqueue, job_handler
+from .storage import BLOB_DIR
 
 logger = logging.getLogger("blog")
 
@@ -19,6 +26,39 @@ logger = logging.getLogger("blog")
 THUMBNAIL_SIZE = (300, 300)
 THUMBNAIL_QUALITY = 85
 DEFAULT_IMAGE_FORMAT = "JPEG"
+THUMBNAIL_JOB = "thumbnail"
+VARIANTS_JOB = "variants"
+DEFAULT_VARIANT_WIDTHS = (320, 640, 960, 1280)
+DEFAULT_VARIANT_FORMATS = ("avif", "webp", "jpeg")
+# Предел декодированных пикселей (24 Мп - около 72 МБ в RGB)
+DEFAULT_MAX_PIXELS = 24_000_000
+# JPEG декодируется минимум вдвое крупнее цели: запас для LANCZOS
+DRAFT_REDUCING_GAP = 2
+
+# Размытая заглушка (LQIP): не больше 16 пикселей по большей стороне
+PLACEHOLDER_SIZE = (16, 16)
+PLACEHOLDER_QUALITY = 40
+# Основной цвет выбирается из палитры такого размера
+DOMINANT_PALETTE_SIZE = 5
+# Поля Images, которые заполняет обработка изображения
+EMPTY_METADATA = {
+    "width": None,
+    "height": None,
+    "size": None,
+    "dominant_color": "",
+    "placeholder": "",
+}
+
+# Формат варианта -> (модуль Pillow, параметры сохранения, MIME тип)
+VARIANT_FORMATS = {
+    "avif": ("avif", {"format": "AVIF", "quality": 55}, "image/avif"),
+    "webp": ("webp", {"format": "WEBP", "quality": 80, "method": 4}, "image/webp"),
+    "jpeg": (
+        "jpg",
+        {"format": "JPEG", "quality": 82, "progressive": True, "optimize": True},
+        "image/jpeg",
+    ),
+}
 
 FORMAT_MAPPING = {
     ".jpg": "JPEG",
@@ -30,42 +70,79 @@ FORMAT_MAPPING = {
 
 # Lazy model loading to avoid circular imports
 Images = apps.get_model("blog", "Images")
+ImageVariant = apps.get_model("blog", "ImageVariant")
 
 
-def generate_unique_filename(original_filename: str) -> str:
+def release_file(field_file) -> None:
     """
-    Generate a unique filename with timestamp directory structure.
+    Drop a field's reference to its file.
 
-    Args:
-        original_filename: Original file name
+    The storage removes a shared blob only with its last reference.
 
-    Returns:
-        New path with format: YYYY/MM/DD/uuid.ext
+    Args:
+        field_file: FieldFile of Images or ImageVariant
     """
-    ext = Path(original_filename).suffix.lower()
-    new_name = f"{uuid4().hex}{ext}"
-    dirname = datetime.now().strftime("%Y/%m/%d")
-    result_path = os.path.join(dirname, new_name)
-    logger.debug(f"Generated unique filename: {result_path}")
-    return result_path
+    if not field_file:
+        return
+    try:
+        field_file.storage.delete(field_file.name)
+        logger.debug(f"Released file: {field_file.name}")
+    except OSError as e:
+        logger.error(f"Error removing file {field_file.name}: {e}")
+
+
+class ImageTooLargeError(PermanentJobError, ValueError):
+    """Decoded image would exceed BLOG_IMAGE_MAX_PIXELS (retrying cannot help)."""
 
 
-def remove_file_if_exists(file_path: str | None) -> None:
+@contextmanager
+def open_image(image_file, target_size: tuple[int, int]):
     """
-    Safely remove file if it exists.
+    Decode an image at the smallest resolution still covering ``target_size``.
+
+    JPEG is decoded in draft mode (DCT scaling by 1/2, 1/4 or 1/8), so a
+    large photo never exists in memory at full resolution. Other formats are
+    decoded in full. EXIF orientation is applied in place.
 
     Args:
-        file_path: Path to the file to remove
-    """
-    if file_path and os.path.isfile(file_path):
-        try:
-            os.remove(file_path)
-            logger.debug(f"Removed file: {file_path}")
-        except OSError as e:
-            logger.error(f"Error removing file {file_path}: {e}")
+        image_file: Django ImageField file object
+        target_size: Size (width, height) the result will be reduced to
 
+    Yields:
+        Loaded PIL image
 
-def create_thumbnail(image_file, max_size: tuple = THUMBNAIL_SIZE) -> BytesIO:
+    Raises:
+        ImageTooLargeError: If the decoded image exceeds BLOG_IMAGE_MAX_PIXELS
+    """
+    max_pixels = getattr(settings, "BLOG_IMAGE_MAX_PIXELS", DEFAULT_MAX_PIXELS)
+    with Image.open(image_file) as img:
+        original_size = img.size
+        width, height = target_size
+        # Размер цели задан после поворота по EXIF, draft работает до него
+        if img.getexif().get(ExifTags.Base.Orientation) in (5, 6, 7, 8):
+            width, height = height, width
+        if img.format == "JPEG":
+            img.draft(None, (width * DRAFT_REDUCING_GAP, height * DRAFT_REDUCING_GAP))
+
+        if img.width * img.height > max_pixels:
+            raise ImageTooLargeError(
+                f"Image {original_size[0]}x{original_size[1]} exceeds "
+                f"the limit of {max_pixels} decoded pixels"
+            )
+        ImageOps.exif_transpose(img, in_place=True)
+        logger.debug(f"Decoded image {original_size} at {img.size}")
+        yield img
+
+
+def _encode(img: Image.Image, **options) -> IO[bytes]:
+    # Результат пишется во временный файл, а не в память
+    output = tempfile.TemporaryFile()
+    img.save(output, **options)
+    output.seek(0)
+    return output
+
+
+def create_thumbnail(image_file, max_size: tuple = THUMBNAIL_SIZE):
     """
     Create a thumbnail from an image file.
 
@@ -74,137 +151,403 @@ def create_thumbnail(image_file, max_size: tuple = THUMBNAIL_SIZE) -> BytesIO:
         max_size: Maximum dimensions (width, height)
 
     Returns:
-        BytesIO object containing the thumbnail
+        Temporary file containing the thumbnail (caller closes it)
 
     Raises:
         ValueError: If image processing fails
     """
     logger.debug(f"Creating thumbnail for image: {image_file.name}")
     try:
-        img = Image.open(image_file)
-        original_size = img.size
-        logger.debug(f"Original image size: {original_size}")
-
-        # Convert RGBA and P mode images to RGB for JPEG compatibility
-        if img.mode in ("RGBA", "P", "LA"):
-            logger.debug(f"Converting image from {img.mode} to RGB")
-            img = img.convert("RGB")
+        with open_image(image_file, max_size) as img:
+            # Convert RGBA and P mode images to RGB for JPEG compatibility
+            if img.mode in ("RGBA", "P", "LA"):
+                logger.debug(f"Converting image from {img.mode} to RGB")
+                img = img.convert("RGB")
 
-        # Create thumbnail maintaining aspect ratio
-        img.thumbnail(max_size, Image.Resampling.LANCZOS)
-        logger.debug(f"Thumbnail created with size: {img.size}")
+            # Create thumbnail maintaining aspect ratio
+            img.thumbnail(max_size, Image.Resampling.LANCZOS)
+            logger.debug(f"Thumbnail created with size: {img.size}")
 
-        # Determine image format
-        ext = Path(image_file.name).suffix.lower()
-        img_format = FORMAT_MAPPING.get(ext, DEFAULT_IMAGE_FORMAT)
-        logger.debug(f"Using image format: {img_format}")
+            # Determine image format
+            ext = Path(image_file.name).suffix.lower()
+            img_format = FORMAT_MAPPING.get(ext, DEFAULT_IMAGE_FORMAT)
+            logger.debug(f"Using image format: {img_format}")
 
-        # Save to BytesIO
-        thumb_io = BytesIO()
-        img.save(thumb_io, format=img_format, quality=THUMBNAIL_QUALITY)
-        thumb_io.seek(0)
+            thumb_file = _encode(img, format=img_format, quality=THUMBNAIL_QUALITY)
 
         logger.info(f"Thumbnail created successfully for {image_file.name}")
-        return thumb_io
+        return thumb_file
+    except ImageTooLargeError:
+        raise
     except Exception as e:
         logger.error(f"Failed to process image {image_file.name}: {e}", exc_info=True)
         raise ValueError(f"Failed to process image: {str(e)}") from e
 
 
-def cleanup_old_files(instance, old_instance) -> bool:
+def get_variant_formats() -> list[str]:
+    """Configured variant formats that the installed Pillow can encode."""
+    formats = getattr(settings, "BLOG_IMAGE_VARIANT_FORMATS", DEFAULT_VARIANT_FORMATS)
+    return [
+        name
+        for name in formats
+        if name in VARIANT_FORMATS
+        and (name == "jpeg" or features.check(VARIANT_FORMATS[name][0]))
+    ]
+
+
+def create_variants(image_file, widths, formats):
     """
-    Remove old image and thumbnail files when they are replaced.
+    Encode resized copies of an image in several formats, one at a time.
+
+    Widths larger than the original are clamped to it (no upscaling). The
+    image is decoded once at the size the largest width needs and every
+    smaller width is reduced from the previous one. EXIF orientation is
+    applied and metadata other than the colour profile is stripped.
 
     Args:
-        instance: New model instance
-        old_instance: Previous model instance
+        image_file: Django ImageField file object
+        widths: Target widths in pixels
+        formats: Keys of VARIANT_FORMATS
+
+    Yields:
+        Tuples of (width, height, format, temporary file); the file is
+        closed once the consumer asks for the next variant
+
+    Raises:
+        ValueError: If image processing fails
     """
-    logger.debug("Cleaning up old files")
+    try:
+        with open_image(image_file, (max(widths), 1)) as source:
+            icc_profile = source.info.get("icc_profile")
+            has_alpha = source.mode in ("RGBA", "LA") or "transparency" in source.info
+            img = source.convert("RGBA" if has_alpha else "RGB")
+        original_width = img.width
+
+        for width in sorted(
+            {min(width, original_width) for width in widths}, reverse=True
+        ):
+            height = max(1, round(img.height * width / img.width))
+            if (width, height) != img.size:
+                img = img.resize((width, height), Image.Resampling.LANCZOS)
+            # EXIF, XMP и комментарии не нужны в браузере
+            img.info = {}
+            for name in formats:
+                _extension, options, _mime = VARIANT_FORMATS[name]
+                frame = img
+                if options["format"] == "JPEG" and frame.mode != "RGB":
+                    frame = frame.convert("RGB")
+                with _encode(frame, icc_profile=icc_profile, **options) as output:
+                    yield width, height, name, output
+        logger.info(f"Created variants for {image_file.name}")
+    except ImageTooLargeError:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to process image {image_file.name}: {e}", exc_info=True)
+        raise ValueError(f"Failed to process image: {str(e)}") from e
 
-    if instance.image and old_instance.image and instance.image == old_instance.image:
-        logger.info(f"Old and New image are same: {old_instance.image.path}")
-        return False
 
-    # Cleanup old main image
-    if instance.image and old_instance.image and instance.image != old_instance.image:
-        logger.info(f"Removing old image: {old_instance.image.path}")
-        remove_file_if_exists(old_instance.image.path)
-
-    # Cleanup old thumbnail
-    if (
-        instance.thumbnail
-        and old_instance.thumbnail
-        and instance.thumbnail != old_instance.thumbnail
-    ):
-        logger.info(f"Removing old thumbnail: {old_instance.thumbnail.path}")
-        remove_file_if_exists(old_instance.thumbnail.path)
-    return True
+def image_metadata(image_file, preview_file=None) -> dict:
+    """
+    Describe an image for templates: size, dominant colour and LQIP.
+
+    Only the header of the original is read. The colour and the placeholder
+    come from ``preview_file`` (the thumbnail) when given, otherwise from a
+    draft-mode decode of the original.
+
+    Args:
+        image_file: Django ImageField file object of the original
+        preview_file: Smaller copy of the same image, optional
+
+    Returns:
+        Values of the EMPTY_METADATA fields
+
+    Raises:
+        ValueError: If image processing fails
+    """
+    try:
+        width, height = _oriented_size(image_file)
+        with open_image(preview_file or image_file, PLACEHOLDER_SIZE) as img:
+            img = img.convert("RGB")
+            img.thumbnail(PLACEHOLDER_SIZE, Image.Resampling.BOX)
+
+        palette = img.quantize(
+            colors=DOMINANT_PALETTE_SIZE, method=Image.Quantize.MEDIANCUT
+        )
+        _count, index = max(palette.getcolors())
+        red, green, blue = palette.getpalette()[index * 3 : index * 3 + 3]
+
+        # Заглушка - несколько сотен байт, в памяти ей самое место
+        output = BytesIO()
+        img.save(output, format="JPEG", quality=PLACEHOLDER_QUALITY)
+        encoded = b64encode(output.getvalue()).decode("ascii")
+    except ImageTooLargeError:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to describe image {image_file.name}: {e}", exc_info=True)
+        raise ValueError(f"Failed to describe image: {str(e)}") from e
+
+    return {
+        "width": width,
+        "height": height,
+        "size": image_file.size,
+        "dominant_color": f"#{red:02x}{green:02x}{blue:02x}",
+        "placeholder": f"data:image/jpeg;base64,{encoded}",
+    }
+
+
+def update_file_references(instance, old_instance) -> None:
+    """
+    Count references of files assigned to an image row, release replaced ones.
+
+    New uploads are counted by the storage when they are saved.
+
+    Args:
+        instance: Model instance being saved
+        old_instance: Row as stored in the database, None for a new row
+    """
+    for field in ("image", "thumbnail"):
+        new_file = getattr(instance, field)
+        new_name = new_file.name if new_file else None
+        old_file = getattr(old_instance, field) if old_instance else None
+        old_name = old_file.name if old_file else None
+        if new_file and not new_file._committed:
+            release_file(old_file)
+        elif new_name != old_name:
+            if new_name:
+                new_file.storage.retain(new_name)
+            release_file(old_file)
 
 
 @receiver(pre_save, sender=Images)
-def generate_thumbnail_on_save(sender, instance, **kwargs):
+def queue_thumbnail_on_save(sender, instance, update_fields=None, **kwargs):
     """
-    Generate thumbnail and rename image before saving.
+    Keep file references in step and queue processing of a new image.
 
     This signal:
-    1. Removes old files when image is replaced
-    2. Generates a unique filename for the image
-    3. Creates a thumbnail from the uploaded image
-    4. Saves both with proper naming
+    1. Releases the files the row stops referencing
+    2. Drops the thumbnail and variants of the previous image
+    3. Marks the row as processing; the thumbnail is built by a job
 
     Args:
         sender: The model class (Images)
         instance: The actual instance being saved
+        update_fields: Fields being saved, None for a full save
         **kwargs: Additional signal arguments
     """
-    logger.info(f"Processing image for post: {instance.post.title}")
+    if update_fields is not None and "image" not in update_fields:
+        # Сохранение результатов задачи (миниатюра, статус)
+        return
+    old_instance = (
+        sender.objects.filter(pk=instance.pk).first() if instance.pk else None
+    )
+    update_file_references(instance, old_instance)
+    if not instance.image:
+        logger.debug("No image to process, skipping thumbnail generation")
+        return
+
+    uploaded = not instance.image._committed
+    if old_instance and not uploaded and instance.image == old_instance.image:
+        logger.debug(f"Image is unchanged: {instance.image.name}")
+        return
+    if not old_instance and not uploaded and instance.thumbnail:
+        # Уже обработанные файлы (импорт, фикстуры)
+        return
+
+    logger.info(f"Queueing image processing for post id={instance.post_id}")
+    # Миниатюра и варианты относятся к прежнему изображению
+    if instance.thumbnail:
+        release_file(instance.thumbnail)
+        instance.thumbnail = None
+    if instance.pk:
+        instance.variants.all().delete()
+    for field, value in EMPTY_METADATA.items():
+        setattr(instance, field, value)
+    instance.status = Images.Status.PROCESSING
+    instance._queue_thumbnail = True
+
+
+@receiver(post_save, sender=Images)
+def enqueue_image_jobs(sender, instance, **kwargs):
+    """Queue thumbnail and variant jobs once the row (and upload) are saved."""
+    if getattr(instance, "_queue_thumbnail", False):
+        instance._queue_thumbnail = False
+        enqueue(instance, THUMBNAIL_JOB)
+        enqueue(instance, VARIANTS_JOB)
+
+
+def _reuse_thumbnail(instance, source_name: str) -> bool:
+    # Дубликат (тот же blob) уже обработан: ссылаемся на его миниатюру
+    storage = instance.thumbnail.storage
+    if not storage.is_blob(source_name):
+        return False
+    with transaction.atomic():
+        thumbnail = (
+            Images.objects.select_for_update()
+            .filter(image=source_name, thumbnail__startswith=f"{BLOB_DIR}/")
+            .exclude(pk=instance.pk)
+            .values_list("thumbnail", flat=True)
+            .first()
+        )
+        if thumbnail is None:
+            return False
+        storage.retain(thumbnail)
+    instance.thumbnail.name = thumbnail
+    logger.info(f"Reused thumbnail {thumbnail} for image id={instance.pk}")
+    return True
+
+
+def _oriented_size(image_file) -> tuple[int, int]:
+    # Только заголовок файла, без декодирования
+    with Image.open(image_file) as img:
+        if img.getexif().get(ExifTags.Base.Orientation) in (5, 6, 7, 8):
+            return img.height, img.width
+        return img.size
+
+
+def _reuse_variants(instance, source_name: str, widths, formats):
+    """Copies of a duplicate's variants, or None if it has no matching set."""
+    storage = ImageVariant._meta.get_field("file").storage
+    if not storage.is_blob(source_name):
+        return None
+    with transaction.atomic():
+        found = {}
+        for variant in (
+            ImageVariant.objects.select_for_update(of=("self",))
+            .filter(image__image=source_name)
+            .exclude(image=instance)
+            .order_by("image_id")
+        ):
+            found.setdefault(variant.image_id, []).append(variant)
+        if not found:
+            return None
+
+        original_width, _height = _oriented_size(instance.image)
+        expected = {
+            (name, min(width, original_width)) for width in widths for name in formats
+        }
+        for duplicate in found.values():
+            # Набор вариантов дубликата мог быть построен с другими настройками
+            if {(v.format, v.width) for v in duplicate} != expected:
+                continue
+            for variant in duplicate:
+                storage.retain(variant.file.name)
+            logger.info(f"Reused variants of image id={duplicate[0].image_id}")
+            return [
+                ImageVariant(
+                    image=instance,
+                    file=variant.file.name,
+                    format=variant.format,
+                    width=variant.width,
+                    height=variant.height,
+                    size=variant.size,
+                )
+                for variant in duplicate
+            ]
+    return None
+
+
+@job_handler(THUMBNAIL_JOB)
+def generate_thumbnail(job) -> None:
+    """
+    Build the thumbnail of a queued image (runs in process_image_jobs).
 
-    try:
-        # Generate thumbnail if image exists
-        if not instance.image:
-            logger.debug("No image to process, skipping thumbnail generation")
-            return
-        if instance.pk:
-            old_instance = sender.objects.get(pk=instance.pk)
-            if cleanup_old_files(instance, old_instance) is False:
-                return
-        # Generate unique filename
-        original_name = instance.image.name
-        instance.image.name = generate_unique_filename(instance.image.name)
-        logger.info(f"Renamed image from {original_name} to {instance.image.name}")
-
-        # Create thumbnail
-        thumb_io = create_thumbnail(instance.image, THUMBNAIL_SIZE)
-
-        # Remove old thumbnail if exists
-        if instance.thumbnail:
-            remove_file_if_exists(instance.thumbnail.path)
-
-        # Save new thumbnail
+    The thumbnail of an already processed duplicate is reused. Dimensions,
+    dominant colour and placeholder are stored along with it.
+
+    Raises:
+        ValueError: If image processing fails (the job is retried)
+    """
+    instance = Images.objects.filter(pk=job.image_id).first()
+    if instance is None or instance.image.name != job.source_name:
+        logger.info(f"Skipping outdated {job}")
+        return
+
+    old_thumbnail = instance.thumbnail.name if instance.thumbnail else None
+    if not _reuse_thumbnail(instance, job.source_name):
         thumbnail_name = f"thumb_{Path(instance.image.name).name}"
-        instance.thumbnail.save(
-            thumbnail_name,
-            ContentFile(thumb_io.getvalue()),
-            save=False,
-        )
-        logger.info(f"Thumbnail saved: {thumbnail_name}")
+        with create_thumbnail(instance.image, THUMBNAIL_SIZE) as thumb_file:
+            instance.thumbnail.save(thumbnail_name, File(thumb_file), save=False)
+
+    metadata = image_metadata(instance.image, instance.thumbnail)
+
+    # Изображение могли заменить, пока строилась миниатюра
+    updated = Images.objects.filter(pk=instance.pk, image=job.source_name).update(
+        thumbnail=instance.thumbnail.name, status=Images.Status.READY, **metadata
+    )
+    if not updated:
+        release_file(instance.thumbnail)
+        logger.info(f"Image id={instance.pk} was replaced, thumbnail discarded")
+        return
+    if old_thumbnail:
+        instance.thumbnail.storage.delete(old_thumbnail)
+    # update() не шлет post_save: сбрасываем кэш страниц поста сами
+    invalidate_tags(post_tag(instance.post_id), TAG_POSTS)
+    logger.info(f"Thumbnail saved: {instance.thumbnail.name}")
+
+
+@job_handler(VARIANTS_JOB)
+def generate_variants(job) -> None:
+    """
+    Build the responsive variants of a queued image (runs in process_image_jobs).
 
-    except Exception as e:
-        logger.error(
-            f"Image processing error for post '{instance.post.title}': {e}",
-            exc_info=True,
+    Variants of an already processed duplicate are reused when they were
+    built for the same widths and formats.
+
+    Raises:
+        ValueError: If image processing fails (the job is retried)
+    """
+    instance = Images.objects.filter(pk=job.image_id).first()
+    if instance is None or instance.image.name != job.source_name:
+        logger.info(f"Skipping outdated {job}")
+        return
+
+    widths = getattr(settings, "BLOG_IMAGE_VARIANT_WIDTHS", DEFAULT_VARIANT_WIDTHS)
+    formats = get_variant_formats()
+    variants = _reuse_variants(instance, job.source_name, widths, formats)
+    if variants is None:
+        variants = []
+        stem = Path(instance.image.name).stem
+        for width, height, name, output in create_variants(
+            instance.image, widths, formats
+        ):
+            content = File(output)
+            variant = ImageVariant(
+                image=instance,
+                format=name,
+                width=width,
+                height=height,
+                size=content.size,
+            )
+            extension = VARIANT_FORMATS[name][0]
+            variant.file.save(f"{stem}_{width}w.{extension}", content, save=False)
+            variants.append(variant)
+
+    with transaction.atomic():
+        # Изображение могли заменить, пока строились варианты
+        current = (
+            Images.objects.select_for_update()
+            .filter(pk=instance.pk, image=job.source_name)
+            .exists()
         )
-        # Clean up instance if thumbnail generation fails
-        if instance.pk:
-            logger.warning("Deleting instance due to image processing failure")
-            instance.delete()
-        raise ValueError(f"Image processing error: {str(e)}") from e
+        if current:
+            # Старые варианты освободит cleanup_variant_file
+            instance.variants.all().delete()
+            ImageVariant.objects.bulk_create(variants)
+    if not current:
+        for variant in variants:
+            release_file(variant.file)
+        logger.info(f"Image id={instance.pk} was replaced, variants discarded")
+        return
+    invalidate_tags(post_tag(instance.post_id), TAG_POSTS)
+    logger.info(f"Saved {len(variants)} variants of image id={instance.pk}")
 
 
 @receiver(post_delete, sender=Images)
 def cleanup_files_on_delete(sender, instance, **kwargs):
     """
-    Remove image and thumbnail files when model instance is deleted.
+    Release image and thumbnail files when model instance is deleted.
+
+    Shared blobs are removed only when no other row references them.
 
     Args:
         sender: The model class (Images)
@@ -213,6 +556,12 @@ def cleanup_files_on_delete(sender, instance, **kwargs):
     """
     if sender == Images:
         logger.info(f"Cleaning up files for deleted image (ID: {instance.pk})")
-        remove_file_if_exists(instance.image.path)
-        remove_file_if_exists(instance.thumbnail.path)
+        release_file(instance.image)
+        release_file(instance.thumbnail)
         logger.debug("File cleanup completed")
+
+
+@receiver(post_delete, sender=ImageVariant)
+def cleanup_variant_file(sender, instance, **kwargs):
+    """Release the variant file when its row (or its image) is deleted."""
+    release_file(instance.file)
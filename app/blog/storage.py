@@ -0,0 +1,138 @@
+"""Content-addressed, deduplicated storage of image files.
+
+An upload is hashed while it is streamed to a temporary file next to the
+blobs, then moved to ``blobs/<ab>/<sha256><ext>``. If that blob already
+exists the copy is dropped, so the same picture is stored once however
+many ``Images`` rows use it; thumbnails and variants built from it are
+stored the same way.
+
+Every reference to a blob is counted in ``MediaBlob.refcount``: ``save``
+and ``retain`` add one, ``delete`` releases one and removes the file
+(after the transaction commits) only when the last reference is gone.
+Names outside ``blobs/`` (files uploaded before this storage) are not
+counted and are deleted at once, as before.
+"""
+
+import hashlib
+import logging
+import os
+import tempfile
+from pathlib import Path
+
+from django.apps import apps
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils.deconstruct import deconstructible
+
+logger = logging.getLogger("blog")
+
+# Constants
+BLOB_DIR = "blobs"
+# Временные файлы загрузок лежат рядом с blob'ами (os.replace в пределах ФС)
+UPLOAD_TMP_PREFIX = ".upload-"
+MAX_EXTENSION_LENGTH = 10
+
+
+def _media_blob_model():
+    # Модели грузятся позже, чем создается хранилище (оно нужно полям моделей)
+    return apps.get_model("blog", "MediaBlob")
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """File system storage naming files by the SHA-256 of their content."""
+
+    def is_blob(self, name: str | None) -> bool:
+        return bool(name) and name.startswith(f"{BLOB_DIR}/")
+
+    def blob_name(self, digest: str, original_name: str) -> str:
+        extension = Path(original_name).suffix.lower()
+        if len(extension) > MAX_EXTENSION_LENGTH or not extension[1:].isalnum():
+            extension = ""
+        return f"{BLOB_DIR}/{digest[:2]}/{digest}{extension}"
+
+    def get_available_name(self, name, max_length=None):
+        # Имя задает содержимое, а совпадение имен - это дедупликация
+        return name
+
+    def _write_temp(self, content) -> tuple[str, str, int]:
+        """Stream content to a temporary file, returning (path, sha256, size)."""
+        directory = self.path(BLOB_DIR)
+        os.makedirs(directory, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=UPLOAD_TMP_PREFIX)
+        try:
+            with os.fdopen(fd, "wb") as temp_file:
+                for chunk in content.chunks():
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode()
+                    digest.update(chunk)
+                    temp_file.write(chunk)
+                    size += len(chunk)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        return temp_path, digest.hexdigest(), size
+
+    def _save(self, name, content):
+        temp_path, digest, size = self._write_temp(content)
+        name = self.blob_name(digest, name)
+        full_path = self.path(name)
+        if os.path.exists(full_path):
+            os.unlink(temp_path)
+            logger.debug(f"Deduplicated upload into existing blob {name}")
+        else:
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            # Атомарно: одновременная загрузка того же файла даст те же байты
+            os.replace(temp_path, full_path)
+            # mkstemp создает файл с правами 0600
+            os.chmod(full_path, self.file_permissions_mode or 0o644)
+        self.retain(name, size)
+        return name
+
+    def retain(self, name: str, size: int | None = None) -> None:
+        """Count one more reference to a blob (no-op for other names)."""
+        if not self.is_blob(name):
+            return
+        MediaBlob = _media_blob_model()
+        if MediaBlob.objects.filter(name=name).update(refcount=F("refcount") + 1):
+            return
+        if size is None:
+            size = self.size(name) if self.exists(name) else 0
+        try:
+            with transaction.atomic():
+                MediaBlob.objects.create(name=name, size=size, refcount=1)
+        except IntegrityError:
+            # Запись создал параллельный процесс
+            MediaBlob.objects.filter(name=name).update(refcount=F("refcount") + 1)
+
+    def delete(self, name):
+        """Release one reference; the file goes away with the last one."""
+        if not self.is_blob(name):
+            super().delete(name)
+            return
+        MediaBlob = _media_blob_model()
+        with transaction.atomic():
+            blob = MediaBlob.objects.select_for_update().filter(name=name).first()
+            if blob is not None and blob.refcount > 1:
+                MediaBlob.objects.filter(pk=blob.pk).update(refcount=F("refcount") - 1)
+                return
+            if blob is not None:
+                blob.delete()
+            # При откате транзакции ссылка вернется, файл должен остаться
+            transaction.on_commit(lambda: self._remove_unreferenced(name))
+
+    def _remove_unreferenced(self, name: str) -> None:
+        # Тот же файл могли загрузить заново после удаления записи
+        if _media_blob_model().objects.filter(name=name).exists():
+            return
+        try:
+            FileSystemStorage.delete(self, name)
+            logger.debug(f"Removed blob {name}")
+        except OSError as e:
+            logger.error(f"Error removing blob {name}: {e}")
+
+
+blob_storage = ContentAddressedStorage()
@@ -1 +1,955 @@
-# Create your tests here.
+import gzip
+import os
+import time
+from datetime import timedelta
+from io import BytesIO, StringIO
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import mock, skipUnless
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+
+from .cache import TAG_LAYOUT, get_page_cache_stats, invalidate_tags
+from .checks import check_rate_limit_cache
+from .export import page_file
+from .jobs import process_jobs
+from .models import Category, ImageJob, Images, MediaBlob, Post
+from .pagination import Cursor, IdListPaginator, InvalidCursor, KeysetPaginator
+from .query import parse_query
+from .ratelimit import TOKEN_BUCKET, _blocked, hit, refund
+from .rendering import EXCERPT_WORDS, RENDER_VERSION, WORDS_PER_MINUTE
+from .search import get_search_results
+from .views import POSTS_PER_PAGE
+
+
+@override_settings(BLOG_PAGE_CACHE_TIMEOUT=0)
+class PostImagesTests(TestCase):
+    """Post image accessors must use prefetched images."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username="author")
+        cls.category = Category.objects.create(title="Posts", url_path="posts")
+
+    def _create_post(self, index: int) -> Post:
+        post = Post.objects.create(
+            title=f"Post {index}",
+            slug=f"post-{index}",
+            body=f"Body of post {index}",
+            author=self.author,
+            category=self.category,
+            status=Post.Status.PUBLISHED,
+            publish=timezone.now() - timedelta(days=index),
+        )
+        Images.objects.create(
+            post=post,
+            image=f"2024/01/01/main_{index}.jpg",
+            image_type="main",
+        )
+        Images.objects.create(
+            post=post,
+            image=f"2024/01/01/thumb_src_{index}.jpg",
+            thumbnail=f"2024/01/01/thumbnails/thumb_{index}.jpg",
+            image_type="thumbnail",
+        )
+        return post
+
+    def _count_list_queries(self) -> int:
+        # Данные шапки кэшируются между запросами, прогреваем кэш
+        self.client.get("/")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/")
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_accessors_use_prefetched_images(self):
+        self._create_post(1)
+        post = Post.objects.prefetch_related("images").get()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(post.get_path_image_main, "2024/01/01/main_1.jpg")
+            self.assertEqual(
+                post.get_path_image_thumbnail, "2024/01/01/thumbnails/thumb_1.jpg"
+            )
+            self.assertIsNone(post.get_image("secondary"))
+
+    def test_accessors_fall_back_to_single_query(self):
+        self._create_post(1)
+        post = Post.objects.get()
+
+        with self.assertNumQueries(1):
+            self.assertEqual(post.get_image("main"), "2024/01/01/main_1.jpg")
+            self.assertEqual(
+                post.get_path_image_thumbnail, "2024/01/01/thumbnails/thumb_1.jpg"
+            )
+
+    def test_list_query_count_does_not_depend_on_page_size(self):
+        self._create_post(0)
+        single_post_queries = self._count_list_queries()
+
+        for index in range(1, POSTS_PER_PAGE):
+            self._create_post(index)
+        full_page_queries = self._count_list_queries()
+
+        self.assertEqual(single_post_queries, full_page_queries)
+
+
+class PostNeighboursTests(TestCase):
+    """Previous/next navigation must not cost extra queries per neighbour."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create(username="author")
+        category = Category.objects.create(title="Posts", url_path="posts")
+        other = Category.objects.create(title="Other", url_path="other")
+        cls.posts = [
+            Post.objects.create(
+                title=f"Post {index}",
+                slug=f"post-{index}",
+                body="Body",
+                author=author,
+                category=other if index == 2 else category,
+                status=Post.Status.DRAFT if index == 4 else Post.Status.PUBLISHED,
+            )
+            for index in range(6)
+        ]
+
+    def test_neighbours_in_single_query(self):
+        current = self.posts[3]
+
+        with self.assertNumQueries(1):
+            previous_post, next_post = Post.get_neighbours(current)
+            urls = [previous_post.get_absolute_url(), next_post.get_absolute_url()]
+
+        # Посты другой категории и черновики пропускаются
+        self.assertEqual(previous_post, self.posts[1])
+        self.assertEqual(next_post, self.posts[5])
+        self.assertTrue(all(url.startswith("/posts/") for url in urls))
+
+    def test_first_post_has_no_previous(self):
+        previous_post, next_post = Post.get_neighbours(self.posts[0])
+
+        self.assertIsNone(previous_post)
+        self.assertEqual(next_post, self.posts[1])
+
+
+class PostRenderingTests(TestCase):
+    """Stored body HTML follows the body and the renderer configuration."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username="author")
+
+    def _create_post(self, index: int = 0) -> Post:
+        return Post.objects.create(
+            title=f"Post {index}",
+            slug=f"post-{index}",
+            body="[TOC]\n\n## Intro\n\nSome *text*",
+            author=self.author,
+        )
+
+    def test_save_renders_body(self):
+        post = self._create_post()
+
+        self.assertIn("<em>text</em>", post.body_html)
+        # Оглавление по маркеру [TOC] хранится отдельно от тела
+        self.assertIn('href="#intro"', post.toc_html)
+        self.assertNotIn("toc", post.body_html)
+        self.assertEqual(post.body_html_version, RENDER_VERSION)
+
+        post.body = "## Other\n\nOther **body**"
+        post.save(update_fields=["body"])
+        post.refresh_from_db()
+        self.assertIn("<strong>body</strong>", post.body_html)
+        self.assertEqual(post.toc_html, "")
+
+    @override_settings(BLOG_PAGE_CACHE_TIMEOUT=0)
+    def test_detail_renders_stored_toc(self):
+        post = self._create_post()
+        post.category = Category.objects.create(title="Posts", url_path="posts")
+        post.status = Post.Status.PUBLISHED
+        post.save()
+
+        response = self.client.get(post.get_absolute_url())
+        self.assertContains(response, 'class="toc"', count=1)
+        self.assertContains(response, 'href="#intro"')
+        self.assertNotContains(response, "[TOC]")
+
+        # Устаревшая строка: оглавление рендерится на лету
+        Post.objects.update(body_html="", toc_html="", body_html_version="old")
+        response = self.client.get(post.get_absolute_url())
+        self.assertContains(response, 'href="#intro"', count=1)
+
+    def test_stale_version_is_rerendered(self):
+        post = self._create_post()
+        # Так выглядят строки после смены расширений markdown
+        Post.objects.update(body_html="stale", body_html_version="old")
+        post = Post.objects.get()
+
+        self.assertIn("<em>text</em>", post.rendered_body)
+        post.title = "Renamed"
+        post.save()
+        post.refresh_from_db()
+        self.assertIn("<em>text</em>", post.body_html)
+        self.assertEqual(post.body_html_version, RENDER_VERSION)
+
+    def test_render_posts_command(self):
+        for index in range(3):
+            self._create_post(index)
+        Post.objects.filter(slug="post-0").update(body_html="", body_html_version="")
+        Post.objects.exclude(slug="post-0").update(body_html="current")
+
+        out = StringIO()
+        call_command("render_posts", workers=1, stdout=out)
+
+        self.assertIn("Rendered 1 posts", out.getvalue())
+        self.assertIn("<em>text</em>", Post.objects.get(slug="post-0").body_html)
+        # Актуальные строки без --all не трогаются
+        self.assertEqual(Post.objects.filter(body_html="current").count(), 2)
+
+        call_command("render_posts", workers=1, stdout=out)
+        self.assertIn("All posts are up to date", out.getvalue())
+        call_command("render_posts", "--all", workers=1, stdout=out)
+        self.assertFalse(Post.objects.filter(body_html="current").exists())
+
+    def test_excerpt_fields(self):
+        words = [f"w{index}" for index in range(WORDS_PER_MINUTE + 1)]
+        post = Post.objects.create(
+            title="Long",
+            slug="long",
+            body="# Title & co\n\n" + " ".join(words),
+            author=self.author,
+        )
+
+        # Текст берется из HTML без тегов, сущности раскрыты
+        self.assertTrue(post.excerpt.startswith("Title & co w0 w1"))
+        self.assertEqual(len(post.excerpt.split()), EXCERPT_WORDS)
+        self.assertTrue(post.excerpt.endswith("…"))
+        self.assertEqual(post.word_count, len(words) + 3)
+        self.assertEqual(post.reading_time, 2)
+
+        post.body = "Short"
+        post.save()
+        self.assertEqual(
+            (post.excerpt, post.word_count, post.reading_time), ("Short", 1, 1)
+        )
+
+    def test_backfill_excerpts_command(self):
+        for index in range(3):
+            self._create_post(index)
+        expected = list(
+            Post.objects.values_list("excerpt", "word_count", "reading_time")
+        )
+        Post.objects.update(excerpt="", word_count=0, reading_time=0)
+        # Устаревший HTML рендерится заново вместе с excerpt
+        Post.objects.filter(slug="post-0").update(body_html="", body_html_version="")
+
+        out = StringIO()
+        call_command("backfill_excerpts", batch_size=2, stdout=out)
+
+        self.assertIn("Updated 3 posts", out.getvalue())
+        self.assertEqual(
+            list(Post.objects.values_list("excerpt", "word_count", "reading_time")),
+            expected,
+        )
+        self.assertEqual(
+            Post.objects.get(slug="post-0").body_html_version, RENDER_VERSION
+        )
+
+        call_command("backfill_excerpts", stdout=out)
+        self.assertIn("Updated 0 posts", out.getvalue())
+
+
+class PageCacheTests(TestCase):
+    """Anonymous pages are served from cache until a dependency changes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create(username="author")
+        category = Category.objects.create(title="Posts", url_path="posts")
+        cls.post, cls.other_post = (
+            Post.objects.create(
+                title=f"Post {index}",
+                slug=f"post-{index}",
+                body="Body",
+                author=author,
+                category=category,
+                status=Post.Status.PUBLISHED,
+            )
+            for index in range(2)
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def _cache_status(self, url: str) -> str:
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response["X-Page-Cache"]
+
+    def test_hit_skips_view(self):
+        url = self.post.get_absolute_url()
+        self.assertEqual(self._cache_status(url), "miss")
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self._cache_status(url), "hit")
+
+    def test_post_save_purges_only_tagged_pages(self):
+        post_url = self.post.get_absolute_url()
+        other_url = self.other_post.get_absolute_url()
+        for url in ("/", post_url, other_url):
+            self._cache_status(url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other_post.title = "Renamed"
+            self.other_post.save()
+
+        self.assertEqual(self._cache_status(post_url), "hit")
+        self.assertEqual(self._cache_status(other_url), "miss")
+        self.assertEqual(self._cache_status("/"), "miss")
+
+    def test_hit_is_served_precompressed(self):
+        url = self.post.get_absolute_url()
+        plain = self.client.get(url).content
+
+        response = self.client.get(
+            url, headers={"accept-encoding": "gzip;q=0.5, br;q=0"}
+        )
+
+        self.assertEqual(response["X-Page-Cache"], "hit")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertEqual(gzip.decompress(response.content), plain)
+
+        stats = get_page_cache_stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+        self.assertEqual(stats["bytes_uncompressed"], 2 * len(plain))
+        self.assertGreater(stats["bytes_saved"], 0)
+
+
+class IdListPaginatorTests(TestCase):
+    """Cached id lists are paged without re-running the search."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create(username="author")
+        category = Category.objects.create(title="Posts", url_path="posts")
+        cls.posts = [
+            Post.objects.create(
+                title=f"Post {index}",
+                slug=f"post-{index}",
+                body="Body",
+                author=author,
+                category=category,
+                status=Post.Status.PUBLISHED,
+            )
+            for index in range(5)
+        ]
+
+    def test_pages_keep_id_order(self):
+        ids = [post.pk for post in reversed(self.posts)]
+        paginator = IdListPaginator(Post.objects.all(), ids, 2)
+
+        with self.assertNumQueries(1):
+            first = paginator.page()
+        second = paginator.page(first.next_cursor)
+
+        self.assertEqual([post.pk for post in first], ids[:2])
+        self.assertEqual([post.pk for post in second], ids[2:4])
+        self.assertEqual(
+            [post.pk for post in paginator.page(second.previous_cursor)], ids[:2]
+        )
+        self.assertEqual(paginator.get_count(), 5)
+        # Список id обрезан: число строк передается отдельно
+        self.assertEqual(
+            IdListPaginator(Post.objects.all(), ids, 2, 40).get_count(), 40
+        )
+        self.assertFalse(paginator.page(paginator.cursor_for_page_number(3)).has_next())
+
+
+@override_settings(BLOG_PAGE_CACHE_TIMEOUT=0)
+class KeysetPaginatorTests(TestCase):
+    """Listings seek on (publish, pk), also across posts sharing a publish time."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create(username="author")
+        category = Category.objects.create(title="Posts", url_path="posts")
+        publish = timezone.now() - timedelta(days=1)
+        for index in range(7):
+            Post.objects.create(
+                title=f"Post {index}",
+                slug=f"post-{index}",
+                body="Body",
+                author=author,
+                category=category,
+                status=Post.Status.PUBLISHED,
+                # Пары постов с одинаковым временем публикации
+                publish=publish - timedelta(hours=index // 2),
+            )
+        cls.expected = list(
+            Post.objects.order_by("-publish", "-pk").values_list("pk", flat=True)
+        )
+
+    def setUp(self):
+        self.paginator = KeysetPaginator(Post.objects.all(), 2, ("-publish", "-pk"))
+
+    def test_forward_and_backward_pages(self):
+        pages = [self.paginator.page()]
+        while pages[-1].has_next():
+            with self.assertNumQueries(1):
+                pages.append(self.paginator.page(pages[-1].next_cursor))
+
+        self.assertEqual([post.pk for page in pages for post in page], self.expected)
+        self.assertFalse(pages[0].has_previous())
+
+        # Назад от последней страницы - те же страницы
+        page = pages[-1]
+        for expected_page in reversed(pages[:-1]):
+            page = self.paginator.page(page.previous_cursor)
+            self.assertEqual(list(page), list(expected_page))
+        self.assertFalse(page.has_previous())
+
+    def test_tampered_cursor_is_invalid(self):
+        for values in (("not a date", 1), ({"dt": "2024-01-01T00:00:00+00:00"}, "x")):
+            with self.assertRaises(InvalidCursor):
+                self.paginator.page(Cursor(values).encode())
+
+        # Список открывается с первой страницы, а не с ошибкой
+        response = self.client.get("/", {"cursor": Cursor(("x", 1)).encode()})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [post.pk for post in response.context["posts"]],
+            self.expected[:POSTS_PER_PAGE],
+        )
+
+    def test_legacy_page_number_redirects_to_cursor(self):
+        response = self.client.get("/", {"page": 2})
+
+        self.assertEqual(response.status_code, 301)
+        response = self.client.get(response.url)
+        self.assertEqual(
+            [post.pk for post in response.context["posts"]],
+            self.expected[POSTS_PER_PAGE : 2 * POSTS_PER_PAGE],
+        )
+        # Несуществующая страница ведет на первую
+        self.assertEqual(self.client.get("/", {"page": 99}).url, "/")
+
+
+@override_settings(
+    BLOG_RATE_LIMITS={
+        "search": {"limit": 2, "window": 60, "algorithm": TOKEN_BUCKET},
+        "comment": {"limit": 2, "window": 60},
+    }
+)
+class RateLimitTests(TestCase):
+    """Atomic counters for sliding window and token bucket policies."""
+
+    def setUp(self):
+        cache.clear()
+        _blocked.clear()
+
+    def _hit_at(self, action, now):
+        with mock.patch("blog.ratelimit.time.time", return_value=now):
+            return hit(action, "10.0.0.1")
+
+    def test_sliding_window_weights_previous_window(self):
+        self.assertTrue(self._hit_at("comment", 1000))
+        self.assertTrue(self._hit_at("comment", 1001))
+        rejected = self._hit_at("comment", 1002)
+        self.assertFalse(rejected)
+        self.assertGreater(rejected.retry_after, 0)
+
+        _blocked.clear()
+        # Половина предыдущего окна (2 запроса) еще учитывается
+        self.assertTrue(self._hit_at("comment", 1050))
+        self.assertFalse(self._hit_at("comment", 1051))
+
+    def test_token_bucket_refills(self):
+        self.assertTrue(self._hit_at("search", 1000))
+        self.assertTrue(self._hit_at("search", 1000))
+        self.assertFalse(self._hit_at("search", 1000))
+
+        _blocked.clear()
+        # Один жетон за 30 секунд
+        self.assertTrue(self._hit_at("search", 1030))
+        self.assertFalse(self._hit_at("search", 1031))
+
+    def test_rejected_client_skips_cache(self):
+        self._hit_at("comment", 1000)
+        self._hit_at("comment", 1000)
+        self.assertFalse(self._hit_at("comment", 1000))
+
+        with mock.patch("blog.ratelimit.cache") as shared_cache:
+            self.assertFalse(self._hit_at("comment", 1000))
+        shared_cache.incr.assert_not_called()
+
+    def test_refund_returns_hit(self):
+        refund(self._hit_at("comment", 1000))
+        self.assertTrue(self._hit_at("comment", 1000))
+        self.assertTrue(self._hit_at("comment", 1000))
+        self.assertFalse(self._hit_at("comment", 1000))
+
+    def test_cache_without_atomic_incr_is_reported(self):
+        self.assertEqual(check_rate_limit_cache(None), [])
+
+        database_cache = {
+            "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+            "LOCATION": "cache_table",
+        }
+        with override_settings(CACHES={"default": database_cache}):
+            errors = check_rate_limit_cache(None)
+        self.assertEqual([error.id for error in errors], ["blog.W001"])
+
+
+class QueryParserTests(TestCase):
+    """Search input becomes a quoted raw tsquery."""
+
+    def test_operators(self):
+        query = parse_query('Django  "Class Views" -flask templ* ;--')
+
+        self.assertEqual(query.text, 'django templ* "class views" -flask')
+        self.assertEqual(
+            query.tsquery,
+            "'django' & 'templ':* & ('class' <-> 'views') & !'flask'",
+        )
+
+    def test_markup_is_dropped(self):
+        query = parse_query("<script>alert('x')</script><b>python</b>")
+
+        self.assertEqual(query.tsquery, "'python'")
+        self.assertFalse(parse_query("-flask"))
+
+
+class FuzzySearchTests(TestCase):
+    """Misspelled queries still find posts by title."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create(username="author")
+        category = Category.objects.create(title="Posts", url_path="posts")
+        cls.django_post, cls.flask_post = (
+            Post.objects.create(
+                title=title,
+                slug=f"post-{index}",
+                body="Body",
+                author=author,
+                category=category,
+                status=Post.Status.PUBLISHED,
+            )
+            for index, title in enumerate(["Шаблоны Джанго", "Flask basics"])
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def _search_ids(self, query) -> list[int]:
+        return get_search_results(query).ids
+
+    def test_typo_matches_title(self):
+        self.assertEqual(self._search_ids(parse_query("джнаго")), [self.django_post.pk])
+        self.assertEqual(self._search_ids(parse_query("Flsk")), [self.flask_post.pk])
+        self.assertEqual(self._search_ids(parse_query("pyramid")), [])
+
+    def test_index_is_rebuilt_after_post_change(self):
+        self.assertEqual(self._search_ids(parse_query("Flask")), [self.flask_post.pk])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.flask_post.title = "Pyramid basics"
+            self.flask_post.save()
+
+        self.assertEqual(self._search_ids(parse_query("Flask")), [])
+
+    @override_settings(BLOG_PAGE_CACHE_TIMEOUT=0)
+    def test_cached_ids_never_show_drafts(self):
+        response = self.client.get("/", {"search": "Flask"})
+        self.assertContains(response, "Flask basics")
+
+        # Снятие с публикации без сигналов: кэш id остался прежним
+        Post.objects.filter(pk=self.flask_post.pk).update(status=Post.Status.DRAFT)
+
+        self.assertEqual(self._search_ids(parse_query("Flask")), [self.flask_post.pk])
+        response = self.client.get("/", {"search": "Flask"})
+        self.assertNotContains(response, "Flask basics")
+
+    @mock.patch("blog.search.SEARCH_RESULTS_LIMIT", 2)
+    def test_total_counts_matches_beyond_limit(self):
+        for index in range(3):
+            Post.objects.create(
+                title=f"Flask tips {index}",
+                slug=f"tips-{index}",
+                body="Body",
+                author=self.flask_post.author,
+                category=self.flask_post.category,
+                status=Post.Status.PUBLISHED,
+            )
+
+        results = get_search_results(parse_query("Flask"))
+
+        self.assertEqual(len(results.ids), 2)
+        self.assertEqual(results.total, 4)
+        # Кэшируются и id, и полное число совпадений
+        self.assertEqual(get_search_results(parse_query("Flask")), results)
+        response = self.client.get("/", {"search": "Flask"})
+        self.assertContains(response, "По запросу нашлось 4 поста")
+        self.assertEqual(len(response.context["posts"]), 2)
+
+
+class SearchVectorTests(TestCase):
+    """The stored search vector follows title and body with their weights."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create(username="author")
+        cls.title_post, cls.body_post = (
+            Post.objects.create(
+                title=title,
+                slug=f"post-{index}",
+                body=body,
+                author=author,
+                status=Post.Status.PUBLISHED,
+            )
+            for index, (title, body) in enumerate(
+                [("Django", "Redis"), ("Redis", "Django")]
+            )
+        )
+
+    def _vector(self, post: Post) -> str | None:
+        return Post.objects.values_list("search_vector", flat=True).get(pk=post.pk)
+
+    def _search(self, text: str) -> list[int]:
+        results = Post.get_posts_by_search(parse_query(text))
+        return list(results.values_list("pk", flat=True))
+
+    @skipUnless(connection.vendor == "postgresql", "requires PostgreSQL")
+    def test_vector_is_weighted_and_updated_on_save(self):
+        self.assertRegex(self._vector(self.title_post), r"'django':\d+A")
+        self.assertRegex(self._vector(self.title_post), r"'redis':\d+B")
+        # Совпадение в заголовке ранжируется выше совпадения в тексте
+        self.assertEqual(
+            self._search("django"), [self.title_post.pk, self.body_post.pk]
+        )
+
+        self.body_post.body = "Flask"
+        self.body_post.save(update_fields=["body"])
+        self.assertEqual(self._search("django"), [self.title_post.pk])
+        self.assertEqual(self._search("flask"), [self.body_post.pk])
+
+    @skipUnless(connection.vendor == "postgresql", "requires PostgreSQL")
+    def test_update_search_vectors_command(self):
+        Post.objects.filter(pk=self.body_post.pk).update(search_vector=None)
+        out = StringIO()
+
+        call_command("update_search_vectors", batch_size=1, stdout=out)
+
+        self.assertIn("Updated 1 posts", out.getvalue())
+        self.assertRegex(self._vector(self.body_post), r"'django':\d+B")
+
+        call_command("update_search_vectors", "--all", stdout=out)
+        self.assertIn("Updated 2 posts", out.getvalue())
+
+    @skipUnless(connection.vendor != "postgresql", "PostgreSQL is available")
+    def test_command_requires_postgresql(self):
+        self.assertIsNone(self._vector(self.title_post))
+        with self.assertRaises(CommandError):
+            call_command("update_search_vectors")
+
+
+class ConditionalGetTests(TestCase):
+    """Revisits with a matching ETag get 304 without rendering."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create(username="author")
+        category = Category.objects.create(title="Posts", url_path="posts")
+        cls.post = Post.objects.create(
+            title="Post",
+            slug="post",
+            body="Body",
+            author=author,
+            category=category,
+            status=Post.Status.PUBLISHED,
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_not_modified_until_post_changes(self):
+        for url in (self.post.get_absolute_url(), "/", "/posts/"):
+            with self.subTest(url=url):
+                etag = self.client.get(url)["ETag"]
+
+                with self.assertNumQueries(0):
+                    response = self.client.get(url, headers={"if-none-match": etag})
+                self.assertEqual(response.status_code, 304)
+
+                with self.captureOnCommitCallbacks(execute=True):
+                    self.post.save()
+
+                response = self.client.get(url, headers={"if-none-match": etag})
+                self.assertEqual(response.status_code, 200)
+
+    def test_last_modified_follows_tag_invalidation(self):
+        newest = Post.objects.create(
+            title="Newest",
+            slug="newest",
+            body="Body",
+            author=self.post.author,
+            category=self.post.category,
+            status=Post.Status.PUBLISHED,
+        )
+        for url in ("/", "/posts/"):
+            with self.subTest(url=url):
+                cache.clear()
+                since = self.client.get(url)["Last-Modified"]
+                response = self.client.get(url, headers={"if-modified-since": since})
+                self.assertEqual(response.status_code, 304)
+
+                # Снятие поста с публикации: Max(updated) уменьшается
+                with (
+                    mock.patch("blog.cache.time.time", return_value=time.time() + 60),
+                    self.captureOnCommitCallbacks(execute=True),
+                ):
+                    newest.status = Post.Status.DRAFT
+                    newest.save()
+                response = self.client.get(url, headers={"if-modified-since": since})
+                self.assertEqual(response.status_code, 200)
+                newest.status = Post.Status.PUBLISHED
+                newest.save()
+
+                since = response["Last-Modified"]
+                # Изменение шапки (настройки, меню) не меняет ни один пост
+                with mock.patch("blog.cache.time.time", return_value=time.time() + 120):
+                    invalidate_tags(TAG_LAYOUT)
+                response = self.client.get(url, headers={"if-modified-since": since})
+                self.assertEqual(response.status_code, 200)
+
+    def test_search_is_not_validated(self):
+        response = self.client.get("/", {"search": "Post"})
+        self.assertFalse(response.has_header("ETag"))
+
+
+class StaticExportTests(TestCase):
+    """Exported pages mirror the views and are refreshed incrementally."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create(username="author")
+        category = Category.objects.create(title="Posts", url_path="posts")
+        cls.posts = [
+            Post.objects.create(
+                title=f"Post {index}",
+                slug=f"post-{index}",
+                body="Body",
+                author=author,
+                category=category,
+                status=Post.Status.PUBLISHED,
+                publish=timezone.now() - timedelta(days=index),
+            )
+            for index in range(POSTS_PER_PAGE + 1)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.root = Path(self.enterContext(TemporaryDirectory()))
+
+    def _export(self, *args) -> str:
+        out = StringIO()
+        call_command(
+            "export_static", "--output", self.root, "--workers", "1", *args, stdout=out
+        )
+        return out.getvalue()
+
+    def test_export_and_incremental_update(self):
+        self._export()
+
+        post_file = self.root / page_file(self.posts[0].get_absolute_url())
+        self.assertIn(b"Post 0", post_file.read_bytes())
+        self.assertTrue((self.root / "index.html.gz").exists())
+        self.assertEqual(len(list((self.root / "cursor").glob("*.html"))), 1)
+        self.assertEqual(len(list((self.root / "posts" / "cursor").glob("*.html"))), 1)
+
+        self.assertIn("Rendering 0 of", self._export("--incremental"))
+
+        self.posts[0].status = Post.Status.DRAFT
+        self.posts[0].save()
+        self._export("--incremental")
+        self.assertFalse(post_file.exists())
+
+
+def make_upload(name="photo.jpg", size=(640, 480)) -> SimpleUploadedFile:
+    content = BytesIO()
+    Image.new("RGB", size, "teal").save(content, format="JPEG")
+    return SimpleUploadedFile(name, content.getvalue(), content_type="image/jpeg")
+
+
+class ImageJobTests(TestCase):
+    """Thumbnails are built by queued jobs, not during the save."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create(username="author")
+        cls.post = Post.objects.create(
+            title="Post", slug="post", body="Body", author=author
+        )
+
+    def setUp(self):
+        media_root = self.enterContext(TemporaryDirectory())
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+
+    def test_thumbnail_is_built_by_job(self):
+        image = Images.objects.create(post=self.post, image=make_upload())
+
+        self.assertEqual(image.status, Images.Status.PROCESSING)
+        self.assertFalse(image.thumbnail)
+        self.assertNotEqual(image.image.name, "photo.jpg")
+
+        self.assertEqual(process_jobs(10), 2)
+        image.refresh_from_db()
+        self.assertEqual(image.status, Images.Status.READY)
+        with Image.open(image.thumbnail.path) as thumbnail:
+            self.assertEqual(thumbnail.size, (300, 225))
+        self.assertFalse(ImageJob.objects.exists())
+
+        self.assertEqual((image.width, image.height), (640, 480))
+        self.assertEqual(image.size, Path(image.image.path).stat().st_size)
+        # make_upload заливает картинку цветом teal (0, 128, 128)
+        red, green, blue = (int(image.dominant_color[i : i + 2], 16) for i in (1, 3, 5))
+        self.assertLess(abs(red - 0) + abs(green - 128) + abs(blue - 128), 12)
+        self.assertTrue(image.placeholder.startswith("data:image/jpeg;base64,"))
+        self.assertLess(len(image.placeholder), 1000)
+
+    def test_backfill_image_metadata(self):
+        image = Images.objects.create(post=self.post, image=make_upload())
+        process_jobs(10)
+        Images.objects.update(width=None, height=None, placeholder="")
+
+        call_command("backfill_image_metadata", stdout=StringIO())
+        image.refresh_from_db()
+        self.assertEqual((image.width, image.height), (640, 480))
+        self.assertTrue(image.placeholder)
+
+    @override_settings(BLOG_IMAGE_JOB_MAX_ATTEMPTS=2, BLOG_IMAGE_JOB_RETRY_DELAY=0)
+    def test_failed_job_is_retried(self):
+        broken = SimpleUploadedFile("broken.jpg", b"not an image")
+        image = Images.objects.create(post=self.post, image=broken)
+
+        process_jobs(10)
+        job = ImageJob.objects.get(kind="thumbnail")
+        self.assertEqual((job.status, job.attempts), (ImageJob.Status.PENDING, 1))
+
+        process_jobs(10)
+        job.refresh_from_db()
+        image.refresh_from_db()
+        self.assertEqual(job.status, ImageJob.Status.FAILED)
+        self.assertEqual(image.status, Images.Status.FAILED)
+
+    @override_settings(BLOG_IMAGE_MAX_PIXELS=100_000)
+    def test_too_large_image_is_not_retried(self):
+        image = Images.objects.create(post=self.post, image=make_upload())
+
+        process_jobs(10)
+        job = ImageJob.objects.get(kind="thumbnail")
+        image.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (ImageJob.Status.FAILED, 1))
+        self.assertEqual(image.status, Images.Status.FAILED)
+        self.assertFalse(image.thumbnail)
+
+    @override_settings(
+        BLOG_IMAGE_VARIANT_WIDTHS=(320, 1280),
+        BLOG_IMAGE_VARIANT_FORMATS=("webp", "jpeg"),
+    )
+    def test_variants_are_rendered_as_srcset(self):
+        category = Category.objects.create(title="Posts", url_path="posts")
+        Post.objects.filter(pk=self.post.pk).update(
+            category=category, status=Post.Status.PUBLISHED
+        )
+        image = Images.objects.create(
+            post=self.post, image=make_upload(), image_type="main"
+        )
+        process_jobs(10)
+
+        variants = list(image.variants.values_list("format", "width", "height"))
+        self.assertCountEqual(
+            variants,
+            [
+                ("webp", 320, 240),
+                ("jpeg", 320, 240),
+                ("webp", 640, 480),
+                ("jpeg", 640, 480),
+            ],
+        )
+        self.post.refresh_from_db()
+        response = self.client.get(self.post.get_absolute_url())
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, ".webp 320w")
+        self.assertContains(response, 'width="640" height="480"')
+        self.assertContains(response, "url(data:image/jpeg;base64,")
+
+        path = image.variants.get(format="webp", width=320).file.path
+        with self.captureOnCommitCallbacks(execute=True):
+            image.delete()
+        self.assertFalse(Path(path).exists())
+
+    def test_duplicate_uploads_share_files(self):
+        first = Images.objects.create(post=self.post, image=make_upload("a.jpg"))
+        process_jobs(10)
+        second = Images.objects.create(post=self.post, image=make_upload("b.jpg"))
+        with mock.patch("blog.signals.create_thumbnail") as create:
+            process_jobs(10)
+        create.assert_not_called()
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(second.image.name, first.image.name)
+        self.assertTrue(second.image.name.startswith("blobs/"))
+        self.assertEqual(second.thumbnail.name, first.thumbnail.name)
+        self.assertEqual(
+            sorted(second.variants.values_list("file", flat=True)),
+            sorted(first.variants.values_list("file", flat=True)),
+        )
+        self.assertEqual(MediaBlob.objects.get(name=first.image.name).refcount, 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(Path(second.image.path).exists())
+        self.assertTrue(Path(second.thumbnail.path).exists())
+        self.assertEqual(MediaBlob.objects.get(name=second.image.name).refcount, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(Path(second.image.path).exists())
+        self.assertFalse(MediaBlob.objects.exists())
+
+    def test_sweep_deletes_only_old_orphans(self):
+        image = Images.objects.create(post=self.post, image=make_upload())
+        process_jobs(10)
+        image.refresh_from_db()
+        media_root = Path(image.image.path).parents[2]
+        old_orphan = media_root / "2024/01/01/lost.jpg"
+        new_orphan = media_root / "2024/01/01/uploading.jpg"
+        for orphan in (old_orphan, new_orphan):
+            orphan.parent.mkdir(parents=True, exist_ok=True)
+            orphan.write_bytes(b"orphan")
+        for path in (old_orphan, image.image.path, image.thumbnail.path):
+            os.utime(path, (0, 0))
+
+        out = StringIO()
+        call_command("sweep_orphan_media", "--dry-run", "--batch-size=2", stdout=out)
+        self.assertIn("2024/01/01/lost.jpg\n", out.getvalue())
+        self.assertIn("Would delete 1 of 1 orphan files", out.getvalue())
+        self.assertTrue(old_orphan.exists())
+
+        call_command("sweep_orphan_media", stdout=StringIO())
+        self.assertFalse(old_orphan.exists())
+        self.assertTrue(new_orphan.exists())
+        self.assertTrue(Path(image.image.path).exists())
+        self.assertTrue(Path(image.thumbnail.path).exists())
@@ -1,13 +1,36 @@
 import logging
 
-from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
 from django.http import Http404
-from django.shortcuts import get_object_or_404, render
+from django.shortcuts import get_object_or_404, redirect, render
+from django.views.decorators.http import condition
 
+from .cache import (
+    TAG_LAYOUT,
+    TAG_POSTS,
+    add_cache_tags,
+    cache_page_by_tags,
+    category_tag,
+    object_comments_tag,
+    post_tag,
+)
+from .conditional import (
+    post_detail_etag,
+    post_detail_last_modified,
+    post_list_etag,
+    post_list_last_modified,
+)
 from .models import Category, Post
-from .utils import check_rate_limit, validate_search_query
+from .pagination import IdListPaginator, InvalidCursor, KeysetPaginator
+from .query import ParsedQuery, parse_query
+from .ratelimit import check_rate_limit, retry_after_header
+from .search import get_search_results
 
 POSTS_PER_PAGE = 3
+# Порядок сортировки = ключи курсора; последний ключ уникален
+LIST_ORDERING = ("-publish", "-pk")
+CATEGORY_ORDERING = ("publish", "pk")
+# Тело поста и готовый HTML в списках не нужны: выводится excerpt
+LIST_DEFERRED_FIELDS = ("body", "body_html", "toc_html")
 logger = logging.getLogger("blog")
 
 
@@ -49,6 +72,8 @@ def handle_blog_exceptions(view_func):
     return wrapper
 
 
+@condition(etag_func=post_list_etag, last_modified_func=post_list_last_modified)
+@cache_page_by_tags(query_params=("cursor", "page", "search"))
 @handle_blog_exceptions
 def post_list(request, category: str = ""):
     """
@@ -61,9 +86,9 @@ def post_list(request, category: str = ""):
         logger.info(f"Загружаю категорию {category}")
         return _handle_category_view(request, category, template_name, context)
 
-    if search_query := validate_search_query(request.GET.get("search", "")):
-        if not check_rate_limit(request, "search", 15, 60):
-            return render(
+    if search_query := parse_query(request.GET.get("search", "")):
+        if not (limit := check_rate_limit(request, "search")):
+            response = render(
                 request,
                 "base/_error.html",
                 {
@@ -72,18 +97,24 @@ def post_list(request, category: str = ""):
                 },
                 status=423,
             )
+            response["Retry-After"] = retry_after_header(limit)
+            return response
         return _handle_search_view(request, search_query, template_name, context)
 
     return _handle_main_list_view(request, template_name, context)
 
 
+@condition(etag_func=post_detail_etag, last_modified_func=post_detail_last_modified)
+@cache_page_by_tags()
 @handle_blog_exceptions
 def post_detail(request, url_path: str, year: int, month: int, day: int, post: str):
     """
     Display single post detail.
     """
     post_obj = get_object_or_404(
-        Post.objects.select_related("category", "author").prefetch_related("images"),
+        Post.objects.select_related("category", "author").prefetch_related(
+            "images__variants"
+        ),
         slug=post,
         publish__year=year,
         publish__month=month,
@@ -98,14 +129,18 @@ def post_detail(request, url_path: str, year: int, month: int, day: int, post: s
     if post_obj.category.url_path != url_path:
         raise Http404("Post not found in this category")
 
+    add_cache_tags(
+        request,
+        TAG_LAYOUT,
+        post_tag(post_obj.pk),
+        category_tag(post_obj.category.pk),
+        object_comments_tag(post_obj),
+    )
+    previous_post, next_post = Post.get_neighbours(post_obj)
     context = {
         "post": post_obj,
-        "previous_post": Post.get_prev_next_posts(
-            post_obj.category.url_path, post_obj.pk, "prev", "pk"
-        ),
-        "next_post": Post.get_prev_next_posts(
-            post_obj.category.url_path, post_obj.pk, "next", "pk"
-        ),
+        "previous_post": previous_post,
+        "next_post": next_post,
         "category": post_obj.category.title,
     }
 
@@ -119,48 +154,64 @@ def _handle_category_view(request, category: str, template_name: str, context: d
     logger.info(f"Открываю категорию для постов - {category}")
     posts_query = (
         Post.objects.select_related("category", "author")
-        .prefetch_related("images")
+        .prefetch_related("images__variants")
         .filter(category__url_path=category, status=Post.Status.PUBLISHED)
-        .order_by("pk")
     )
 
-    if category_obj.type_category == Category.TYPE_POSTS:
-        # Posts list for this category
-        posts = posts_query.all()
-        context.update(
-            {
-                "posts": posts,
-                "category": category_obj.title,
-                "cnt": posts.count(),
-            }
-        )
-        template_name = "blog/post/list.html"
-    else:
+    if category_obj.type_category != Category.TYPE_POSTS:
         # Single page for this category
-        post = posts_query.first()
+        post = posts_query.order_by("pk").first()
         if not post:
             raise Http404("No published posts found for this category")
 
+        add_cache_tags(
+            request,
+            TAG_LAYOUT,
+            post_tag(post.pk),
+            category_tag(category_obj.pk),
+            object_comments_tag(post),
+        )
         context.update(
             {
                 "post": post,
                 "category": category_obj.title,
             }
         )
-        template_name = "blog/post/detail.html"
-    logger.info(f"Загрузил шаблон {template_name} {posts}")
+        logger.info(f"Загрузил страницу категории {category}")
+        return render(request, "blog/post/detail.html", context)
+
+    # Posts list for this category, oldest first
+    add_cache_tags(request, category_tag(category_obj.pk))
+    context.update(
+        {
+            "posts": posts_query.defer(*LIST_DEFERRED_FIELDS),
+            "ordering": CATEGORY_ORDERING,
+            "category": category_obj.title,
+        }
+    )
+    logger.info(f"Загрузил шаблон {template_name} для категории {category}")
     return _handle_main_list_view(request, template_name, context)
 
 
 @handle_blog_exceptions
-def _handle_search_view(request, search_query: str, template_name: str, context: dict):
+def _handle_search_view(
+    request, search_query: ParsedQuery, template_name: str, context: dict
+):
     """Handle search functionality."""
-    posts = Post.get_posts_by_search(search_query)
+    # Только опубликованные: кэш id мог быть собран до снятия поста
+    posts = (
+        Post.published.select_related("category", "author")
+        .prefetch_related("images__variants")
+        .defer(*LIST_DEFERRED_FIELDS)
+    )
+    # Упорядоченные id результатов кэшируются, страница грузится по pk
+    results = get_search_results(search_query)
     context.update(
         {
-            "posts": posts,
-            "search": search_query,
-            "cnt": posts.count(),
+            "paginator": IdListPaginator(
+                posts, results.ids, POSTS_PER_PAGE, results.total
+            ),
+            "search": search_query.text,
         }
     )
     return _handle_main_list_view(request, template_name, context)
@@ -168,22 +219,48 @@ def _handle_search_view(request, search_query: str, template_name: str, context:
 
 @handle_blog_exceptions
 def _handle_main_list_view(request, template_name: str, context: dict):
-    """Handle main posts list with pagination."""
-    posts = context.get(
-        "posts",
-        Post.published.select_related("category", "author").prefetch_related("images"),
-    )
+    """Handle posts list with keyset (cursor) pagination."""
+    paginator = context.pop("paginator", None)
+    if paginator is None:
+        posts = context.get(
+            "posts",
+            Post.published.select_related("category", "author")
+            .prefetch_related("images__variants")
+            .defer(*LIST_DEFERRED_FIELDS),
+        )
+        paginator = KeysetPaginator(
+            posts, POSTS_PER_PAGE, context.pop("ordering", LIST_ORDERING)
+        )
+
+    add_cache_tags(request, TAG_LAYOUT, TAG_POSTS)
 
-    paginator = Paginator(posts, POSTS_PER_PAGE)
-    page_number = request.GET.get("page", 1)
+    # Совместимость со старыми ссылками вида ?page=N
+    if "page" in request.GET and "cursor" not in request.GET:
+        return _redirect_legacy_page(request, paginator)
 
     try:
-        posts_page = paginator.page(page_number)
-    except PageNotAnInteger:
-        posts_page = paginator.page(1)
-    except EmptyPage:
-        posts_page = paginator.page(paginator.num_pages)
+        posts_page = paginator.page(request.GET.get("cursor"))
+    except InvalidCursor:
+        logger.warning(f"Invalid pagination cursor: {request.GET.get('cursor')}")
+        posts_page = paginator.page()
 
     context["posts"] = posts_page
-    logger.info(context)
+    # Счетчик считается лениво: только если его выводит шаблон
+    context["cnt"] = paginator.get_count
     return render(request, template_name, context)
+
+
+def _redirect_legacy_page(request, paginator: KeysetPaginator | IdListPaginator):
+    """Permanently redirect ``?page=N`` to the equivalent cursor url."""
+    query = request.GET.copy()
+    page_number = query.pop("page", ["1"])[-1]
+    try:
+        cursor = paginator.cursor_for_page_number(int(page_number))
+    except ValueError:
+        cursor = None
+    if cursor:
+        query["cursor"] = cursor
+    url = request.path
+    if query:
+        url = f"{url}?{query.urlencode()}"
+    return redirect(url, permanent=True)
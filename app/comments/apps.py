@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class СommentsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "comments"
+
+    def ready(self):
+        # Импортируем сигналы
+        from . import signals  # noqa: F401
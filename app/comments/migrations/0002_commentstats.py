@@ -0,0 +1,98 @@
+# Generated by Django 5.0.14 on 2026-10-18 03:29
+
+import django.db.models.deletion
+from django.core.exceptions import FieldDoesNotExist
+from django.db import migrations, models
+
+RATING_VALUES = range(1, 6)
+
+
+def fill_stats(apps, schema_editor):
+    """Счетчики по уже одобренным комментариям и rating их объектов"""
+    Comment = apps.get_model("comments", "Comment")
+    CommentStats = apps.get_model("comments", "CommentStats")
+    ContentType = apps.get_model("contenttypes", "ContentType")
+
+    rows = (
+        Comment.objects.filter(status="approved")
+        .values("content_type_id", "object_id")
+        .annotate(
+            total=models.Count("pk"),
+            rating_sum=models.Sum("rating"),
+            **{
+                f"rating_{rating}": models.Count("pk", filter=models.Q(rating=rating))
+                for rating in RATING_VALUES
+            },
+            with_replies=models.Count("pk", filter=models.Q(admin_reply__regex=r"\S")),
+            verified=models.Count("pk", filter=models.Q(is_verified=True)),
+        )
+        .order_by()
+    )
+    stats = [CommentStats(**row) for row in rows]
+    CommentStats.objects.bulk_create(stats, batch_size=500)
+
+    for row in stats:
+        content_type = ContentType.objects.get(pk=row.content_type_id)
+        try:
+            model = apps.get_model(content_type.app_label, content_type.model)
+            model._meta.get_field("rating")
+        except (LookupError, FieldDoesNotExist):
+            # Модели без rating или еще не созданные миграциями
+            continue
+        model._base_manager.filter(pk=row.object_id).update(
+            rating=row.rating_sum / row.total
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("comments", "0001_initial"),
+        ("contenttypes", "0002_remove_content_type_name"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CommentStats",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("object_id", models.PositiveIntegerField()),
+                ("total", models.PositiveIntegerField(default=0)),
+                ("rating_sum", models.PositiveIntegerField(default=0)),
+                ("rating_1", models.PositiveIntegerField(default=0)),
+                ("rating_2", models.PositiveIntegerField(default=0)),
+                ("rating_3", models.PositiveIntegerField(default=0)),
+                ("rating_4", models.PositiveIntegerField(default=0)),
+                ("rating_5", models.PositiveIntegerField(default=0)),
+                ("with_replies", models.PositiveIntegerField(default=0)),
+                ("verified", models.PositiveIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "content_type",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="contenttypes.contenttype",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Статистика комментариев",
+                "verbose_name_plural": "Статистика комментариев",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="commentstats",
+            constraint=models.UniqueConstraint(
+                fields=("content_type", "object_id"),
+                name="comments_commentstats_object",
+            ),
+        ),
+        migrations.RunPython(fill_stats, migrations.RunPython.noop),
+    ]
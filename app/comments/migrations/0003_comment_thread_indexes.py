@@ -0,0 +1,36 @@
+# Generated by Django 5.0.14 on 2026-10-18 03:32
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("comments", "0002_commentstats"),
+        ("contenttypes", "0002_remove_content_type_name"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="comment",
+            index=models.Index(
+                fields=["content_type", "object_id", "status", "created_at", "id"],
+                name="comments_thread_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="comment",
+            index=models.Index(
+                fields=[
+                    "content_type",
+                    "object_id",
+                    "status",
+                    "rating",
+                    "created_at",
+                    "id",
+                ],
+                name="comments_thread_rating_idx",
+            ),
+        ),
+    ]
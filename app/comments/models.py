@@ -1,11 +1,64 @@
+import logging
 import uuid
 
 from django.conf import settings
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
-from django.db import models
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models, transaction
+from django.dispatch import Signal
 from django.utils import timezone
 
+logger = logging.getLogger("comments")
+
+# Оценки, по которым считается распределение в статистике
+RATING_VALUES = range(1, 6)
+# Поля Comment, от которых зависит CommentStats (значения при загрузке
+# запоминаются, чтобы при сохранении применить только разницу)
+STATS_TRACKED_FIELDS = (
+    "content_type_id",
+    "object_id",
+    "status",
+    "rating",
+    "admin_reply",
+    "is_verified",
+)
+
+# Отправляется после изменения CommentStats объекта (аргументы
+# content_type_id, object_id и rating_changed - изменилось ли поле rating
+# объекта), например для сброса кэша страниц
+stats_changed = Signal()
+
+
+class CommentQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        """
+        Массовое обновление (действия админки) с пересчетом CommentStats.
+
+        Вклад затронутых комментариев считается одним GROUP BY запросом до и
+        после обновления, статистике объектов добавляется разница.
+        """
+        fields = {name.removesuffix("_id") for name in kwargs}
+        tracked = {name.removesuffix("_id") for name in STATS_TRACKED_FIELDS}
+        if not fields & tracked:
+            return super().update(**kwargs)
+
+        with transaction.atomic(using=self.db):
+            pks = list(self.values_list("pk", flat=True))
+            rows = self.model._base_manager.using(self.db).filter(pk__in=pks)
+            # Блокируем только сами комментарии (без JOIN админки)
+            list(rows.select_for_update().values_list("pk", flat=True))
+            before = CommentStats.contributions(rows)
+            updated = models.QuerySet.update(rows, **kwargs)
+            after = CommentStats.contributions(rows)
+            for key in before.keys() | after.keys():
+                old, new = before.get(key, {}), after.get(key, {})
+                delta = {
+                    name: new.get(name, 0) - old.get(name, 0) for name in new | old
+                }
+                CommentStats.apply_delta(*key, delta)
+        return updated
+
 
 class Comment(models.Model):
     """
@@ -138,6 +191,9 @@ class Comment(models.Model):
         help_text="Дополнительные данные в формате JSON",
     )
 
+    # update() пересчитывает CommentStats
+    objects = CommentQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Комментарий"
         verbose_name_plural = "Комментарии"
@@ -151,6 +207,22 @@ class Comment(models.Model):
             models.Index(fields=["user"]),
             models.Index(fields=["email"]),
             models.Index(fields=["is_verified"]),
+            # Keyset-пагинация списка: страница - это диапазон индекса
+            models.Index(
+                fields=["content_type", "object_id", "status", "created_at", "id"],
+                name="comments_thread_created_idx",
+            ),
+            models.Index(
+                fields=[
+                    "content_type",
+                    "object_id",
+                    "status",
+                    "rating",
+                    "created_at",
+                    "id",
+                ],
+                name="comments_thread_rating_idx",
+            ),
         ]
         constraints = [
             # Проверка рейтинга
@@ -171,7 +243,32 @@ class Comment(models.Model):
         if self.admin_reply and not self.replied_at:
             self.replied_at = timezone.now()
 
-        super().save(*args, **kwargs)
+        loaded = getattr(self, "_loaded_values", None)
+        saved = self._get_tracked_values()
+        update_fields = kwargs.get("update_fields")
+        if loaded is not None and update_fields is not None:
+            # Несохраняемые поля в БД остаются прежними
+            update_fields = set(update_fields)
+            saved = {
+                name: value
+                if {name, name.removesuffix("_id")} & update_fields
+                else loaded[name]
+                for name, value in saved.items()
+            }
+
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            CommentStats.apply_change(loaded, saved)
+        self._loaded_values = saved
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = instance._get_tracked_values()
+        return instance
+
+    def _get_tracked_values(self):
+        return {name: self.__dict__.get(name) for name in STATS_TRACKED_FIELDS}
 
     # ========== МЕТОДЫ ДЛЯ УДОБСТВА ==========
     def get_display_name(self):
@@ -223,22 +320,48 @@ class Comment(models.Model):
 
     @classmethod
     def get_statistics(cls, obj):
-        """Статистика комментариев для объекта"""
-        comments = cls.get_for_object(obj)
+        """Статистика комментариев для объекта (одна строка CommentStats)"""
+        content_type = ContentType.objects.get_for_model(obj)
+        stats = CommentStats.objects.filter(
+            content_type=content_type, object_id=obj.pk
+        ).first()
+        return (stats or CommentStats()).as_statistics()
 
-        return {
-            "total": comments.count(),
-            "average_rating": comments.aggregate(avg=models.Avg("rating"))["avg"] or 0,
-            "ratings_distribution": {
-                1: comments.filter(rating=1).count(),
-                2: comments.filter(rating=2).count(),
-                3: comments.filter(rating=3).count(),
-                4: comments.filter(rating=4).count(),
-                5: comments.filter(rating=5).count(),
-            },
-            "with_replies": comments.filter(admin_reply__regex=r"\S").count(),
-            "verified": comments.filter(is_verified=True).count(),
-        }
+    @classmethod
+    def get_statistics_batch(cls, objects):
+        """
+        Статистика для многих объектов: один запрос на тип объекта.
+
+        Возвращает словарь {объект: статистика}. Результат запоминается и на
+        самих объектах, шаблонные теги его переиспользуют.
+        """
+        by_type = {}
+        for obj in objects:
+            content_type = ContentType.objects.get_for_model(obj)
+            by_type.setdefault(content_type, {})[obj.pk] = obj
+
+        result = {}
+        for content_type, by_pk in by_type.items():
+            found = {
+                stats.object_id: stats
+                for stats in CommentStats.objects.filter(
+                    content_type=content_type, object_id__in=by_pk
+                )
+            }
+            for pk, obj in by_pk.items():
+                # У объектов без комментариев строки статистики нет
+                stats = found.get(pk, CommentStats()).as_statistics()
+                obj._comment_statistics = stats
+                result[obj] = stats
+        return result
+
+    @classmethod
+    async def aget_statistics(cls, content_type, object_id):
+        """Статистика комментариев для async-представлений (без get_for_model)"""
+        stats = await CommentStats.objects.filter(
+            content_type=content_type, object_id=object_id
+        ).afirst()
+        return (stats or CommentStats()).as_statistics()
 
     # ========== МЕТОДЫ ДЛЯ АДМИНИСТРАТОРА ==========
     def approve(self):
@@ -285,6 +408,208 @@ class ApprovedComment(Comment):
         return super().get_queryset().filter(status=Comment.Status.APPROVED)
 
 
+# ========== СТАТИСТИКА ==========
+class CommentStats(models.Model):
+    """
+    Денормализованная статистика одобренных комментариев объекта.
+
+    Счетчики меняются F() выражениями в транзакции сохранения, удаления или
+    массового обновления комментария, чтение статистики - одна строка.
+    Средний рейтинг копируется в поле rating объекта (Post.rating).
+
+    Модель объекта объявляет GenericRelation на CommentStats, чтобы строка
+    удалялась вместе с объектом.
+    """
+
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+
+    # Одобренные комментарии и сумма их оценок
+    total = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_1 = models.PositiveIntegerField(default=0)
+    rating_2 = models.PositiveIntegerField(default=0)
+    rating_3 = models.PositiveIntegerField(default=0)
+    rating_4 = models.PositiveIntegerField(default=0)
+    rating_5 = models.PositiveIntegerField(default=0)
+    with_replies = models.PositiveIntegerField(default=0)
+    verified = models.PositiveIntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    COUNTER_FIELDS = (
+        "total",
+        "rating_sum",
+        *(f"rating_{rating}" for rating in RATING_VALUES),
+        "with_replies",
+        "verified",
+    )
+
+    class Meta:
+        verbose_name = "Статистика комментариев"
+        verbose_name_plural = "Статистика комментариев"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["content_type", "object_id"],
+                name="comments_commentstats_object",
+            ),
+        ]
+
+    def __str__(self):
+        return f"Статистика {self.content_type_id}:{self.object_id} ({self.total})"
+
+    @property
+    def average_rating(self):
+        return self.rating_sum / self.total if self.total else 0
+
+    def as_statistics(self):
+        """Словарь статистики в формате JSON-ответов и виджета"""
+        return {
+            "total": self.total,
+            "average_rating": self.average_rating,
+            "ratings_distribution": {
+                rating: getattr(self, f"rating_{rating}") for rating in RATING_VALUES
+            },
+            "with_replies": self.with_replies,
+            "verified": self.verified,
+        }
+
+    @staticmethod
+    def contribution(values):
+        """Вклад комментария (значения STATS_TRACKED_FIELDS) в счетчики"""
+        if values is None or values["status"] != Comment.Status.APPROVED:
+            return {}
+        rating = values["rating"] or 0
+        result = {
+            "total": 1,
+            "rating_sum": rating,
+            "with_replies": int(bool((values["admin_reply"] or "").strip())),
+            "verified": int(bool(values["is_verified"])),
+        }
+        if rating in RATING_VALUES:
+            result[f"rating_{rating}"] = 1
+        return result
+
+    @classmethod
+    def contributions(cls, comments):
+        """Вклад набора комментариев по объектам: {(ct_id, object_id): счетчики}"""
+        rows = (
+            comments.filter(status=Comment.Status.APPROVED)
+            .values("content_type_id", "object_id")
+            .annotate(
+                total=models.Count("pk"),
+                rating_sum=models.Sum("rating"),
+                **{
+                    f"rating_{rating}": models.Count(
+                        "pk", filter=models.Q(rating=rating)
+                    )
+                    for rating in RATING_VALUES
+                },
+                with_replies=models.Count(
+                    "pk", filter=models.Q(admin_reply__regex=r"\S")
+                ),
+                verified=models.Count("pk", filter=models.Q(is_verified=True)),
+            )
+            .order_by()
+        )
+        return {
+            (row["content_type_id"], row["object_id"]): {
+                name: row[name] or 0 for name in cls.COUNTER_FIELDS
+            }
+            for row in rows
+        }
+
+    @classmethod
+    def apply_change(cls, old_values, new_values):
+        """Применяет изменение одного комментария (None - строки нет)"""
+        old = cls.contribution(old_values)
+        new = cls.contribution(new_values)
+        old_key = old_values and (
+            old_values["content_type_id"],
+            old_values["object_id"],
+        )
+        new_key = new_values and (
+            new_values["content_type_id"],
+            new_values["object_id"],
+        )
+        if old_key == new_key:
+            cls.apply_delta(
+                *new_key,
+                {name: new.get(name, 0) - old.get(name, 0) for name in new | old},
+            )
+            return
+        if old:
+            cls.apply_delta(*old_key, {name: -value for name, value in old.items()})
+        if new:
+            cls.apply_delta(*new_key, new)
+
+    @classmethod
+    def apply_delta(cls, content_type_id, object_id, delta):
+        """Прибавляет delta к счетчикам объекта и обновляет его rating"""
+        delta = {name: value for name, value in delta.items() if value}
+        if not delta:
+            return
+        with transaction.atomic():
+            cls.objects.get_or_create(
+                content_type_id=content_type_id, object_id=object_id
+            )
+            # Блокировка строки до конца транзакции: проверка и UPDATE вместе
+            stats = cls.objects.select_for_update().get(
+                content_type_id=content_type_id, object_id=object_id
+            )
+            if any(getattr(stats, name) + value < 0 for name, value in delta.items()):
+                # Счетчики разошлись с комментариями: отрицательное значение
+                # сорвало бы сохранение комментария, пересчитываем строку
+                logger.warning(
+                    f"Comment stats {content_type_id}:{object_id} drifted, recomputing"
+                )
+                stats.recompute()
+            else:
+                cls.objects.filter(pk=stats.pk).update(
+                    **{name: models.F(name) + value for name, value in delta.items()}
+                )
+                stats.refresh_from_db(fields=cls.COUNTER_FIELDS)
+            rating_changed = stats.sync_rating()
+        stats_changed.send(
+            sender=cls,
+            content_type_id=content_type_id,
+            object_id=object_id,
+            rating_changed=rating_changed,
+        )
+
+    def recompute(self):
+        """Счетчики заново по комментариям объекта (одним запросом)"""
+        comments = Comment._base_manager.filter(
+            content_type_id=self.content_type_id, object_id=self.object_id
+        )
+        counters = self.contributions(comments).get(
+            (self.content_type_id, self.object_id), {}
+        )
+        for name in self.COUNTER_FIELDS:
+            setattr(self, name, counters.get(name, 0))
+        self.save(update_fields=[*self.COUNTER_FIELDS, "updated_at"])
+
+    def sync_rating(self) -> bool:
+        """
+        Копирует средний рейтинг в поле rating объекта, если оно есть.
+        Возвращает True, если значение изменилось
+        """
+        model = ContentType.objects.get_for_id(self.content_type_id).model_class()
+        if model is None:
+            return False
+        try:
+            model._meta.get_field("rating")
+        except FieldDoesNotExist:
+            return False
+        rating = self.average_rating
+        # update() не шлет post_save: об изменении сообщает stats_changed
+        return bool(
+            model._base_manager.filter(pk=self.object_id)
+            .exclude(rating=rating)
+            .update(rating=rating)
+        )
+
+
 # ========== МЕНЕДЖЕРЫ ДЛЯ УДОБНЫХ ЗАПРОСОВ ==========
 class CommentManager(models.Manager):
     """Кастомный менеджер для комментариев"""
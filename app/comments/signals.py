@@ -0,0 +1,15 @@
+"""Keep CommentStats in step with deleted comments."""
+
+from django.db.models.signals import post_delete
+
+from .models import ApprovedComment, Comment, CommentStats, PendingComment
+
+
+def release_comment_stats(sender, instance, **kwargs):
+    # Удаление через queryset (админка) не вызывает Comment.delete
+    CommentStats.apply_change(getattr(instance, "_loaded_values", None), None)
+
+
+# Админка удаляет комментарии и через прокси-модели
+for _comment_model in (Comment, PendingComment, ApprovedComment):
+    post_delete.connect(release_comment_stats, sender=_comment_model)
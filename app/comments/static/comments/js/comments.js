@@ -19,7 +19,8 @@
         constructor(container, config = {}) {
             this.container = container;
             this.config = { ...DEFAULT_CONFIG, ...config };
-            this.currentPage = 1;
+            this.nextCursor = null;
+            this.loadedCount = 0;
             this.currentSort = 'newest';
             this.currentFilter = 'all';
             this.hasMore = true;
@@ -34,6 +35,10 @@
             this.contentTypeId = this.container.dataset.contentTypeId;
             this.objectId = this.container.dataset.objectId;
             this.hasRating = this.container.dataset.hasRating === 'true';
+            // Адрес API задается шаблоном (синхронные или async-эндпоинты)
+            if (this.container.dataset.apiBaseUrl) {
+                this.config.apiBaseUrl = this.container.dataset.apiBaseUrl;
+            }
             this.loadComments(true);
             // Инициализация компонентов
             this.initForm();
@@ -400,7 +405,6 @@
             if (this.currentSort === sortBy || this.isLoading) return;
             
             this.currentSort = sortBy;
-            this.currentPage = 1;
             
             // Обновляем активную кнопку
             const sortButtons = this.container.querySelectorAll('.sort-btn');
@@ -416,7 +420,6 @@
             if (this.currentFilter === filterBy || this.isLoading) return;
             
             this.currentFilter = filterBy;
-            this.currentPage = 1;
             
             // Обновляем активный фильтр
             const filterButtons = this.container.querySelectorAll('.filter-badge');
@@ -530,15 +533,21 @@
             if (clear) {
                 commentsList.innerHTML = '';
                 this.hasMore = true;
+                // Новый список начинается с первой страницы
+                this.nextCursor = null;
+                this.loadedCount = 0;
             }
             
             try {
                 const params = new URLSearchParams({
-                    page: this.currentPage,
                     per_page: this.config.itemsPerPage,
                     sort: this.currentSort,
                     filter: this.currentFilter
                 });
+                // Курсор последнего загруженного комментария
+                if (this.nextCursor) {
+                    params.set('cursor', this.nextCursor);
+                }
                 
                 const response = await fetch(
                     `${this.config.apiBaseUrl}list/${this.contentTypeId}/${this.objectId}/?${params}`,
@@ -560,6 +569,8 @@
                     }
                     
                     // Обновляем пагинацию
+                    this.loadedCount += data.comments.length;
+                    this.nextCursor = data.pagination.next_cursor;
                     this.hasMore = data.pagination.has_next;
                     this.updatePagination(data.pagination);
                     
@@ -582,7 +593,6 @@
         async loadMoreComments() {
             if (!this.hasMore || this.isLoading) return;
             
-            this.currentPage++;
             await this.loadComments(false);
         }
         
@@ -745,7 +755,7 @@
                 loadMoreBtn.disabled = false;
                 loadMoreBtn.innerHTML = `
                     Загрузить еще
-                    <span class="text-muted">(${pagination.current_page}/${pagination.total_pages})</span>
+                    <span class="text-muted">(${this.loadedCount}/${pagination.total_items})</span>
                 `;
             } else {
                 loadMoreBtn.classList.add('hidden');
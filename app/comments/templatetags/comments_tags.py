@@ -1,11 +1,37 @@
 from django import template
+from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
+from django.urls import reverse
 
 from ..models import Comment
 
 register = template.Library()
 
 
+def _get_statistics(obj):
+    # Виджет и average_rating на одной странице считают статистику один раз;
+    # Comment.get_statistics_batch заполняет ее заранее для списков
+    stats = getattr(obj, "_comment_statistics", None)
+    if stats is None:
+        stats = obj._comment_statistics = Comment.get_statistics(obj)
+    return stats
+
+
+def _api_base_url(content_type_id, object_id):
+    """
+    Общий префикс эндпоинтов list/submit/stats (виджет дописывает к нему
+    имя эндпоинта), взятый из urls, а не из того, куда подключено приложение
+    """
+    # Под ASGI виджет ходит в async-эндпоинты (COMMENTS_ASYNC_API = True)
+    name = (
+        "comments:list_async"
+        if getattr(settings, "COMMENTS_ASYNC_API", False)
+        else "comments:list"
+    )
+    list_url = reverse(name, args=[content_type_id, object_id])
+    return list_url.removesuffix(f"list/{content_type_id}/{object_id}/")
+
+
 @register.inclusion_tag("comments/widget.html", takes_context=True)
 def comments_widget(context, obj, show_form=True, show_stats=True):
     """
@@ -15,15 +41,16 @@ def comments_widget(context, obj, show_form=True, show_stats=True):
     {% comments_widget object show_form=True show_stats=True %}
     """
     request = context.get("request")
+    content_type_id = ContentType.objects.get_for_model(obj).id
 
     # Получаем статистику
-    stats = Comment.get_statistics(obj) if obj else {}
+    stats = _get_statistics(obj) if obj else {}
 
     # Проверяем комментарий текущего пользователя
     user_comment = None
     if request and request.user.is_authenticated:
         user_comment = Comment.objects.filter(
-            content_type=ContentType.objects.get_for_model(obj),
+            content_type_id=content_type_id,
             object_id=obj.pk,
             user=request.user,
         ).first()
@@ -35,8 +62,9 @@ def comments_widget(context, obj, show_form=True, show_stats=True):
         "show_form": show_form,
         "show_stats": show_stats,
         "request": request,
-        "content_type_id": ContentType.objects.get_for_model(obj).id,
+        "content_type_id": content_type_id,
         "object_id": obj.pk,
+        "api_base_url": _api_base_url(content_type_id, obj.pk),
         "is_staff": (
             request.user.is_authenticated and request.user.is_staff
             if request
@@ -72,7 +100,7 @@ def average_rating(obj):
     if not obj:
         return 0
 
-    stats = Comment.get_statistics(obj)
+    stats = _get_statistics(obj)
     return round(stats.get("average_rating", 0), 1)
 
 
@@ -0,0 +1,339 @@
+from importlib import import_module
+
+from asgiref.sync import async_to_sync
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from blog.cache import TAG_POSTS, get_tag_versions, post_tag
+from blog.models import Post
+from blog.ratelimit import _blocked
+
+from .models import Comment, CommentStats
+from .templatetags.comments_tags import _api_base_url
+
+fill_stats = import_module("comments.migrations.0002_commentstats").fill_stats
+
+
+class CommentStatsTests(TestCase):
+    """The CommentStats rollup must equal a fresh aggregate after any change."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create(username="author")
+        cls.post, cls.other_post = (
+            Post.objects.create(
+                title=f"Post {index}", slug=f"post-{index}", body="Body", author=author
+            )
+            for index in range(2)
+        )
+        cls.content_type = ContentType.objects.get_for_model(Post)
+
+    def _comment(self, post=None, **kwargs) -> Comment:
+        kwargs.setdefault("rating", 5)
+        return Comment.objects.create(
+            content_type=self.content_type,
+            object_id=(post or self.post).pk,
+            name="Reader",
+            text="Comment text",
+            **kwargs,
+        )
+
+    def assertStatsMatch(self, post=None):
+        post = post or self.post
+        expected = CommentStats.contributions(
+            Comment.objects.filter(content_type=self.content_type, object_id=post.pk)
+        ).get((self.content_type.pk, post.pk), {})
+        stats = CommentStats.objects.filter(
+            content_type=self.content_type, object_id=post.pk
+        ).first()
+        self.assertEqual(
+            {name: getattr(stats, name, 0) for name in CommentStats.COUNTER_FIELDS},
+            {name: expected.get(name, 0) for name in CommentStats.COUNTER_FIELDS},
+        )
+        post.refresh_from_db(fields=["rating"])
+        self.assertAlmostEqual(post.rating, stats.average_rating if stats else 0)
+
+    def test_single_comment_changes(self):
+        comment = self._comment()
+        self.assertStatsMatch()
+
+        comment.approve()
+        self.assertStatsMatch()
+        self.assertEqual(Comment.get_statistics(self.post)["total"], 1)
+
+        comment = Comment.objects.get(pk=comment.pk)
+        comment.rating = 2
+        comment.admin_reply = "Thanks"
+        comment.save()
+        self.assertStatsMatch()
+
+        comment.mark_as_verified()
+        self.assertStatsMatch()
+
+        # Несохраняемые поля не меняют статистику
+        comment.rating = 4
+        comment.save(update_fields=["text", "updated_at"])
+        self.assertStatsMatch()
+
+        comment.reject()
+        self.assertStatsMatch()
+        self.assertEqual(Comment.get_statistics(self.post)["total"], 0)
+
+    def test_bulk_update_and_move(self):
+        for rating in (1, 3, 5):
+            self._comment(rating=rating)
+        comments = Comment.objects.filter(object_id=self.post.pk)
+
+        comments.update(status=Comment.Status.APPROVED)
+        self.assertStatsMatch()
+
+        comments.filter(rating__lt=5).update(rating=4, is_verified=True)
+        self.assertStatsMatch()
+
+        comments.filter(rating=5).update(object_id=self.other_post.pk)
+        self.assertStatsMatch()
+        self.assertStatsMatch(self.other_post)
+
+    def test_delete(self):
+        first = self._comment(status=Comment.Status.APPROVED)
+        for rating in (2, 4):
+            self._comment(rating=rating, status=Comment.Status.APPROVED)
+
+        first.delete()
+        self.assertStatsMatch()
+
+        Comment.objects.filter(object_id=self.post.pk).delete()
+        self.assertStatsMatch()
+
+    def test_drifted_counters_are_recomputed(self):
+        comment = self._comment(status=Comment.Status.APPROVED)
+        self._comment(rating=3, status=Comment.Status.APPROVED)
+        CommentStats.objects.update(total=0, rating_sum=0, rating_5=0)
+
+        # Без пересчета счетчик ушел бы ниже нуля и удаление упало бы
+        comment.delete()
+
+        self.assertStatsMatch()
+
+    def test_stats_row_is_deleted_with_target(self):
+        self._comment(status=Comment.Status.APPROVED)
+        self._comment(self.other_post, status=Comment.Status.APPROVED)
+
+        self.post.delete()
+
+        self.assertQuerySetEqual(
+            CommentStats.objects.values_list("object_id", flat=True),
+            [self.other_post.pk],
+        )
+
+    def test_fill_stats_backfill(self):
+        for rating in (1, 4, 5):
+            self._comment(rating=rating, status=Comment.Status.APPROVED)
+        self._comment(self.other_post, admin_reply="Reply")
+        CommentStats.objects.all().delete()
+        Post.objects.update(rating=0)
+
+        fill_stats(apps, None)
+
+        self.assertStatsMatch()
+        self.assertStatsMatch(self.other_post)
+        self.assertAlmostEqual(self.post.rating, 10 / 3)
+
+    def test_rating_change_invalidates_post_pages(self):
+        tags = [TAG_POSTS, post_tag(self.post.pk)]
+        comment = self._comment(rating=4)
+        versions = get_tag_versions(tags)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            comment.approve()
+        self.assertNotEqual(get_tag_versions(tags), versions)
+
+        # Ответ администратора рейтинг не меняет: списки остаются в кэше
+        versions = get_tag_versions(tags)
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.filter(pk=comment.pk).update(admin_reply="Thanks")
+        self.assertEqual(get_tag_versions(tags), versions)
+
+    def test_statistics_batch_matches_single_object(self):
+        for rating in (2, 5):
+            self._comment(rating=rating, status=Comment.Status.APPROVED)
+        self._comment(self.other_post, rating=4, status=Comment.Status.APPROVED)
+        third_post = Post.objects.create(
+            title="Post 3", slug="post-3", body="Body", author=self.post.author
+        )
+        posts = [self.post, self.other_post, third_post]
+
+        with self.assertNumQueries(1):
+            Comment.get_statistics(self.post)
+        with self.assertNumQueries(1):
+            batch = Comment.get_statistics_batch(posts)
+
+        for post in posts:
+            self.assertEqual(batch[post], Comment.get_statistics(post))
+            # Шаблонные теги берут статистику с самого объекта
+            self.assertIs(post._comment_statistics, batch[post])
+        self.assertEqual(batch[self.post]["average_rating"], 3.5)
+        self.assertEqual(batch[third_post]["total"], 0)
+
+
+class CommentListPaginationTests(TestCase):
+    """Comment lists page by cursor over values() rows with UUID keys."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create(username="author")
+        post = Post.objects.create(
+            title="Post", slug="post", body="Body", author=author
+        )
+        content_type = ContentType.objects.get_for_model(Post)
+        created_at = timezone.now()
+        for index in range(5):
+            comment = Comment.objects.create(
+                content_type=content_type,
+                object_id=post.pk,
+                name=f"Reader {index}",
+                text="Comment text",
+                rating=index % 2 + 4,
+                status=Comment.Status.APPROVED,
+                admin_reply="Thanks" if index < 3 else "",
+                is_verified=index == 0,
+            )
+            # Одинаковое время: порядок держится на id
+            Comment.objects.filter(pk=comment.pk).update(created_at=created_at)
+        # Дату ответа стерли в админке: комментарий все равно отвеченный
+        Comment.objects.filter(name="Reader 2").update(replied_at=None)
+        cls.url = reverse("comments:list", args=[content_type.pk, post.pk])
+
+    def _fetch_all(self, **params):
+        """Names of all pages and the pagination block of the last one."""
+        names, cursor = [], None
+        while True:
+            if cursor:
+                params["cursor"] = cursor
+            data = self.client.get(self.url, params).json()
+            names += [comment["name"] for comment in data["comments"]]
+            cursor = data["pagination"]["next_cursor"]
+            if not data["pagination"]["has_next"]:
+                return names, data["pagination"]
+
+    def test_cursor_pages_cover_list_once(self):
+        for sort in ("newest", "oldest", "highest", "lowest"):
+            names, pagination = self._fetch_all(sort=sort, per_page=2)
+            self.assertEqual(len(set(names)), 5)
+            self.assertEqual(len(names), 5)
+            self.assertEqual(pagination["total_items"], 5)
+
+        response = self.client.get(self.url, {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_replied_sort_lists_and_counts_replied_comments(self):
+        names, pagination = self._fetch_all(sort="replied", per_page=2)
+        self.assertCountEqual(names, ["Reader 0", "Reader 1", "Reader 2"])
+        self.assertEqual(pagination["total_items"], 3)
+
+        # Пересечение со счетчиком verified не хранится: считается запросом
+        names, pagination = self._fetch_all(sort="replied", filter="verified")
+        self.assertEqual(names, ["Reader 0"])
+        self.assertEqual(pagination["total_items"], 1)
+
+    def test_per_page(self):
+        for per_page, expected in (("2", 2), ("abc", 5), ("0", 1), ("1000", 5)):
+            data = self.client.get(self.url, {"per_page": per_page}).json()
+            self.assertEqual(len(data["comments"]), expected, per_page)
+        data = self.client.get(self.url, {"per_page": "abc"}).json()
+        self.assertEqual(data["pagination"]["per_page"], 10)
+        data = self.client.get(self.url, {"per_page": "1000"}).json()
+        self.assertEqual(data["pagination"]["per_page"], 50)
+
+
+@override_settings(BLOG_RATE_LIMITS={"comment": {"limit": 1, "window": 60}})
+class AsyncEndpointTests(TestCase):
+    """Async endpoints answer with the same JSON as the sync ones."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="reader", is_staff=True)
+        post = Post.objects.create(
+            title="Post", slug="post", body="Body", author=cls.user
+        )
+        content_type = ContentType.objects.get_for_model(Post)
+        for index in range(3):
+            Comment.objects.create(
+                content_type=content_type,
+                object_id=post.pk,
+                user=cls.user if index == 0 else None,
+                name=f"Reader {index}",
+                text="Comment text",
+                rating=index + 3,
+                status=Comment.Status.APPROVED,
+            )
+        cls.args = [content_type.pk, post.pk]
+
+    def setUp(self):
+        cache.clear()
+        _blocked.clear()
+
+    def _get_both(self, name, params=None):
+        sync = self.client.get(reverse(f"comments:{name}", args=self.args), params)
+        asynchronous = async_to_sync(self.async_client.get)(
+            reverse(f"comments:{name}_async", args=self.args), params
+        )
+        self.assertEqual(sync.status_code, asynchronous.status_code)
+        return sync.json(), asynchronous.json()
+
+    def test_list_and_stats_match_sync_views(self):
+        for user in (None, self.user):
+            if user:
+                self.client.force_login(user)
+                self.async_client.force_login(user)
+            sync, asynchronous = self._get_both(
+                "list", {"sort": "highest", "per_page": 2}
+            )
+            self.assertEqual(sync, asynchronous)
+            self.assertEqual(len(sync["comments"]), 2)
+
+            sync, asynchronous = self._get_both(
+                "list", {"cursor": sync["pagination"]["next_cursor"]}
+            )
+            self.assertEqual(sync, asynchronous)
+
+        sync, asynchronous = self._get_both("stats")
+        self.assertEqual(sync, asynchronous)
+        self.assertEqual(sync["statistics"]["total"], 3)
+
+    def test_submit_and_rate_limit_match_sync_view(self):
+        data = {"name": "Reader", "rating": 5, "text": "Long enough comment text"}
+        responses = []
+        posters = {
+            "submit": self.client.post,
+            "submit_async": async_to_sync(self.async_client.post),
+        }
+        for name, post in posters.items():
+            url = reverse(f"comments:{name}", args=self.args)
+            accepted, rejected = post(url, data), post(url, data)
+            self.assertEqual(accepted.status_code, 200)
+            self.assertEqual(rejected.status_code, 429)
+            self.assertTrue(rejected.has_header("Retry-After"))
+            responses.append((accepted.json(), rejected.json()))
+            # Лимит общий для обеих версий: сбрасываем перед async
+            cache.clear()
+            _blocked.clear()
+
+        (sync, sync_rejected), (asynchronous, async_rejected) = responses
+        self.assertNotEqual(
+            sync["comment"].pop("id"), asynchronous["comment"].pop("id")
+        )
+        self.assertEqual(sync, asynchronous)
+        self.assertTrue(sync["requires_moderation"])
+        self.assertEqual(sync_rejected, async_rejected)
+        self.assertEqual(Comment.objects.filter(name="Reader").count(), 2)
+
+    def test_widget_api_base_url_follows_urls(self):
+        self.assertEqual(_api_base_url(*self.args), "/comments/")
+        with override_settings(COMMENTS_ASYNC_API=True):
+            self.assertEqual(_api_base_url(*self.args), "/comments/async/")
@@ -21,6 +21,22 @@ urlpatterns = [
         views.StatisticsView.as_view(),
         name="stats",
     ),
+    # Async-версии тех же эндпоинтов (для ASGI)
+    path(
+        "async/list/<int:content_type_id>/<int:object_id>/",
+        views.AsyncCommentListView.as_view(),
+        name="list_async",
+    ),
+    path(
+        "async/submit/<int:content_type_id>/<int:object_id>/",
+        views.AsyncSubmitCommentView.as_view(),
+        name="submit_async",
+    ),
+    path(
+        "async/stats/<int:content_type_id>/<int:object_id>/",
+        views.AsyncStatisticsView.as_view(),
+        name="stats_async",
+    ),
     # Административные эндпоинты
     # path(
     #     "admin/<uuid:comment_id>/",
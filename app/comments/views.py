@@ -1,16 +1,200 @@
+from asgiref.sync import sync_to_async
 from django.contrib.auth.decorators import login_required
 from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import ObjectDoesNotExist
-from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
 from django.db.models import Q
-from django.http import JsonResponse
+from django.db.models.functions import Coalesce
+from django.http import Http404, JsonResponse
 from django.shortcuts import get_object_or_404
 from django.utils.decorators import method_decorator
 from django.views.generic import View
 
+from blog.pagination import InvalidCursor, KeysetPaginator
+from blog.ratelimit import check_rate_limit, refund, retry_after_header
+
 from .forms import AdminReplyForm, CommentForm
 from .models import Comment
 
+# Сортировка списка: ключи keyset-пагинации, последний ключ уникален
+KEYSET_ORDERINGS = {
+    "newest": ("-created_at", "-id"),
+    "oldest": ("created_at", "id"),
+    "highest": ("-rating", "-created_at", "-id"),
+    "lowest": ("rating", "created_at", "id"),
+    # Только отвеченные; reply_time = replied_at или created_at (по NULL
+    # искать нельзя, а replied_at правится в админке)
+    "replied": ("-reply_time", "-created_at", "-id"),
+}
+DEFAULT_SORT = "newest"
+DEFAULT_PER_PAGE = 10
+MAX_PER_PAGE = 50
+
+# Только поля, которые попадают в JSON списка
+COMMENT_LIST_FIELDS = (
+    "id",
+    "name",
+    "email",
+    "text",
+    "rating",
+    "created_at",
+    "is_anonymous",
+    "is_verified",
+    "admin_reply",
+    "replied_at",
+    "user_id",
+    "user__username",
+    "user__first_name",
+    "user__last_name",
+    "user__is_staff",
+)
+RATING_LABELS = dict(Comment.RATING_CHOICES)
+
+
+def _filter_comments(comments, filter_by):
+    """Фильтрация списка комментариев по параметру filter"""
+    if filter_by == "with_replies":
+        return comments.filter(admin_reply__regex=r"\S")
+    if filter_by == "verified":
+        return comments.filter(is_verified=True)
+    if filter_by == "high_rating":
+        return comments.filter(rating__gte=4)
+    return comments
+
+
+def _comment_paginator(comments, sort_by, per_page):
+    """
+    Keyset-пагинатор списка по строкам values(), а не по моделям.
+
+    Страница - один запрос WHERE (ключ) < (курсор) LIMIT n по индексу
+    обсуждения, без COUNT и OFFSET.
+    """
+    if sort_by not in KEYSET_ORDERINGS:
+        sort_by = DEFAULT_SORT
+    fields = COMMENT_LIST_FIELDS
+    if sort_by == "replied":
+        # Тот же набор, что считает счетчик with_replies
+        comments = _filter_comments(comments, "with_replies").annotate(
+            reply_time=Coalesce("replied_at", "created_at")
+        )
+        fields = (*fields, "reply_time")
+    return KeysetPaginator(
+        comments.values(*fields), per_page, KEYSET_ORDERINGS[sort_by]
+    )
+
+
+def _pagination(page, total_items):
+    return {
+        "next_cursor": page.next_cursor,
+        "has_next": page.has_next(),
+        "per_page": page.paginator.per_page,
+        "total_items": total_items,
+    }
+
+
+def _per_page(request):
+    try:
+        per_page = int(request.GET.get("per_page", DEFAULT_PER_PAGE))
+    except ValueError:
+        per_page = DEFAULT_PER_PAGE
+    return max(1, min(per_page, MAX_PER_PAGE))
+
+
+def _filtered_total(stats, sort_by, filter_by):
+    """
+    Число комментариев списка из CommentStats, без COUNT.
+
+    None, если счетчика для такого списка нет (отвеченные с другим фильтром).
+    """
+    if sort_by == "replied":
+        if filter_by in ("all", "with_replies"):
+            return stats["with_replies"]
+        return None
+    if filter_by == "with_replies":
+        return stats["with_replies"]
+    if filter_by == "verified":
+        return stats["verified"]
+    if filter_by == "high_rating":
+        distribution = stats["ratings_distribution"]
+        return distribution[4] + distribution[5]
+    return stats["total"]
+
+
+def _invalid_cursor_response():
+    return JsonResponse(
+        {"success": False, "error": "Некорректный курсор страницы"}, status=400
+    )
+
+
+def _serialize_comment(row, user):
+    """Строка values() комментария для JSON-ответа списка"""
+    admin_reply = row["admin_reply"] if row["admin_reply"].strip() else None
+    if row["user_id"] is None:
+        display_name, user_type = row["name"], "anonymous"
+    else:
+        full_name = f"{row['user__first_name']} {row['user__last_name']}".strip()
+        display_name = full_name or row["user__username"]
+        user_type = "staff" if row["user__is_staff"] else "authenticated"
+
+    return {
+        "id": str(row["id"]),
+        "name": display_name,
+        "email": row["email"],
+        "text": row["text"],
+        "rating": row["rating"],
+        "rating_display": str(RATING_LABELS.get(row["rating"], row["rating"])),
+        "created_at": row["created_at"].strftime("%d.%m.%Y %H:%M"),
+        "is_anonymous": row["is_anonymous"],
+        "is_verified": row["is_verified"],
+        "has_admin_reply": admin_reply is not None,
+        "admin_reply": admin_reply,
+        "replied_at": (
+            row["replied_at"].strftime("%d.%m.%Y %H:%M") if row["replied_at"] else None
+        ),
+        "user_type": user_type,
+        "can_reply": user.is_authenticated and user.is_staff,
+    }
+
+
+def _serialize_user_comment(comment):
+    """Собственный комментарий пользователя"""
+    return {
+        "id": str(comment.id),
+        "rating": comment.rating,
+        "text": comment.text,
+        "status": comment.get_status_display(),
+        "has_admin_reply": comment.has_admin_reply(),
+        "admin_reply": comment.admin_reply,
+    }
+
+
+def _serialize_submitted(comment):
+    """Только что отправленный комментарий"""
+    return {
+        "success": True,
+        "message": "Комментарий отправлен на модерацию",
+        "comment": {
+            "id": str(comment.id),
+            "name": comment.get_display_name(),
+            "rating": comment.rating,
+            "text": comment.text,
+            "status": comment.get_status_display(),
+            "created_at": comment.created_at.strftime("%d.%m.%Y %H:%M"),
+        },
+        "requires_moderation": comment.status == Comment.Status.PENDING,
+    }
+
+
+def _too_many_comments_response(limit):
+    response = JsonResponse(
+        {
+            "success": False,
+            "error": "Слишком много комментариев за последний час",
+        },
+        status=429,
+    )
+    response["Retry-After"] = retry_after_header(limit)
+    return response
+
 
 class CommentListView(View):
     """Получение списка комментариев с пагинацией"""
@@ -19,9 +203,9 @@ class CommentListView(View):
         content_type = get_object_or_404(ContentType, id=content_type_id)
 
         # Параметры
-        page = int(request.GET.get("page", 1))
-        per_page = int(request.GET.get("per_page", 10))
-        sort_by = request.GET.get("sort", "newest")
+        cursor = request.GET.get("cursor")
+        per_page = _per_page(request)
+        sort_by = request.GET.get("sort", DEFAULT_SORT)
         filter_by = request.GET.get("filter", "all")
 
         # Базовый QuerySet
@@ -29,72 +213,27 @@ class CommentListView(View):
             content_type=content_type,
             object_id=object_id,
             status=Comment.Status.APPROVED,  # Только одобренные
-        ).select_related("user")
+        )
 
         # Фильтрация
-        if filter_by == "with_replies":
-            comments = comments.filter(admin_reply__regex=r"\S")
-        elif filter_by == "verified":
-            comments = comments.filter(is_verified=True)
-        elif filter_by == "high_rating":
-            comments = comments.filter(rating__gte=4)
-
-        # Сортировка
-        sort_map = {
-            "newest": "-created_at",
-            "oldest": "created_at",
-            "highest": "-rating",
-            "lowest": "rating",
-            "replied": "-replied_at",
-        }
-
-        order_by = sort_map.get(sort_by, "-created_at")
-        comments = comments.order_by(order_by)
-
-        # Пагинация
-        paginator = Paginator(comments, per_page)
+        comments = _filter_comments(comments, filter_by)
 
+        # Сортировка и страница по курсору
+        paginator = _comment_paginator(comments, sort_by, per_page)
         try:
-            page_obj = paginator.page(page)
-        except (PageNotAnInteger, EmptyPage):
-            return JsonResponse(
-                {"success": False, "error": "Страница не найдена"}, status=404
-            )
+            page = paginator.page(cursor)
+        except InvalidCursor:
+            return _invalid_cursor_response()
 
         # Форматирование данных
-        comments_data = []
-        for comment in page_obj:
-            comments_data.append(
-                {
-                    "id": str(comment.id),
-                    "name": comment.get_display_name(),
-                    "email": comment.email,
-                    "text": comment.text,
-                    "rating": comment.rating,
-                    "rating_display": comment.get_rating_display(),
-                    "created_at": comment.created_at.strftime("%d.%m.%Y %H:%M"),
-                    "is_anonymous": comment.is_anonymous,
-                    "is_verified": comment.is_verified,
-                    "has_admin_reply": comment.has_admin_reply(),
-                    "admin_reply": (
-                        comment.admin_reply if comment.has_admin_reply() else None
-                    ),
-                    "replied_at": (
-                        comment.replied_at.strftime("%d.%m.%Y %H:%M")
-                        if comment.replied_at
-                        else None
-                    ),
-                    "user_type": comment.get_user_type(),
-                    "can_reply": (
-                        comment.can_reply(request.user)
-                        if request.user.is_authenticated
-                        else False
-                    ),
-                }
-            )
+        comments_data = [_serialize_comment(row, request.user) for row in page]
         content_object = content_type.get_object_for_this_type(pk=object_id)
-        # Статистика
+        # Статистика (из нее же число комментариев списка)
         stats = Comment.get_statistics(content_object)
+        total_items = _filtered_total(stats, sort_by, filter_by)
+        if total_items is None:
+            total_items = paginator.queryset.count()
+        pagination = _pagination(page, total_items)
 
         # Проверка пользователя
         user_comment = None
@@ -111,26 +250,13 @@ class CommentListView(View):
             )
 
             if user_comment_qs:
-                user_comment = {
-                    "id": str(user_comment_qs.id),
-                    "rating": user_comment_qs.rating,
-                    "text": user_comment_qs.text,
-                    "status": user_comment_qs.get_status_display(),
-                    "has_admin_reply": user_comment_qs.has_admin_reply(),
-                    "admin_reply": user_comment_qs.admin_reply,
-                }
+                user_comment = _serialize_user_comment(user_comment_qs)
 
         return JsonResponse(
             {
                 "success": True,
                 "comments": comments_data,
-                "pagination": {
-                    "current_page": page_obj.number,
-                    "total_pages": paginator.num_pages,
-                    "total_items": paginator.count,
-                    "has_next": page_obj.has_next(),
-                    "has_previous": page_obj.has_previous(),
-                },
+                "pagination": pagination,
                 "statistics": stats,
                 "user_comment": user_comment,
                 "sort_by": sort_by,
@@ -160,25 +286,8 @@ class SubmitCommentView(View):
             )
 
         # Проверка частоты отправки
-        from datetime import timedelta
-
-        from django.utils import timezone
-
-        recent_limit = timezone.now() - timedelta(hours=1)
-        ip = request.META.get("REMOTE_ADDR")
-
-        recent_comments = Comment.objects.filter(
-            ip_address=ip, created_at__gte=recent_limit
-        ).count()
-
-        if recent_comments >= 3:
-            return JsonResponse(
-                {
-                    "success": False,
-                    "error": "Слишком много комментариев за последний час",
-                },
-                status=429,
-            )
+        if not (limit := check_rate_limit(request, "comment")):
+            return _too_many_comments_response(limit)
 
         # Обработка формы
         form = CommentForm(
@@ -195,22 +304,10 @@ class SubmitCommentView(View):
             if request.user.is_authenticated:
                 comment.approve()
 
-            return JsonResponse(
-                {
-                    "success": True,
-                    "message": "Комментарий отправлен на модерацию",
-                    "comment": {
-                        "id": str(comment.id),
-                        "name": comment.get_display_name(),
-                        "rating": comment.rating,
-                        "text": comment.text,
-                        "status": comment.get_status_display(),
-                        "created_at": comment.created_at.strftime("%d.%m.%Y %H:%M"),
-                    },
-                    "requires_moderation": comment.status == Comment.Status.PENDING,
-                }
-            )
+            return JsonResponse(_serialize_submitted(comment))
 
+        # Ошибка в форме не расходует лимит
+        refund(limit)
         return JsonResponse({"success": False, "errors": form.errors}, status=400)
 
 
@@ -273,14 +370,9 @@ class AdminCommentView(View):
 
     def handle_approve(self, comment):
         """Одобрение комментария"""
+        # CommentStats обновит и rating объекта
         comment.approve()
 
-        content_object = comment.content_type.get_object_for_this_type(
-            pk=comment.object_id
-        )
-        content_object.rating = comment.get_statistics.get("average_rating", 0)
-        content_object.save(update_fields=["rating"])
-
         return JsonResponse(
             {
                 "success": True,
@@ -339,3 +431,133 @@ class StatisticsView(View):
         stats = Comment.get_statistics(content_object)
 
         return JsonResponse({"success": True, "statistics": stats})
+
+
+# ========== ASYNC-ПРЕДСТАВЛЕНИЯ ==========
+# Те же JSON-ответы на async ORM: под ASGI (см. deploy/gunicorn.asgi.conf.py)
+# запрос не занимает поток, пока ждет БД. Синхронные версии остаются на
+# прежних адресах.
+
+
+async def _aget_content_type(content_type_id):
+    try:
+        return await ContentType.objects.aget(id=content_type_id)
+    except ContentType.DoesNotExist:
+        raise Http404("Content type not found") from None
+
+
+async def _aobject_exists(content_type, object_id):
+    model_class = content_type.model_class()
+    if model_class is None:
+        return False
+    return await model_class._base_manager.filter(pk=object_id).aexists()
+
+
+class AsyncCommentListView(View):
+    """Получение списка комментариев с пагинацией (async)"""
+
+    async def get(self, request, content_type_id, object_id):
+        content_type = await _aget_content_type(content_type_id)
+        user = await request.auser()
+
+        # Параметры
+        cursor = request.GET.get("cursor")
+        per_page = _per_page(request)
+        sort_by = request.GET.get("sort", DEFAULT_SORT)
+        filter_by = request.GET.get("filter", "all")
+
+        comments = _filter_comments(
+            Comment.objects.filter(
+                content_type=content_type,
+                object_id=object_id,
+                status=Comment.Status.APPROVED,
+            ),
+            filter_by,
+        )
+        paginator = _comment_paginator(comments, sort_by, per_page)
+        try:
+            page = await sync_to_async(paginator.page)(cursor)
+        except InvalidCursor:
+            return _invalid_cursor_response()
+        comments_data = [_serialize_comment(row, user) for row in page]
+
+        stats = await Comment.aget_statistics(content_type, object_id)
+        total_items = _filtered_total(stats, sort_by, filter_by)
+        if total_items is None:
+            total_items = await paginator.queryset.acount()
+        pagination = _pagination(page, total_items)
+
+        user_comment = None
+        if user.is_authenticated:
+            own_comment = await Comment.objects.filter(
+                content_type=content_type, object_id=object_id, user=user
+            ).afirst()
+            if own_comment:
+                user_comment = _serialize_user_comment(own_comment)
+
+        return JsonResponse(
+            {
+                "success": True,
+                "comments": comments_data,
+                "pagination": pagination,
+                "statistics": stats,
+                "user_comment": user_comment,
+                "sort_by": sort_by,
+                "filter_by": filter_by,
+                "is_staff": user.is_authenticated and user.is_staff,
+            }
+        )
+
+
+class AsyncSubmitCommentView(View):
+    """Отправка нового комментария (async)"""
+
+    async def post(self, request, content_type_id, object_id):
+        content_type = await _aget_content_type(content_type_id)
+        model_class = content_type.model_class()
+        try:
+            content_object = await model_class._base_manager.aget(pk=object_id)
+        except (AttributeError, ObjectDoesNotExist):
+            return JsonResponse(
+                {"success": False, "error": "Объект не найден"}, status=404
+            )
+
+        # Проверка частоты отправки
+        limit = await sync_to_async(check_rate_limit)(request, "comment")
+        if not limit:
+            return _too_many_comments_response(limit)
+
+        user = await request.auser()
+        form = CommentForm(
+            request.POST,
+            request=request,
+            content_object=content_object,
+            user=user,
+        )
+        # Валидация проверяет CheckConstraint модели запросом к БД
+        if not await sync_to_async(form.is_valid)():
+            await sync_to_async(refund)(limit)
+            return JsonResponse({"success": False, "errors": form.errors}, status=400)
+
+        comment = form.save(commit=False)
+        # Авто-одобрение для авторизованных пользователей
+        if user.is_authenticated:
+            comment.status = Comment.Status.APPROVED
+        await comment.asave()
+
+        return JsonResponse(_serialize_submitted(comment))
+
+
+class AsyncStatisticsView(View):
+    """Получение статистики комментариев (async)"""
+
+    async def get(self, request, content_type_id, object_id):
+        content_type = await _aget_content_type(content_type_id)
+        if not await _aobject_exists(content_type, object_id):
+            return JsonResponse(
+                {"success": False, "error": "Объект не найден"}, status=404
+            )
+
+        stats = await Comment.aget_statistics(content_type, object_id)
+
+        return JsonResponse({"success": True, "statistics": stats})
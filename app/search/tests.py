@@ -0,0 +1,64 @@
+import json
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.test import TestCase
+from django.urls import reverse
+
+from blog.models import Category, Post
+
+from .models import SearchConfig, SearchField
+
+
+class AsyncSearchApiTests(TestCase):
+    """The async search endpoint answers with the same JSON as the sync one."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create(username="author")
+        category = Category.objects.create(title="Posts", url_path="posts")
+        for title in ("Django caching", "Django signals", "Postgres indexes"):
+            Post.objects.create(
+                title=title,
+                slug=title.lower().replace(" ", "-"),
+                body="Body",
+                author=author,
+                category=category,
+            )
+        cls.config = SearchConfig.objects.create(
+            name="Posts", content_type=ContentType.objects.get_for_model(Post)
+        )
+        SearchField.objects.create(config=cls.config, field_name="title", label="Title")
+
+    def _search_both(self, payload):
+        body = json.dumps(payload)
+        sync = self.client.post(
+            reverse("api_search:api_search"), body, content_type="application/json"
+        )
+        asynchronous = async_to_sync(self.async_client.post)(
+            reverse("api_search:api_search_async"),
+            body,
+            content_type="application/json",
+        )
+        self.assertEqual(sync.status_code, asynchronous.status_code)
+        self.assertEqual(sync.json(), asynchronous.json())
+        return sync.json()
+
+    def test_results_match_sync_view(self):
+        data = self._search_both(
+            {
+                "config_id": self.config.pk,
+                "content_type_id": self.config.content_type_id,
+                "search_data": {"title": "django"},
+                "limit": 1,
+            }
+        )
+        self.assertEqual(data["total"], 2)
+        self.assertTrue(data["has_more"])
+        self.assertEqual(len(data["results"]), 1)
+        self.assertTrue(data["results"][0]["url"].startswith("/posts/"))
+
+    def test_unknown_config_matches_sync_view(self):
+        data = self._search_both({"config_id": 0, "content_type_id": 0})
+        self.assertFalse(data["success"])
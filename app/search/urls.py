@@ -8,6 +8,7 @@ app_name = "search"
 urlpatterns = [
     path("", views.ListItems.as_view(), name="search_result"),
     path("api/search/", views.api_search, name="api_search"),
+    path("api/async/search/", views.api_search_async, name="api_search_async"),
     path(
         "api/field-choices/<int:config_id>/<int:field_id>/",
         views.get_field_choices,
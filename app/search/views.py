@@ -6,6 +6,7 @@ from collections.abc import Mapping
 from datetime import datetime
 from typing import Any, cast
 
+from asgiref.sync import sync_to_async
 from django.core.exceptions import FieldDoesNotExist
 from django.core.paginator import Paginator
 from django.db import models
@@ -229,17 +230,120 @@ class ListItems(View):
         return redirect(base_url)
 
 
+def _parse_search_request(request) -> tuple[Any, Any, Mapping[str, Any], int]:
+    data = cast(Mapping[str, Any], json.loads(request.body))
+    config_id = data.get("config_id")
+    content_type_id = data.get("content_type_id")
+    search_data = cast(Mapping[str, Any], data.get("search_data", {}))
+    limit = int(data.get("limit", 10))
+    return config_id, content_type_id, search_data, limit
+
+
+def _build_search_query(search_fields, search_data: Mapping[str, Any]) -> Q:
+    """Условие поиска по значениям полей формы"""
+    query = Q()
+
+    # Дополнительные фильтры
+    for field in search_fields:
+        field_name = field.field_name
+        value = search_data.get(field_name)
+
+        if not value and field.field_type != "date_range":
+            continue
+
+        if field.field_type == "text":
+            field_lookup = f"{field_name}__icontains"
+            query &= Q(**{field_lookup: value})
+
+        # elif field.field_type == "checkbox":
+        #     if value == "on" or value is True:
+        #         query &= Q(**{field_name: True})
+        #     elif value == "off" or value is False:
+        #         query &= Q(**{field_name: False})
+
+        elif field.field_type in ("select_multiple", "select"):
+            if isinstance(value, list):
+                # OR запрос через | для каждого значения
+                select_q = Q()
+                for val in value:
+                    select_q |= Q(**{field_name: val})
+                query &= select_q
+
+        # elif field.field_type == "radio":
+        #     query &= Q(**{field_name: value})
+
+        # elif field.field_type == "number":
+        #     query &= Q(**{field_name: value})
+
+        elif field.field_type == "date_range":
+            if date_min := search_data.get(f"{field_name}_min"):
+                date_min = datetime.strptime(date_min, "%d.%m.%Y").date()
+                query &= Q(**{f"{field_name}__gte": date_min})
+            if date_max := search_data.get(f"{field_name}_max"):
+                date_max = datetime.strptime(date_max, "%d.%m.%Y").date()
+                query &= Q(**{f"{field_name}__lte": date_max})
+
+        elif field.field_type == "range":
+            if (
+                isinstance(value, (list, tuple))
+                and len(value) >= 2
+                and (value[0] or value[1])
+            ):
+                if value[0]:
+                    query &= Q(**{f"{field_name}__gte": value[0]})
+                if value[1]:
+                    query &= Q(**{f"{field_name}__lte": value[1]})
+
+    return query
+
+
+def _format_results(results) -> list[dict[str, Any]]:
+    formatted_results = []
+    for obj in results:
+        get_absolute_url_name = "get_absolute_url"
+        get_absolute_url = _getattr(obj, get_absolute_url_name)
+        formatted_results.append(
+            {
+                "id": getattr(obj, "id", obj.pk),
+                "content_type": f"{obj._meta.app_label}.{obj._meta.model_name}",
+                "title": str(obj),
+                "description": (
+                    getattr(obj, "description", "")[:100]
+                    if hasattr(obj, "description")
+                    else ""
+                ),
+                "url": (get_absolute_url() if callable(get_absolute_url) else None),
+            }
+        )
+    return formatted_results
+
+
+def _search_response(config, qs, formatted_results, total, limit) -> JsonResponse:
+    return JsonResponse(
+        {
+            "success": True,
+            "query": str(qs.query),
+            "results": formatted_results,
+            "total": total,
+            "has_more": total > limit,
+            "show_count": config.show_results_count,
+            "search_id": f"{config.id}_{config.content_type_id}",
+        }
+    )
+
+
+def _config_not_found_response() -> JsonResponse:
+    return JsonResponse(
+        {"success": False, "message": "Конфигурация поиска не найдена"}, status=404
+    )
+
+
 @require_POST
 def api_search(request):
     """API endpoint для поиска"""
 
     try:
-        data = cast(Mapping[str, Any], json.loads(request.body))
-        config_id = data.get("config_id")
-        content_type_id = data.get("content_type_id")
-        search_data = cast(Mapping[str, Any], data.get("search_data", {}))
-        limit = data.get("limit", 10)
-        limit = int(limit)
+        config_id, content_type_id, search_data, limit = _parse_search_request(request)
 
         # Получаем конфигурацию
         config = SearchConfig.objects.get(
@@ -250,101 +354,51 @@ def api_search(request):
         model_class = _require_model_class(config.content_type)
 
         # Строим запрос
-        query = Q()
         search_fields = config.fields.filter(is_searchable=True)
+        query = _build_search_query(search_fields, search_data)
 
-        # Дополнительные фильтры
-        for field in search_fields:
-            field_name = field.field_name
-            value = search_data.get(field_name)
+        # Выполняем поиск
+        qs = _objects(model_class).filter(query)
+        total = qs.count()
+        results = list(qs[:limit])
 
-            if not value and field.field_type != "date_range":
-                continue
+        # Формируем ответ
+        return _search_response(config, qs, _format_results(results), total, limit)
 
-            if field.field_type == "text":
-                field_lookup = f"{field_name}__icontains"
-                query &= Q(**{field_lookup: value})
+    except SearchConfig.DoesNotExist:
+        return _config_not_found_response()
 
-            # elif field.field_type == "checkbox":
-            #     if value == "on" or value is True:
-            #         query &= Q(**{field_name: True})
-            #     elif value == "off" or value is False:
-            #         query &= Q(**{field_name: False})
+    except Exception as e:
+        return JsonResponse({"success": False, "message": str(e)}, status=500)
 
-            elif field.field_type in ("select_multiple", "select"):
-                if isinstance(value, list):
-                    # OR запрос через | для каждого значения
-                    select_q = Q()
-                    for val in value:
-                        select_q |= Q(**{field_name: val})
-                    query &= select_q
 
-            # elif field.field_type == "radio":
-            #     query &= Q(**{field_name: value})
+@require_POST
+async def api_search_async(request):
+    """API endpoint для поиска на async ORM (для ASGI)"""
 
-            # elif field.field_type == "number":
-            #     query &= Q(**{field_name: value})
+    try:
+        config_id, content_type_id, search_data, limit = _parse_search_request(request)
 
-            elif field.field_type == "date_range":
-                if date_min := search_data.get(f"{field_name}_min"):
-                    date_min = datetime.strptime(date_min, "%d.%m.%Y").date()
-                    query &= Q(**{f"{field_name}__gte": date_min})
-                if date_max := search_data.get(f"{field_name}_max"):
-                    date_max = datetime.strptime(date_max, "%d.%m.%Y").date()
-                    query &= Q(**{f"{field_name}__lte": date_max})
+        config = await SearchConfig.objects.select_related("content_type").aget(
+            id=config_id, content_type_id=content_type_id, is_active=True
+        )
+        model_class = _require_model_class(config.content_type)
 
-            elif field.field_type == "range":
-                if (
-                    isinstance(value, (list, tuple))
-                    and len(value) >= 2
-                    and (value[0] or value[1])
-                ):
-                    if value[0]:
-                        query &= Q(**{f"{field_name}__gte": value[0]})
-                    if value[1]:
-                        query &= Q(**{f"{field_name}__lte": value[1]})
+        search_fields = [
+            field async for field in config.fields.filter(is_searchable=True)
+        ]
+        query = _build_search_query(search_fields, search_data)
 
-        # Выполняем поиск
         qs = _objects(model_class).filter(query)
-        _q = qs.query
-        total = qs.count()
-        results = list(qs[:limit])
+        total = await qs.acount()
+        results = [obj async for obj in qs[:limit]]
 
-        # Формируем ответ
-        formatted_results = []
-        for obj in results:
-            get_absolute_url_name = "get_absolute_url"
-            get_absolute_url = _getattr(obj, get_absolute_url_name)
-            formatted_results.append(
-                {
-                    "id": getattr(obj, "id", obj.pk),
-                    "content_type": f"{obj._meta.app_label}.{obj._meta.model_name}",
-                    "title": str(obj),
-                    "description": (
-                        getattr(obj, "description", "")[:100]
-                        if hasattr(obj, "description")
-                        else ""
-                    ),
-                    "url": (get_absolute_url() if callable(get_absolute_url) else None),
-                }
-            )
-
-        return JsonResponse(
-            {
-                "success": True,
-                "query": str(_q),
-                "results": formatted_results,
-                "total": total,
-                "has_more": total > limit,
-                "show_count": config.show_results_count,
-                "search_id": f"{config_id}_{content_type_id}",
-            }
-        )
+        # get_absolute_url может обращаться к связанным объектам (синхронный ORM)
+        formatted_results = await sync_to_async(_format_results)(results)
+        return _search_response(config, qs, formatted_results, total, limit)
 
     except SearchConfig.DoesNotExist:
-        return JsonResponse(
-            {"success": False, "message": "Конфигурация поиска не найдена"}, status=404
-        )
+        return _config_not_found_response()
 
     except Exception as e:
         return JsonResponse({"success": False, "message": str(e)}, status=500)
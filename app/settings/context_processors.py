@@ -1,5 +1,10 @@
+import functools
 import logging
+from dataclasses import dataclass
 
+from django.core.cache import cache
+
+from blog.cache import TAG_LAYOUT, get_tag_versions
 from blog.models import Category, Post
 from settings.models import SocialMedia
 
@@ -7,6 +12,87 @@ from .models import BlogSettings
 
 logger = logging.getLogger("settings")
 
+# Constants
+SNAPSHOT_CACHE_PREFIX = "settings:global"
+SNAPSHOT_TIMEOUT = 60 * 60
+
+
+@dataclass(frozen=True)
+class GlobalSnapshot:
+    """Chrome data shared by every page (header, menu, footer)."""
+
+    settings: dict
+    categories: tuple
+    posts_count: int
+    social_media: tuple
+
+
+EMPTY_SNAPSHOT = GlobalSnapshot(
+    settings={}, categories=(), posts_count=0, social_media=()
+)
+
+# (версия тега layout, снимок) текущего процесса
+_local_snapshot: tuple[str, GlobalSnapshot] | None = None
+
+
+def _build_snapshot() -> GlobalSnapshot:
+    # Получаем настройки блога
+    settings = (
+        BlogSettings.objects.values(
+            "blog_title", "blog_desc", "blog_footer", "avatar"
+        ).first()
+        or {}
+    )
+    if not settings:
+        logger.warning("No blog settings found in database")
+    else:
+        logger.debug(f"Loaded blog settings: {settings.get('blog_title', 'N/A')}")
+
+    # Получаем категории и посты
+    categories = tuple(Category.objects.all())
+    logger.debug(f"Loaded {len(categories)} categories")
+
+    posts_count = Post.published.count()
+    logger.debug(f"Total published posts: {posts_count}")
+
+    social_media = tuple(SocialMedia.objects.all())
+    logger.debug(f"Loaded {len(social_media)} social media links")
+
+    return GlobalSnapshot(
+        settings=settings,
+        categories=categories,
+        posts_count=posts_count,
+        social_media=social_media,
+    )
+
+
+def get_global_snapshot() -> GlobalSnapshot:
+    """
+    Snapshot of blog settings, categories, posts count and social links.
+
+    Kept per process and in the shared cache under the version of the
+    ``layout`` cache tag, which ``blog.invalidation`` bumps whenever one of
+    the underlying models is saved or deleted.
+    """
+    global _local_snapshot
+    try:
+        version = get_tag_versions([TAG_LAYOUT])[TAG_LAYOUT]
+        if _local_snapshot is not None and _local_snapshot[0] == version:
+            return _local_snapshot[1]
+
+        cache_key = f"{SNAPSHOT_CACHE_PREFIX}:{version}"
+        snapshot = cache.get(cache_key)
+        if snapshot is None:
+            snapshot = _build_snapshot()
+            cache.set(cache_key, snapshot, SNAPSHOT_TIMEOUT)
+            logger.debug("Global context snapshot rebuilt")
+        _local_snapshot = (version, snapshot)
+        return snapshot
+
+    except Exception as e:
+        logger.error(f"Error loading context data: {e}", exc_info=True)
+        return EMPTY_SNAPSHOT
+
 
 def global_context(request):
     """
@@ -18,6 +104,9 @@ def global_context(request):
     - Active section based on URL
     - Total published posts count
     - Social media links
+
+    Values are callables resolved by the template engine on first use, so
+    pages that do not render the chrome never load the snapshot.
     """
     logger.debug(f"Processing global context for path: {request.path}")
 
@@ -26,53 +115,18 @@ def global_context(request):
     active_section = url_parts[0] if url_parts else "home"
     logger.debug(f"Active section: {active_section}")
 
-    # Получаем настройки блога
-    try:
-        settings = (
-            BlogSettings.objects.values(
-                "blog_title", "blog_desc", "blog_footer", "avatar"
-            ).first()
-            or {}
-        )
-
-        if not settings:
-            logger.warning("No blog settings found in database")
-        else:
-            logger.debug(f"Loaded blog settings: {settings.get('blog_title', 'N/A')}")
+    snapshot = functools.cache(get_global_snapshot)
 
-    except Exception as e:
-        logger.error(f"Error loading blog settings: {e}", exc_info=True)
-        settings = {}
+    def setting(name):
+        return lambda: snapshot().settings.get(name, "")
 
-    # Получаем категории и посты
-    try:
-        categories = Category.objects.all()
-        category_count = categories.count()
-        logger.debug(f"Loaded {category_count} categories")
-
-        posts_count = Post.published.count()
-        logger.debug(f"Total published posts: {posts_count}")
-
-        social_media = SocialMedia.objects.all()
-        social_count = social_media.count()
-        logger.debug(f"Loaded {social_count} social media links")
-
-    except Exception as e:
-        logger.error(f"Error loading context data: {e}", exc_info=True)
-        categories = Category.objects.none()
-        posts_count = 0
-        social_media = SocialMedia.objects.none()
-
-    context = {
-        "categories": categories,
+    return {
+        "categories": lambda: snapshot().categories,
         "active": active_section,
-        "cnt_posts": posts_count,
-        "title": settings.get("blog_title", ""),
-        "about": settings.get("blog_desc", ""),
-        "footer": settings.get("blog_footer", ""),
-        "avatar": settings.get("avatar", ""),
-        "social_media": social_media,
+        "cnt_posts": lambda: snapshot().posts_count,
+        "title": setting("blog_title"),
+        "about": setting("blog_desc"),
+        "footer": setting("blog_footer"),
+        "avatar": setting("avatar"),
+        "social_media": lambda: snapshot().social_media,
     }
-
-    logger.debug("Global context processing completed")
-    return context
@@ -1 +1,43 @@
-# Create your tests here.
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase
+
+from blog.models import Category
+
+from .context_processors import global_context
+from .models import BlogSettings
+
+
+class GlobalContextTests(TestCase):
+    """Chrome data is loaded lazily and cached until a model changes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        BlogSettings.objects.create(
+            blog_title="Blog", blog_desc="About", blog_footer="Footer"
+        )
+        Category.objects.create(title="Posts", url_path="posts")
+
+    def setUp(self):
+        cache.clear()
+        self.request = RequestFactory().get("/posts/")
+
+    def test_values_are_lazy(self):
+        with self.assertNumQueries(0):
+            context = global_context(self.request)
+        self.assertEqual(context["active"], "posts")
+
+        with self.assertNumQueries(4):
+            self.assertEqual(context["title"](), "Blog")
+            self.assertEqual(len(context["categories"]()), 1)
+
+    def test_snapshot_is_reused_until_invalidated(self):
+        global_context(self.request)["title"]()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(global_context(self.request)["footer"](), "Footer")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(title="Notes", url_path="notes")
+
+        categories = global_context(self.request)["categories"]()
+        self.assertEqual([item.url_path for item in categories], ["posts", "notes"])
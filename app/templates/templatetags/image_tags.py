@@ -0,0 +1,73 @@
+from django import template
+
+from blog.signals import VARIANT_FORMATS
+
+register = template.Library()
+
+
+@register.inclusion_tag("base/_picture.html")
+def responsive_image(
+    image,
+    sizes="100vw",
+    alt="",
+    css_class="img-fluid",
+    fallback="image",
+    loading="lazy",
+):
+    """
+    <picture> с вариантами изображения разной ширины (AVIF, WebP, JPEG).
+
+    Использование:
+    {% responsive_image post.main_image sizes="(min-width: 992px) 720px, 100vw" %}
+
+    fallback - поле изображения ("image" или "thumbnail"), которое отдается,
+    пока варианты не построены. Варианты берутся из
+    prefetch_related("images__variants"). Пока картинка грузится, под ней
+    видны основной цвет и размытая заглушка (LQIP).
+    """
+    by_format = {}
+    for variant in image.variants.all() if image else ():
+        by_format.setdefault(variant.format, []).append(variant)
+
+    def srcset(variants):
+        return ", ".join(f"{variant.file.url} {variant.width}w" for variant in variants)
+
+    # Современные форматы - в <source>, JPEG - в самом <img>
+    sources = [
+        {"type": mime, "srcset": srcset(by_format[name])}
+        for name, (_extension, _options, mime) in VARIANT_FORMATS.items()
+        if name != "jpeg" and name in by_format
+    ]
+    jpeg_variants = by_format.get("jpeg", [])
+    largest = max(
+        (variant for variants in by_format.values() for variant in variants),
+        key=lambda variant: variant.width,
+        default=None,
+    )
+
+    src = ""
+    if jpeg_variants:
+        src = jpeg_variants[-1].file.url
+    elif image:
+        field = getattr(image, fallback) or image.image
+        src = field.url if field else ""
+
+    # Размеры и заглушка сохранены при обработке, файл не открывается
+    width = getattr(image, "width", None)
+    height = getattr(image, "height", None)
+    if not width and largest:
+        width, height = largest.width, largest.height
+
+    return {
+        "src": src,
+        "srcset": srcset(jpeg_variants),
+        "sources": sources,
+        "sizes": sizes,
+        "alt": alt,
+        "css_class": css_class,
+        "loading": loading,
+        "width": width,
+        "height": height,
+        "color": getattr(image, "dominant_color", ""),
+        "placeholder": getattr(image, "placeholder", ""),
+    }
@@ -3,6 +3,8 @@ from django import template
 from django.utils.html import strip_tags
 from django.utils.safestring import mark_safe
 
+from blog.rendering import render_markdown
+
 register = template.Library()
 
 
@@ -23,28 +25,7 @@ def markdown_filter(value):
     if not value:
         return ""
 
-    extensions = [
-        "markdown.extensions.extra",
-        "markdown.extensions.codehilite",
-        "markdown.extensions.toc",
-        "markdown.extensions.nl2br",
-        "markdown.extensions.sane_lists",
-        "markdown.extensions.fenced_code",
-    ]
-
-    # Дополнительные настройки
-    extension_configs = {
-        "markdown.extensions.codehilite": {
-            "css_class": "highlight",
-        },
-        "markdown.extensions.toc": {
-            "title": "Содержание",
-        },
-    }
-
-    html = markdown.markdown(
-        value, extensions=extensions, extension_configs=extension_configs
-    )
+    html, _toc = render_markdown(value)
     return mark_safe(html)
 
 
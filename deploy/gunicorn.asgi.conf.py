@@ -0,0 +1,25 @@
+# Запуск через ASGI: gunicorn управляет процессами, uvicorn обслуживает
+# запросы в event loop. Async-представления (comments/async/...,
+# search/api/async/search/) не занимают поток на время ожидания БД,
+# синхронные Django выполняет в пуле потоков.
+#
+#   gunicorn tiny_cms.asgi:application -c /app/gunicorn.asgi.conf.py
+#
+# Виджет комментариев переключается на async-эндпоинты настройкой
+# COMMENTS_ASYNC_API = True.
+bind = "0.0.0.0:8000"
+workers = 1
+worker_class = "uvicorn.workers.UvicornWorker"
+timeout = 120
+preload_app = True
+max_requests = 1000
+max_requests_jitter = 100
+
+# Логирование
+accesslog = "-"
+errorlog = "-"
+loglevel = "info"
+
+# Дополнительные настройки
+reload = False
+daemon = False